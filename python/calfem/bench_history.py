@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Local benchmark history with regression checks.
+
+Every benchmark run is stored in an SQLite file together with a machine
+fingerprint, the git revision, the mesh size and, per phase, the median
+time and peak memory. The latest run of each mesh size is compared with a
+rolling baseline (the median of the previous runs on the same machine) and
+phases that got slower, or use more memory, by more than a tolerance are
+reported as regressions.
+
+Command line::
+
+    python bench_history.py bench.sqlite report [--tolerance 0.1] [--plot trend.png]
+    python bench_history.py bench.sqlite trend --phase solve
+
+``report`` exits with status 1 when a regression is found.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    timestamp   REAL NOT NULL,
+    benchmark   TEXT NOT NULL,
+    machine     TEXT NOT NULL,
+    git_rev     TEXT,
+    mesh_size   REAL NOT NULL,
+    n_dofs      INTEGER
+);
+CREATE TABLE IF NOT EXISTS machines (
+    machine     TEXT PRIMARY KEY,
+    info        TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id      INTEGER NOT NULL REFERENCES runs(id),
+    phase       TEXT NOT NULL,
+    time        REAL,
+    peak_memory INTEGER,
+    PRIMARY KEY (run_id, phase)
+);
+"""
+
+
+def machine_fingerprint():
+    """
+    Identify the machine a benchmark runs on.
+
+    Returns
+    -------
+    fingerprint : str
+        Short hash of the machine description.
+    info : dict
+        Host name, platform, processor, CPU count and Python/NumPy versions.
+    """
+    info = {
+        "node": platform.node(),
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+    digest = hashlib.sha1(json.dumps(info, sort_keys=True).encode()).hexdigest()
+    return digest[:12], info
+
+
+def git_revision(path=None):
+    """Short git revision of the working tree at path, '+' marking local changes."""
+    path = path or os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                cwd=path, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return rev + ("+" if status.strip() else "")
+
+
+class BenchmarkHistory:
+    """
+    SQLite-backed history of benchmark runs.
+
+    Parameters
+    ----------
+    path : str
+        Database file. Created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db  = sqlite3.connect(path)
+        self._db.executescript(SCHEMA)
+        self.machine, self._machine_info = machine_fingerprint()
+
+    def close(self):
+        self._db.close()
+
+    def record(self, benchmark, mesh_size, times, memory=None, n_dofs=None, git_rev=None):
+        """
+        Store one benchmark run.
+
+        Parameters
+        ----------
+        benchmark : str
+            Benchmark (variant) name.
+        mesh_size : float
+            Mesh size factor of the run.
+        times : dict
+            Phase -> seconds, or a list of seconds from repeats, of which
+            the median is stored.
+        memory : dict, optional
+            Phase -> peak memory in bytes (the ex2 driver records
+            Python-heap peaks, see ``scaling_report``).
+        n_dofs : int, optional
+            Number of DOFs of the model.
+        git_rev : str, optional
+            Revision to record. Taken from the working tree if omitted.
+
+        Returns
+        -------
+        int
+            Id of the stored run.
+        """
+        memory = memory or {}
+        git_rev = git_revision() if git_rev is None else git_rev
+        with self._db:
+            self._db.execute("INSERT OR IGNORE INTO machines VALUES (?, ?)",
+                             (self.machine, json.dumps(self._machine_info)))
+            cursor = self._db.execute(
+                "INSERT INTO runs (timestamp, benchmark, machine, git_rev, mesh_size, n_dofs) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), benchmark, self.machine, git_rev, float(mesh_size),
+                 None if n_dofs is None else int(n_dofs)),
+            )
+            run_id = cursor.lastrowid
+            for phase in list(times) + [p for p in memory if p not in times]:
+                value = times.get(phase)
+                if value is not None:
+                    value = float(np.median(value))
+                peak = memory.get(phase)
+                self._db.execute(
+                    "INSERT INTO phases VALUES (?, ?, ?, ?)",
+                    (run_id, phase, value, None if peak is None else int(peak)),
+                )
+        return run_id
+
+    def trend(self, benchmark, phase, mesh_size=None, machine=None):
+        """
+        History of one phase, oldest first.
+
+        Returns
+        -------
+        list of dict
+            timestamp, git_rev, mesh_size, n_dofs, time and peak_memory of
+            every run of the benchmark on the machine.
+        """
+        query = (
+            "SELECT r.timestamp, r.git_rev, r.mesh_size, r.n_dofs, p.time, p.peak_memory "
+            "FROM runs r JOIN phases p ON p.run_id = r.id "
+            "WHERE r.benchmark = ? AND r.machine = ? AND p.phase = ?"
+        )
+        args = [benchmark, machine or self.machine, phase]
+        if mesh_size is not None:
+            query += " AND r.mesh_size = ?"
+            args.append(float(mesh_size))
+        rows = self._db.execute(query + " ORDER BY r.timestamp, r.id", args).fetchall()
+        keys = ("timestamp", "git_rev", "mesh_size", "n_dofs", "time", "peak_memory")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def benchmarks(self):
+        """Names of all recorded benchmarks."""
+        return [row[0] for row in
+                self._db.execute("SELECT DISTINCT benchmark FROM runs ORDER BY benchmark")]
+
+    def phases(self, benchmark):
+        """Names of all phases recorded for a benchmark."""
+        return [row[0] for row in self._db.execute(
+            "SELECT DISTINCT p.phase FROM phases p JOIN runs r ON p.run_id = r.id "
+            "WHERE r.benchmark = ? ORDER BY p.phase", (benchmark,))]
+
+    def check(self, benchmark, tolerance=0.1, window=5, min_delta=1e-3, machine=None):
+        """
+        Compare the latest run of every mesh size with a rolling baseline.
+
+        The baseline of a phase is the median of its previous ``window``
+        runs on the same machine. A phase regresses when its latest value
+        exceeds the baseline by more than ``tolerance`` (relative) and, for
+        times, by more than ``min_delta`` seconds.
+
+        Returns
+        -------
+        list of dict
+            One entry per compared phase and quantity with mesh_size, phase,
+            quantity ("time" or "peak_memory"), latest, baseline, change
+            and regressed.
+        """
+        results = []
+        for phase in self.phases(benchmark):
+            by_size = {}
+            for row in self.trend(benchmark, phase, machine=machine):
+                by_size.setdefault(row["mesh_size"], []).append(row)
+            for mesh_size, rows in sorted(by_size.items()):
+                latest, previous = rows[-1], rows[:-1][-window:]
+                for quantity, floor in (("time", min_delta), ("peak_memory", 0)):
+                    history = [row[quantity] for row in previous if row[quantity] is not None]
+                    if latest[quantity] is None or not history:
+                        continue
+                    baseline = float(np.median(history))
+                    change = latest[quantity] / baseline - 1.0 if baseline > 0 else 0.0
+                    results.append({
+                        "mesh_size": mesh_size,
+                        "phase": phase,
+                        "quantity": quantity,
+                        "latest": latest[quantity],
+                        "baseline": baseline,
+                        "change": change,
+                        "regressed": (change > tolerance
+                                      and latest[quantity] - baseline > floor),
+                    })
+        return results
+
+
+def plot_trends(history, benchmark, path, machine=None):
+    """Plot the time of every phase and mesh size against run index."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for phase in history.phases(benchmark):
+        by_size = {}
+        for row in history.trend(benchmark, phase, machine=machine):
+            if row["time"] is not None:
+                by_size.setdefault(row["mesh_size"], []).append(row["time"])
+        for mesh_size, values in sorted(by_size.items()):
+            ax.plot(range(len(values)), values, marker="o", label=f"{phase} h={mesh_size}")
+    ax.set_yscale("log")
+    ax.set_xlabel("run")
+    ax.set_ylabel("median time [s]")
+    ax.set_title(benchmark)
+    ax.legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+
+
+def _report(history, args):
+    regressed = False
+    for benchmark in ([args.benchmark] if args.benchmark else history.benchmarks()):
+        print(f"{benchmark}:")
+        for entry in history.check(benchmark, args.tolerance, args.window):
+            if entry["quantity"] == "time":
+                latest = f"{entry['latest']:.4f} s"
+                baseline = f"{entry['baseline']:.4f} s"
+            else:
+                latest = f"{entry['latest'] / 2**20:.1f} MB"
+                baseline = f"{entry['baseline'] / 2**20:.1f} MB"
+            flag = "  REGRESSION" if entry["regressed"] else ""
+            print(f"  h={entry['mesh_size']:<8g} {entry['phase']:16s} {entry['quantity']:11s} "
+                  f"{latest:>12s} vs {baseline:>12s} ({entry['change']:+.1%}){flag}")
+            regressed |= entry["regressed"]
+        if args.plot:
+            root, ext = os.path.splitext(args.plot)
+            path = args.plot if args.benchmark else f"{root}_{benchmark}{ext}"
+            plot_trends(history, benchmark, path)
+    return 1 if regressed else 0
+
+
+def _trend(history, args):
+    for benchmark in ([args.benchmark] if args.benchmark else history.benchmarks()):
+        print(f"{benchmark} / {args.phase}:")
+        for row in history.trend(benchmark, args.phase, args.mesh_size):
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["timestamp"]))
+            value = "-" if row["time"] is None else f"{row['time']:.4f} s"
+            print(f"  {stamp}  {row['git_rev'] or '-':10s} h={row['mesh_size']:<8g} {value}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark history and regression checks")
+    parser.add_argument("database", help="SQLite benchmark history file")
+    parser.add_argument("-b", "--benchmark", help="Only this benchmark (default: all)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="Compare latest runs with the rolling baseline")
+    report.add_argument("-t", "--tolerance", type=float, default=0.1,
+                        help="Allowed relative increase before a phase is flagged")
+    report.add_argument("-w", "--window", type=int, default=5,
+                        help="Number of previous runs in the baseline")
+    report.add_argument("-p", "--plot", help="Write a trend plot to this image file")
+
+    trend = commands.add_parser("trend", help="Print the history of one phase")
+    trend.add_argument("--phase", default="solve")
+    trend.add_argument("--mesh-size", type=float)
+
+    args = parser.parse_args(argv)
+    history = BenchmarkHistory(args.database)
+    try:
+        return _report(history, args) if args.command == "report" else _trend(history, args)
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Array-based index of the boundary DOFs of a mesh.
+
+``calfem.utils.applybc`` and ``applyforcetotal`` work on the ``bdofs`` dict
+of Python lists returned by the mesh generator and rebuild arrays on every
+call. The index converts ``bdofs`` once into a single contiguous DOF array
+with a slice per marker, so prescribed DOFs and load vectors for any set
+of markers are built with a few NumPy operations.
+"""
+
+import numpy as np
+
+
+class BoundaryIndex:
+    """
+    Boundary marker -> DOF array lookup built from ``bdofs``.
+
+    Parameters
+    ----------
+    bdofs : dict
+        Boundary marker -> list of 1-based DOFs, as returned by the mesh
+        generator (all DOFs of a node stored consecutively).
+    dofs_per_node : int
+        Degrees of freedom per node.
+    """
+
+    def __init__(self, bdofs, dofs_per_node=2):
+        self.dofs_per_node = dofs_per_node
+        self.markers       = sorted(bdofs)
+
+        sizes = [len(bdofs[marker]) for marker in self.markers]
+        ends = np.cumsum(sizes, dtype=int)
+        self._slices = {
+            marker: slice(int(end - size), int(end))
+            for marker, size, end in zip(self.markers, sizes, ends)
+        }
+        self._dofs = np.concatenate(
+            [np.asarray(bdofs[marker], dtype=np.int64) for marker in self.markers]
+            or [np.zeros(0, dtype=np.int64)]
+        )
+        self._dofs.flags.writeable = False
+
+    def __contains__(self, marker):
+        return marker in self._slices
+
+    def dofs(self, marker, dimension=0):
+        """
+        1-based DOFs on a boundary marker.
+
+        Parameters
+        ----------
+        marker : int
+            Boundary marker.
+        dimension : int
+            0 for all DOFs, 1 for x, 2 for y (as in ``cfu.applybc``).
+
+        Returns
+        -------
+        ndarray of int
+            Read-only view into the index.
+        """
+        if marker not in self._slices:
+            raise KeyError(f"Boundary marker {marker} does not exist")
+        marker_dofs = self._dofs[self._slices[marker]]
+        if dimension == 0:
+            return marker_dofs
+        if 1 <= dimension <= self.dofs_per_node:
+            return marker_dofs[dimension - 1::self.dofs_per_node]
+        raise ValueError(f"Invalid dimension {dimension}")
+
+    def prescribed(self, conditions):
+        """
+        Prescribed DOFs and values for several boundary conditions at once.
+
+        Parameters
+        ----------
+        conditions : iterable of tuple
+            (marker, value) or (marker, value, dimension) per condition.
+            Where conditions overlap, the first one listed wins, as when
+            calling ``cfu.applybc`` once per condition.
+
+        Returns
+        -------
+        bc : ndarray of int
+            Sorted unique prescribed DOFs (1-based).
+        bc_values : ndarray of float
+            Prescribed value of each DOF in ``bc``.
+        """
+        selected = [self.dofs(*_condition_args(condition)) for condition in conditions]
+        if not selected:
+            return np.array([], "i"), np.array([], float)
+        values = np.repeat([float(condition[1]) for condition in conditions],
+                           [marker_dofs.size for marker_dofs in selected])
+        bc, first = np.unique(np.concatenate(selected), return_index=True)
+        return bc, values[first]
+
+    def total_forces(self, n_dofs, loads, f=None):
+        """
+        Load vector with total forces spread evenly over boundary DOFs.
+
+        Parameters
+        ----------
+        n_dofs : int
+            Number of DOFs of the model.
+        loads : iterable of tuple
+            (marker, total_value) or (marker, total_value, dimension) per
+            load, as for ``cfu.applyforcetotal``.
+        f : ndarray, shape (n_dofs, 1), optional
+            Load vector to add to. A new zero vector if omitted.
+
+        Returns
+        -------
+        ndarray, shape (n_dofs, 1)
+        """
+        if f is None:
+            f = np.zeros((n_dofs, 1))
+        loads = list(loads)
+        selected = [self.dofs(*_condition_args(load)) for load in loads]
+        if selected:
+            per_dof = np.repeat(
+                [float(load[1]) / max(marker_dofs.size, 1)
+                 for load, marker_dofs in zip(loads, selected)],
+                [marker_dofs.size for marker_dofs in selected],
+            )
+            np.add.at(f[:, 0], np.concatenate(selected) - 1, per_dof)
+        return f
+
+
+def _condition_args(condition):
+    """(marker, dimension) of a (marker, value[, dimension]) tuple."""
+    return (condition[0], condition[2] if len(condition) > 2 else 0)
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Non-overlapping domain-decomposition solver for assembled FE systems.
+
+The elements are split into subdomains by recursive coordinate bisection
+of their centroids. DOFs used by a single subdomain are interior to it;
+DOFs shared between subdomains form the interface. Each subdomain's
+interior block is factorized in its own worker process, and the interface
+problem (the Schur complement) is solved with Jacobi-preconditioned
+conjugate gradients. The global matrix and the interface vectors are
+exchanged through shared memory, so only short commands travel through
+the worker pipes.
+
+The interface preconditioner is only the diagonal of K_gg, not a
+Schur-complement (e.g. Neumann-Neumann or balancing) preconditioner. The
+interface condition number, and with it the CG iteration count, grows with
+the number of subdomains and with the mesh refinement, so the solver pays
+off for a moderate number of subdomains (roughly the number of cores of
+one machine) and does not scale to many.
+"""
+
+import multiprocessing as mp
+import time
+import warnings
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import splu
+
+
+def partition_elements(centroids, n_parts):
+    """
+    Split elements into balanced parts by recursive coordinate bisection.
+
+    Parameters
+    ----------
+    centroids : ndarray, shape (n_elements, 2)
+        Element centroid coordinates.
+    n_parts : int
+        Number of parts.
+
+    Returns
+    -------
+    ndarray of int, shape (n_elements,)
+        Part index of every element.
+    """
+    centroids = np.asarray(centroids, dtype=float)
+    parts = np.zeros(centroids.shape[0], dtype=int)
+
+    def bisect(elements, first_part, count):
+        if count == 1:
+            parts[elements] = first_part
+            return
+        points = centroids[elements]
+        axis = np.argmax(points.max(axis=0) - points.min(axis=0))
+        order = elements[np.argsort(points[:, axis], kind="stable")]
+        left_count = count // 2
+        split = int(round(order.size * left_count / count))
+        bisect(order[:split], first_part, left_count)
+        bisect(order[split:], first_part + left_count, count - left_count)
+
+    bisect(np.arange(centroids.shape[0]), 0, n_parts)
+    return parts
+
+
+def _share(array):
+    """Copy an array into a new shared-memory block."""
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, view, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    """Attach to a shared-memory block created by ``_share``."""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _subdomain_worker(conn, matrix_specs, vector_specs, interior, interface):
+    """
+    Worker loop owning one subdomain.
+
+    Commands received on ``conn``:
+
+    * ``"schur"``: out = K_gi K_ii^-1 K_ig x
+    * ``"rhs"``: out = K_gi K_ii^-1 b_i
+    * ``"recover"``: solution[interior] = K_ii^-1 (b_i - K_ig x)
+    * ``"stop"``: reply with the timing record and exit.
+    """
+    handles = []
+    arrays = {}
+    for key, spec in list(matrix_specs.items()) + list(vector_specs.items()):
+        shm, arrays[key] = _attach(spec)
+        handles.append(shm)
+
+    timings = {"n_interior": int(interior.size), "factorize": 0.0,
+               "apply": 0.0, "n_apply": 0}
+
+    t0 = time.perf_counter()
+    K = csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                   shape=(arrays["indptr"].size - 1,) * 2)
+    K_rows = K[interior]
+    K_ii = K_rows[:, interior].tocsc()
+    K_ig = K_rows[:, interface].tocsr()
+    K_gi = K_ig.T.tocsr()
+    lu = splu(K_ii) if interior.size else None
+    timings["factorize"] = time.perf_counter() - t0
+    b_i = arrays["rhs"][interior]
+
+    out = arrays["out"]
+    x = arrays["x"]
+    try:
+        while True:
+            command = conn.recv()
+            if command == "stop":
+                conn.send(timings)
+                break
+
+            t0 = time.perf_counter()
+            if lu is None:
+                if command != "recover":
+                    out[:] = 0.0
+            elif command == "schur":
+                out[:] = K_gi @ lu.solve(K_ig @ x)
+            elif command == "rhs":
+                out[:] = K_gi @ lu.solve(b_i)
+            elif command == "recover":
+                arrays["solution"][interior] = lu.solve(b_i - K_ig @ x)
+            timings["apply"] += time.perf_counter() - t0
+            timings["n_apply"] += 1
+            conn.send(True)
+    finally:
+        del K, K_rows, K_ii, K_ig, K_gi, lu, b_i, out, x, arrays
+        for shm in handles:
+            shm.close()
+
+
+class DomainDecompositionSolver:
+    """
+    Schur-complement domain decomposition with one process per subdomain.
+
+    Parameters
+    ----------
+    n_subdomains : int
+        Number of subdomains (and worker processes).
+    tol : float
+        Relative residual tolerance of the interface CG iteration.
+    maxiter : int
+        Maximum number of interface CG iterations. ``solve()`` warns with
+        a RuntimeWarning if the tolerance is not reached within it.
+
+    Attributes
+    ----------
+    info : dict
+        Populated by ``solve()``: interface size, iteration count, final
+        relative residual, whether it converged, and per-subdomain timings.
+
+    Notes
+    -----
+    The interface CG is Jacobi preconditioned (see the module docstring),
+    so its iteration count grows with ``n_subdomains``.
+    """
+
+    def __init__(self, n_subdomains=4, tol=1e-10, maxiter=2000):
+        self.n_subdomains = n_subdomains
+        self.tol          = tol
+        self.maxiter      = maxiter
+        self.info         = {}
+
+    def solve(self, K, f, bc, bc_values, element_dofs, centroids):
+        """
+        Solve K a = f with prescribed DOFs.
+
+        Parameters
+        ----------
+        K : scipy.sparse matrix, shape (n_dofs, n_dofs)
+            Assembled symmetric positive definite stiffness matrix.
+        f : ndarray, shape (n_dofs, 1)
+            Load vector.
+        bc : ndarray of int
+            Prescribed DOFs (1-based, as for ``cfc.spsolveq``).
+        bc_values : ndarray of float
+            Prescribed values.
+        element_dofs : list of ndarray of int
+            0-based DOFs of every element, one (n_elements, dofs_per_element)
+            array per element block, in global element order.
+        centroids : ndarray, shape (n_elements, 2)
+            Element centroids in the same order.
+
+        Returns
+        -------
+        a : ndarray, shape (n_dofs, 1)
+            Solution including prescribed values.
+        r : ndarray, shape (n_dofs, 1)
+            Reaction forces K a - f.
+        """
+        t_start = time.perf_counter()
+        K = csr_matrix(K)
+        n_dofs = K.shape[0]
+        prescribed = np.asarray(bc, dtype=int) - 1
+        bc_values = np.asarray(bc_values, dtype=float)
+
+        free = np.setdiff1d(np.arange(n_dofs), prescribed)
+        free_index = np.full(n_dofs, -1)
+        free_index[free] = np.arange(free.size)
+
+        K_free = K[free]
+        K_ff = K_free[:, free].tocsr()
+        b = np.asarray(f, dtype=float)[free, 0] - K_free[:, prescribed] @ bc_values
+
+        # Subdomain ownership of every free DOF.
+        parts = partition_elements(centroids, self.n_subdomains)
+        owners = np.zeros((self.n_subdomains, free.size), dtype=bool)
+        offset = 0
+        for block_dofs in element_dofs:
+            block_parts = parts[offset:offset + block_dofs.shape[0]]
+            local = free_index[block_dofs]
+            valid = local >= 0
+            owners[np.broadcast_to(block_parts[:, None], local.shape)[valid], local[valid]] = True
+            offset += block_dofs.shape[0]
+
+        shared = owners.sum(axis=0) > 1
+        interface = np.flatnonzero(shared)
+        interiors = [np.flatnonzero(owners[s] & ~shared) for s in range(self.n_subdomains)]
+
+        blocks = {}
+        handles = []
+        for key, array in (("data", K_ff.data), ("indices", K_ff.indices),
+                           ("indptr", K_ff.indptr), ("rhs", b),
+                           ("x", np.zeros(interface.size)),
+                           ("solution", np.zeros(free.size))):
+            shm, view, spec = _share(array)
+            handles.append(shm)
+            blocks[key] = (view, spec)
+
+        outputs = []
+        for _ in range(self.n_subdomains):
+            shm, view, spec = _share(np.zeros(interface.size))
+            handles.append(shm)
+            outputs.append((view, spec))
+
+        matrix_specs = {key: blocks[key][1] for key in ("data", "indices", "indptr", "rhs")}
+        workers = []
+        try:
+            for s in range(self.n_subdomains):
+                parent, child = mp.Pipe()
+                vector_specs = {"x": blocks["x"][1], "solution": blocks["solution"][1],
+                                "out": outputs[s][1]}
+                process = mp.Process(
+                    target=_subdomain_worker,
+                    args=(child, matrix_specs, vector_specs, interiors[s], interface),
+                )
+                process.start()
+                workers.append((process, parent))
+
+            x_shared = blocks["x"][0]
+
+            def broadcast(command):
+                for _, conn in workers:
+                    conn.send(command)
+                for _, conn in workers:
+                    conn.recv()
+                return sum(view for view, _ in outputs)
+
+            K_gg = K_ff[interface][:, interface].tocsr()
+
+            def schur(x):
+                x_shared[:] = x
+                return K_gg @ x - broadcast("schur")
+
+            g = b[interface] - broadcast("rhs")
+            x, iterations, residual = self._pcg(schur, g, K_gg.diagonal())
+
+            x_shared[:] = x
+            broadcast("recover")
+            a_free = blocks["solution"][0].copy()
+            a_free[interface] = x
+
+            subdomain_timings = []
+            for process, conn in workers:
+                conn.send("stop")
+                subdomain_timings.append(conn.recv())
+                process.join()
+        finally:
+            for process, conn in workers:
+                if process.is_alive():
+                    process.terminate()
+                conn.close()
+            for shm in handles:
+                shm.close()
+                shm.unlink()
+
+        a = np.zeros((n_dofs, 1))
+        a[prescribed, 0] = bc_values
+        a[free, 0] = a_free
+        r = K @ a - f
+
+        self.info = {
+            "n_interface": int(interface.size),
+            "iterations": iterations,
+            "residual": float(residual),
+            "converged": bool(residual < self.tol),
+            "subdomains": subdomain_timings,
+            "total": time.perf_counter() - t_start,
+        }
+        return a, r
+
+    def _pcg(self, apply, rhs, diagonal):
+        """Jacobi-preconditioned conjugate gradients on the interface."""
+        inv_diag = 1.0 / diagonal
+        x = np.zeros_like(rhs)
+        r = rhs.copy()
+        rhs_norm = np.linalg.norm(rhs)
+        if rhs_norm == 0.0:
+            return x, 0, 0.0
+
+        z = inv_diag * r
+        p = z.copy()
+        rz = r @ z
+        for iteration in range(1, self.maxiter + 1):
+            q = apply(p)
+            alpha = rz / (p @ q)
+            x += alpha * p
+            r -= alpha * q
+            residual = np.linalg.norm(r) / rhs_norm
+            if residual < self.tol:
+                return x, iteration, residual
+            z = inv_diag * r
+            rz_new = r @ z
+            p = z + (rz_new / rz) * p
+            rz = rz_new
+        warnings.warn(
+            f"Interface CG did not converge in {self.maxiter} iterations "
+            f"(relative residual {residual:.3e} > tol {self.tol:.1e})",
+            RuntimeWarning, stacklevel=3,
+        )
+        return x, self.maxiter, residual
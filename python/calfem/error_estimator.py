@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Recovery-based (Zienkiewicz-Zhu) error estimation for plane elements.
+
+The raw element stresses of a displacement solution jump between
+elements. Averaging them to the nodes, per material so that the physical
+stress jump at material interfaces is kept, gives a smoother recovered
+field. The energy norm of the difference between the recovered and the
+raw stresses is the error indicator of an element; summed over the mesh
+and related to the strain energy it estimates the relative error of the
+solution.
+
+All element arrays are in global element order, i.e. the element blocks
+of a mixed mesh stacked in the same order as their ``element_nodes``.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+ErrorEstimate = namedtuple(
+    "ErrorEstimate", "indicators energy relative_error recovered_stresses"
+)
+ErrorEstimate.__doc__ = """
+Result of ``zz_estimate``.
+
+indicators : ndarray, shape (n_elements,)
+    Energy-norm error of every element.
+energy : float
+    Squared energy norm of the finite element solution.
+relative_error : float
+    Estimated relative error in the energy norm,
+    sqrt(sum(indicators**2) / (energy + sum(indicators**2))).
+recovered_stresses : ndarray, shape (n_elements, n_components)
+    Recovered stresses at the element centres.
+"""
+
+
+def recover_stresses(element_nodes, markers, areas, stresses, n_nodes):
+    """
+    Area-weighted nodal averages of element stresses, per material.
+
+    Parameters
+    ----------
+    element_nodes : sequence of ndarray
+        0-based node indices, one (n_block, n_el_nodes) array per element
+        block.
+    markers : ndarray, shape (n_elements,)
+        Material marker of every element; stresses are only averaged over
+        elements with the same marker.
+    areas : ndarray, shape (n_elements,)
+    stresses : ndarray, shape (n_elements, n_components)
+        Raw element stresses.
+    n_nodes : int
+
+    Returns
+    -------
+    ndarray, shape (n_elements, n_components)
+        Recovered stresses at the element centres, i.e. the mean of the
+        nodal values of the element's material at its nodes.
+    """
+    markers = np.asarray(markers)
+    areas = np.asarray(areas, dtype=float)
+    stresses = np.asarray(stresses, dtype=float)
+    n_elements, n_comp = stresses.shape
+    recovered = np.empty_like(stresses)
+
+    # Element-node pairs of all blocks: node index and element index.
+    pair_nodes = []
+    pair_elements = []
+    offset = 0
+    for nodes in element_nodes:
+        nodes = np.asarray(nodes)
+        pair_nodes.append(nodes.ravel())
+        pair_elements.append(np.repeat(offset + np.arange(nodes.shape[0]), nodes.shape[1]))
+        offset += nodes.shape[0]
+    pair_nodes = np.concatenate(pair_nodes)
+    pair_elements = np.concatenate(pair_elements)
+    counts = np.bincount(pair_elements, minlength=n_elements)
+
+    for marker in np.unique(markers):
+        # Averaging per material keeps one value per material at interface nodes.
+        in_marker = markers[pair_elements] == marker
+        nodes = pair_nodes[in_marker]
+        elements = pair_elements[in_marker]
+        weights = areas[elements]
+        node_weight = np.bincount(nodes, weights=weights, minlength=n_nodes)
+        node_weight[node_weight == 0.0] = 1.0
+        for k in range(n_comp):
+            nodal = np.bincount(nodes, weights=weights * stresses[elements, k],
+                                minlength=n_nodes) / node_weight
+            # Element centre value = mean of the element's nodal values.
+            total = np.bincount(elements, weights=nodal[nodes], minlength=n_elements)
+            members = markers == marker
+            recovered[members, k] = total[members] / counts[members]
+
+    return recovered
+
+
+def energy_densities(stresses, markers, compliances):
+    """
+    Complementary energy density s^T C s of every element.
+
+    Parameters
+    ----------
+    stresses : ndarray, shape (n_elements, n_components)
+    markers : ndarray, shape (n_elements,)
+    compliances : dict
+        Marker -> compliance matrix C = inv(D), shape (n_components,
+        n_components).
+
+    Returns
+    -------
+    ndarray, shape (n_elements,)
+    """
+    stresses = np.asarray(stresses, dtype=float)
+    markers = np.asarray(markers)
+    density = np.zeros(stresses.shape[0])
+    for marker, C in compliances.items():
+        idxs = np.flatnonzero(markers == marker)
+        s = stresses[idxs]
+        density[idxs] = np.einsum("ei,ij,ej->e", s, C, s)
+    return density
+
+
+def zz_estimate(element_nodes, markers, areas, stresses, compliances, n_nodes, thickness=1.0):
+    """
+    Zienkiewicz-Zhu error estimate of a plane stress/strain solution.
+
+    The element integrals are evaluated with the centre values, which is
+    exact for the constant-stress triangle and a one-point rule for Q4.
+
+    Parameters
+    ----------
+    element_nodes, markers, areas, stresses, n_nodes
+        See ``recover_stresses``.
+    compliances : dict
+        Marker -> inv(D) of the material.
+    thickness : float
+
+    Returns
+    -------
+    ErrorEstimate
+    """
+    areas = np.abs(np.asarray(areas, dtype=float))
+    stresses = np.asarray(stresses, dtype=float)
+    recovered = recover_stresses(element_nodes, markers, areas, stresses, n_nodes)
+
+    weight = thickness * areas
+    indicators = np.sqrt(weight * energy_densities(recovered - stresses, markers, compliances))
+    energy = float(np.sum(weight * energy_densities(stresses, markers, compliances)))
+    error2 = float(np.sum(indicators ** 2))
+    relative_error = np.sqrt(error2 / (energy + error2)) if energy + error2 > 0 else 0.0
+    return ErrorEstimate(indicators, energy, float(relative_error), recovered)
+
+
+def element_sizes(element_nodes, areas):
+    """
+    Characteristic length of every element.
+
+    sqrt(A) for quadrilaterals and the side of the equilateral triangle of
+    area A for triangles, which is what Gmsh sizes refer to.
+    """
+    areas = np.abs(np.asarray(areas, dtype=float))
+    n_el_nodes = np.concatenate([
+        np.full(np.shape(nodes)[0], np.shape(nodes)[1]) for nodes in element_nodes
+    ])
+    return np.where(n_el_nodes == 3, np.sqrt(4.0 * areas / np.sqrt(3.0)), np.sqrt(areas))
+
+
+def refined_sizes(estimate, sizes, tolerance, order=1, mark_factor=1.0, min_ratio=0.25):
+    """
+    New element sizes that equidistribute the error at the tolerance.
+
+    An element's target error is the share of the allowed global error,
+    ``tolerance * sqrt((energy + error**2) / n_elements)``. Elements whose
+    indicator exceeds ``mark_factor`` times the target are marked and get
+    ``h * (target / indicator)**(1 / order)``, limited to ``min_ratio * h``;
+    the other elements keep their size.
+
+    Parameters
+    ----------
+    estimate : ErrorEstimate
+    sizes : ndarray, shape (n_elements,)
+        Current element sizes, e.g. from ``element_sizes``.
+    tolerance : float
+        Target relative error.
+    order : int
+        Polynomial order of the elements (convergence rate in the energy
+        norm).
+    mark_factor : float
+        Marking threshold relative to the target error.
+    min_ratio : float
+        Smallest allowed size reduction per step.
+
+    Returns
+    -------
+    new_sizes : ndarray, shape (n_elements,)
+    marked : ndarray of bool, shape (n_elements,)
+    """
+    indicators = estimate.indicators
+    error2 = float(np.sum(indicators ** 2))
+    target = tolerance * np.sqrt((estimate.energy + error2) / indicators.size)
+    marked = indicators > mark_factor * target
+
+    ratio = np.ones_like(indicators)
+    ratio[marked] = np.maximum(
+        (target / indicators[marked]) ** (1.0 / order), min_ratio
+    )
+    return np.asarray(sizes) * ratio, marked
+
+
+def nodal_sizes(element_nodes, sizes, n_nodes):
+    """Smallest size of the elements around every node (inf for unused nodes)."""
+    nodal = np.full(n_nodes, np.inf)
+    offset = 0
+    for nodes in element_nodes:
+        nodes = np.asarray(nodes)
+        block = np.asarray(sizes)[offset:offset + nodes.shape[0]]
+        np.minimum.at(nodal, nodes.ravel(), np.repeat(block, nodes.shape[1]))
+        offset += nodes.shape[0]
+    return nodal
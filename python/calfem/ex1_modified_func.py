@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 import numpy as np
+from scipy.sparse import coo_matrix
+import batched_kernels as bk
 import calfem.core as cfc
 import calfem.geometry as cfg
 import calfem.mesh as cfm
@@ -70,7 +72,7 @@ def create_geometry(plate_width, plate_height, slot_width, slot_depth):
     return g
 
 
-def create_mesh(geometry, el_type, dofs_per_node):
+def create_mesh(geometry, el_type, dofs_per_node, el_size_factor=1.0):
     """
     Discretise the geometry into finite elements using Gmsh.
 
@@ -82,6 +84,8 @@ def create_mesh(geometry, el_type, dofs_per_node):
         Element type identifier (3 = Q4 four-node quadrilateral).
     dofs_per_node : int
         Number of degrees of freedom per node (1 for a scalar field).
+    el_size_factor : float, optional
+        Gmsh element size factor; smaller values give finer meshes.
 
     Returns
     -------
@@ -98,7 +102,7 @@ def create_mesh(geometry, el_type, dofs_per_node):
         Gmsh physical marker associated with each element.
     """
     mesh = cfm.GmshMesh(geometry)
-    mesh.el_size_factor = 1.0
+    mesh.el_size_factor = el_size_factor
     mesh.el_type = el_type
     mesh.dofs_per_node = dofs_per_node
     coords, edof, dofs, bdofs, element_markers = mesh.create()
@@ -109,9 +113,10 @@ def assemble_stiffness(edof, ex, ey, ep, D, n_dofs):
     """
     Assemble the global stiffness (conductivity) matrix.
 
-    Loops over all elements, computes each element stiffness matrix
-    with ``cfc.flw2i4e``, and accumulates the contributions into the
-    global matrix via ``cfc.assem``.
+    Computes all element stiffness matrices at once with
+    ``bk.flw2i4e_batch`` (the batched ``cfc.flw2i4e``) and collects the
+    contributions as (row, col, value) triplets that are summed into a
+    sparse matrix.
 
     Parameters
     ----------
@@ -130,14 +135,17 @@ def assemble_stiffness(edof, ex, ey, ep, D, n_dofs):
 
     Returns
     -------
-    K : ndarray, shape (n_dofs, n_dofs)
+    K : scipy.sparse.csr_matrix, shape (n_dofs, n_dofs)
         Assembled global stiffness matrix.
     """
-    K = np.zeros([n_dofs, n_dofs])
-    for eltopo, elx, ely in zip(edof, ex, ey):
-        Ke = cfc.flw2i4e(elx, ely, ep, D)
-        cfc.assem(eltopo, K, Ke)
-    return K
+    edof0  = np.asarray(edof) - 1
+    n_edof = edof0.shape[1]
+
+    Ke_all = bk.flw2i4e_batch(ex, ey, ep, D)
+
+    rows = np.repeat(edof0, n_edof, axis=1).ravel()
+    cols = np.tile(edof0, (1, n_edof)).ravel()
+    return coo_matrix((Ke_all.ravel(), (rows, cols)), shape=(n_dofs, n_dofs)).tocsr()
 
 
 def apply_boundary_conditions(bdofs, left_value, right_value):
@@ -176,8 +184,10 @@ def compute_flux_magnitudes(ex, ey, ep, D, element_potentials):
     Compute the flux magnitude at the centre of every element.
 
     For each element the flux vector **q** = -D ∇φ is evaluated at the
-    central integration point using ``cfc.flw2i4s``. The Euclidean
-    magnitude |**q**| = √(qx² + qy²) is returned as a scalar per element.
+    integration points using ``bk.flw2i4s_batch`` (the batched
+    ``cfc.flw2i4s``) and averaged; with the one-point rule this is the
+    centre value. The magnitude |**q**| = √(qx² + qy²) is returned per
+    element.
 
     Parameters
     ----------
@@ -194,14 +204,12 @@ def compute_flux_magnitudes(ex, ey, ep, D, element_potentials):
 
     Returns
     -------
-    list of float
-        Flux magnitude at the centre of each element, in the same order
-        as the rows of ``element_potentials``.
+    ndarray, shape (n_elements,)
+        Flux magnitude of each element, in the same order as the rows of
+        ``element_potentials``.
     """
-    flux_magnitude = []
-    for i in range(element_potentials.shape[0]):
-        es, _, _ = cfc.flw2i4s(ex[i, :], ey[i, :], ep, D, element_potentials[i, :])
-        flux_magnitude.append(np.sqrt(es[0, 0]**2 + es[0, 1]**2))
+    es, _, _ = bk.flw2i4s_batch(ex, ey, ep, D, element_potentials)
+    _, flux_magnitude = bk.element_flux(es)
     return flux_magnitude
 
 
@@ -218,7 +226,7 @@ def visualize(g, flux_magnitude, coords, edof, dofs_per_node, el_type, nodal_pot
     ----------
     g : cfg.Geometry
         Geometry object used to draw the domain outline.
-    flux_magnitude : list of float
+    flux_magnitude : ndarray, shape (n_elements,)
         Per-element flux magnitude values.
     coords : ndarray, shape (n_nodes, 2)
         Global node coordinates.
@@ -268,22 +276,23 @@ def main():
     D  = np.identity(2, "float")  # isotropic conductivity tensor
     ep = [1.0, 1]                 # element params: [thickness, integration order]
 
-    el_type       = 3  # Q4: 4-node quadrilateral element
-    dofs_per_node = 1  # scalar field (one potential per node)
+    el_type        = 3    # Q4: 4-node quadrilateral element
+    dofs_per_node  = 1    # scalar field (one potential per node)
+    el_size_factor = 1.0  # Gmsh element size factor
 
     # Build geometry and mesh
     g = create_geometry(plate_width, plate_height, slot_width, slot_depth)
-    coords, edof, dofs, bdofs, _ = create_mesh(g, el_type, dofs_per_node)
+    coords, edof, dofs, bdofs, _ = create_mesh(g, el_type, dofs_per_node, el_size_factor)
 
     # Assemble global stiffness matrix
     n_dofs = np.size(dofs)
-    ex, ey = cfc.coordxtr(edof, coords, dofs)
+    ex, ey = bk.element_coordinates(edof, coords, dofs)
     K = assemble_stiffness(edof, ex, ey, ep, D, n_dofs)
 
     # Apply boundary conditions and solve
     load_vector       = np.zeros([n_dofs, 1])
     bc_dofs, bc_values = apply_boundary_conditions(bdofs, left_value=0.0, right_value=10.0)
-    nodal_potentials, _ = cfc.solveq(K, load_vector, bc_dofs, bc_values)
+    nodal_potentials, _ = cfc.spsolveq(K, load_vector, bc_dofs, bc_values)
 
     # Post-process: compute per-element flux magnitudes
     element_potentials = cfc.extract_eldisp(edof, nodal_potentials)
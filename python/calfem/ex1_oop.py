@@ -1,13 +1,99 @@
 # -*- coding: utf-8 -*-
 
+from collections import OrderedDict
+from types import MappingProxyType
+
 import numpy as np
-import calfem.core as cfc
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import splu
+import batched_kernels as bk
+import matrix_free as mf
+import multigrid as mg
+import size_fields as sf
 import calfem.geometry as cfg
-import calfem.mesh as cfm
 import calfem.vis_mpl as cfv
 import calfem.utils as cfu
 
 
+class MeshCache:
+    """
+    In-process LRU cache of generated meshes.
+
+    Entries are shared between solver instances, so every cached array is
+    made read-only and ``bdofs`` is stored as a read-only mapping of
+    read-only arrays.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of meshes kept; the least recently used mesh is
+        evicted first.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize  = maxsize
+        self.hits     = 0
+        self.misses   = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, create):
+        """
+        Return the cached mesh for key, calling ``create()`` on a miss.
+
+        Parameters
+        ----------
+        key : tuple
+            Hashable mesh key.
+        create : callable
+            Returns a dict of mesh data (arrays and ``bdofs``).
+
+        Returns
+        -------
+        dict
+            Read-only mesh data.
+        """
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        self.misses += 1
+        entry = {name: _read_only(value) for name, value in create().items()}
+        self._entries[key] = entry
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        self._entries.clear()
+        self.hits   = 0
+        self.misses = 0
+
+
+def _read_only(value):
+    """Read-only view of an array, or a read-only mapping of read-only arrays."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _read_only(np.asarray(item))
+                                 for key, item in value.items()})
+    value = np.asarray(value).view()
+    value.flags.writeable = False
+    return value
+
+
+# Meshes shared by all PotentialFlowSolver instances of this process.
+MESH_CACHE = MeshCache()
+
+
 class NotchedPlateGeometry:
     """
     Geometry of a rectangular plate with a narrow slot cut into the top centre.
@@ -32,8 +118,15 @@ class NotchedPlateGeometry:
     right_marker : int
         Gmsh marker for the left portion of the top edge (adjacent to the
         slot left opening). Must be a unique positive integer.
+    el_sizes : sequence of float or dict, optional
+        Characteristic element length at the eight geometry points, as a
+        sequence in point order or a dict {point index: length}. Points not
+        given use 1.0. Gmsh scales all lengths by ``el_size_factor``.
     """
 
+    # Re-entrant corners at the slot bottom, where the flux is singular.
+    SLOT_TIP_POINTS = (4, 5)
+
     def __init__(
         self,
         plate_width,
@@ -42,6 +135,7 @@ class NotchedPlateGeometry:
         slot_depth,
         left_marker=80,
         right_marker=90,
+        el_sizes=None,
     ):
         self.plate_width  = plate_width
         self.plate_height = plate_height
@@ -49,6 +143,7 @@ class NotchedPlateGeometry:
         self.slot_depth   = slot_depth
         self.left_marker  = left_marker
         self.right_marker = right_marker
+        self.el_sizes     = self._point_sizes(el_sizes)
         self._geometry    = None
 
     @property
@@ -64,6 +159,52 @@ class NotchedPlateGeometry:
             self._geometry = self._build()
         return self._geometry
 
+    def cache_key(self):
+        """
+        Parameters that fully determine the geometry.
+
+        Returns
+        -------
+        tuple
+        """
+        return (
+            self.plate_width, self.plate_height,
+            self.slot_width, self.slot_depth,
+            self.left_marker, self.right_marker,
+            self.el_sizes,
+        )
+
+    def is_mirror_symmetric(self):
+        """True if the point sizes are symmetric about x = plate_width / 2."""
+        sizes = self.el_sizes
+        return all(sizes[i] == sizes[j] for i, j in ((0, 1), (2, 7), (3, 6), (4, 5)))
+
+    def half(self, symmetry_marker=70):
+        """
+        Left half of the plate, cut at the symmetry line x = plate_width / 2.
+
+        Parameters
+        ----------
+        symmetry_marker : int
+            Gmsh marker of the symmetry line below the slot.
+
+        Returns
+        -------
+        HalfNotchedPlateGeometry
+        """
+        return HalfNotchedPlateGeometry(self, symmetry_marker)
+
+    @staticmethod
+    def _point_sizes(el_sizes):
+        """Characteristic lengths of the eight points as a tuple."""
+        if el_sizes is None:
+            return (1.0,) * 8
+        if isinstance(el_sizes, dict):
+            return tuple(float(el_sizes.get(i, 1.0)) for i in range(8))
+        if len(el_sizes) != 8:
+            raise ValueError("el_sizes must give one length per geometry point (8)")
+        return tuple(float(size) for size in el_sizes)
+
     def _build(self):
         """Construct and return the CALFEM Geometry object."""
         slot_right_x  = self.plate_width / 2 + self.slot_width / 2
@@ -73,14 +214,15 @@ class NotchedPlateGeometry:
         g = cfg.Geometry()
 
         # Outer boundary and slot corners (0-indexed)
-        g.point([0,                0])                  # 0: bottom-left
-        g.point([self.plate_width, 0])                  # 1: bottom-right
-        g.point([self.plate_width, self.plate_height])  # 2: top-right
-        g.point([slot_right_x,     self.plate_height])  # 3: slot top-right
-        g.point([slot_right_x,     slot_bottom_y])      # 4: slot bottom-right
-        g.point([slot_left_x,      slot_bottom_y])      # 5: slot bottom-left
-        g.point([slot_left_x,      self.plate_height])  # 6: slot top-left
-        g.point([0,                self.plate_height])  # 7: top-left
+        sizes = self.el_sizes
+        g.point([0,                0],                 el_size=sizes[0])  # 0: bottom-left
+        g.point([self.plate_width, 0],                 el_size=sizes[1])  # 1: bottom-right
+        g.point([self.plate_width, self.plate_height], el_size=sizes[2])  # 2: top-right
+        g.point([slot_right_x,     self.plate_height], el_size=sizes[3])  # 3: slot top-right
+        g.point([slot_right_x,     slot_bottom_y],     el_size=sizes[4])  # 4: slot bottom-right
+        g.point([slot_left_x,      slot_bottom_y],     el_size=sizes[5])  # 5: slot bottom-left
+        g.point([slot_left_x,      self.plate_height], el_size=sizes[6])  # 6: slot top-left
+        g.point([0,                self.plate_height], el_size=sizes[7])  # 7: top-left
 
         g.spline([0, 1])                                # bottom edge
         g.spline([1, 2])                                # right edge
@@ -96,6 +238,121 @@ class NotchedPlateGeometry:
         return g
 
 
+class HalfNotchedPlateGeometry(NotchedPlateGeometry):
+    """
+    Left half of a ``NotchedPlateGeometry``.
+
+    Keeps the ``right_marker`` top-edge segment and adds ``symmetry_marker``
+    on the cut x = plate_width / 2 between the bottom edge and the slot
+    bottom. The slot walls and the half slot bottom stay insulated.
+
+    Parameters
+    ----------
+    full : NotchedPlateGeometry
+        The full plate.
+    symmetry_marker : int
+        Gmsh marker of the symmetry line.
+    """
+
+    def __init__(self, full, symmetry_marker=70):
+        super().__init__(
+            full.plate_width, full.plate_height, full.slot_width, full.slot_depth,
+            full.left_marker, full.right_marker, full.el_sizes,
+        )
+        self.symmetry_marker = symmetry_marker
+
+    def cache_key(self):
+        return super().cache_key() + ("half", self.symmetry_marker)
+
+    def _build(self):
+        """Construct and return the CALFEM Geometry object of the half plate."""
+        centre_x      = self.plate_width / 2
+        slot_left_x   = centre_x - self.slot_width / 2
+        slot_bottom_y = self.plate_height - self.slot_depth
+
+        g = cfg.Geometry()
+
+        # Sizes of the corresponding full-plate points; the cut points lie
+        # between mirrored points of equal size.
+        sizes = self.el_sizes
+        g.point([0,           0],                 el_size=sizes[0])  # 0: bottom-left
+        g.point([centre_x,    0],                 el_size=sizes[0])  # 1: bottom centre
+        g.point([centre_x,    slot_bottom_y],     el_size=sizes[5])  # 2: slot bottom centre
+        g.point([slot_left_x, slot_bottom_y],     el_size=sizes[5])  # 3: slot bottom-left
+        g.point([slot_left_x, self.plate_height], el_size=sizes[6])  # 4: slot top-left
+        g.point([0,           self.plate_height], el_size=sizes[7])  # 5: top-left
+
+        g.spline([0, 1])                                # bottom edge
+        g.spline([1, 2], marker=self.symmetry_marker)   # symmetry line (BC)
+        g.spline([2, 3])                                # half slot bottom
+        g.spline([3, 4])                                # slot left outer wall
+        g.spline([4, 5], marker=self.right_marker)      # left portion of top edge (BC)
+        g.spline([5, 0])                                # left edge
+
+        g.surface([0, 1, 2, 3, 4, 5])
+
+        return g
+
+
+def mirror_mesh(coords, nodes, mirror_x, tol=1e-9):
+    """
+    Mirror a 2-D mesh about the line x = mirror_x.
+
+    Nodes on the mirror line are shared. The mirrored elements have their
+    node order reversed so that they stay counter-clockwise.
+
+    Parameters
+    ----------
+    coords : ndarray, shape (n_nodes, 2)
+    nodes : ndarray, shape (n_elements, n_el_nodes)
+        0-based element nodes.
+    mirror_x : float
+    tol : float
+        Distance below which a node counts as lying on the mirror line.
+
+    Returns
+    -------
+    full_coords : ndarray, shape (n_full_nodes, 2)
+        The original nodes followed by the mirrored off-line nodes.
+    full_nodes : ndarray, shape (2 * n_elements, n_el_nodes)
+        The original elements followed by the mirrored ones.
+    mirror : ndarray of int, shape (n_nodes,)
+        Full-mesh index of the mirror image of every original node.
+    """
+    coords = np.asarray(coords, dtype=float)[:, :2]
+    nodes  = np.asarray(nodes)
+    n_nodes = coords.shape[0]
+
+    on_line = np.abs(coords[:, 0] - mirror_x) < tol
+    off     = np.flatnonzero(~on_line)
+    mirror  = np.arange(n_nodes)
+    mirror[off] = n_nodes + np.arange(off.size)
+
+    mirrored = coords[off].copy()
+    mirrored[:, 0] = 2 * mirror_x - mirrored[:, 0]
+    full_coords = np.vstack([coords, mirrored])
+    full_nodes  = np.vstack([nodes, mirror[nodes][:, ::-1]])
+    return full_coords, full_nodes, mirror
+
+
+# Print the DOF/accuracy trade-off of uniform and graded meshes in main().
+REFINEMENT_STUDY = False
+
+# Linear solver of main(): "direct", "cg", "multigrid" or "mgcg" (multigrid
+# uses integration order 2, see PotentialFlowSolver).
+LINEAR_SOLVER = "direct"
+
+# Solve main() on the left half of the plate, mirrored back (the plate, its
+# mesh sizes and the conductivity are symmetric).
+USE_SYMMETRY = False
+
+# Time steps (dt, n_steps) of a transient run from zero potential in main(),
+# written to TRANSIENT_FILE every TRANSIENT_STRIDE steps; None skips it.
+TRANSIENT_STEPS  = None
+TRANSIENT_FILE   = "transient_potentials.npy"
+TRANSIENT_STRIDE = 10
+
+
 class PotentialFlowSolver:
     """
     FEM solver for 2-D steady-state potential flow.
@@ -104,19 +361,77 @@ class PotentialFlowSolver:
     boundary condition application, solving, and flux post-processing.
     Results are stored as instance attributes after calling ``solve()``.
 
+    The problem is linear in the two prescribed potentials, so the solver
+    computes two unit solutions (left = 1, right = 0 and left = 0,
+    right = 1) once and evaluates any boundary-value pair as a linear
+    combination of them. Call ``reset()`` after changing the geometry or
+    the conductivity.
+
     Parameters
     ----------
     geometry : NotchedPlateGeometry
         Problem geometry supplying the CALFEM Geometry object and
         boundary marker IDs.
-    conductivity : ndarray, shape (2, 2)
-        Conductivity tensor D (use ``np.identity(2)`` for isotropic).
+    conductivity : ndarray or callable
+        Conductivity tensor D: one (2, 2) tensor for the whole plate (use
+        ``np.identity(2)`` for isotropic), an (n_elements, 2, 2) array with
+        one tensor per element of the Gmsh mesh, or a callable
+        ``conductivity(x, y)`` taking the element centroid coordinates as
+        arrays of shape (n_elements,) and returning an (n_elements, 2, 2)
+        array. The resolved tensors are kept in ``element_conductivity``.
     el_type : int
         Element type identifier (3 = Q4 four-node quadrilateral).
     dofs_per_node : int
         Number of degrees of freedom per node (1 for a scalar field).
     thickness : float
         Out-of-plane thickness for the 2-D plane formulation.
+    integration_order : int
+        Gauss rule of the elements (1, 2 or 3 points per direction). The
+        multigrid solvers use at least 2 (see ``linear_solver``).
+    el_size_factor : float
+        Gmsh element size factor; smaller values give finer meshes.
+    mesh_cache : MeshCache or None
+        Cache to share meshes through (the module-level ``MESH_CACHE`` by
+        default); None meshes every time.
+    size_fields : sequence of DistanceThreshold
+        Gmsh size fields grading the mesh, e.g. towards
+        ``NotchedPlateGeometry.SLOT_TIP_POINTS``.
+    linear_solver : str
+        "direct" assembles K and factorizes it; "cg" never assembles K and
+        solves with matrix-free Jacobi-preconditioned CG; "multigrid" runs
+        geometric multigrid V-cycles and "mgcg" CG preconditioned with one
+        V-cycle. The multigrid solvers refine the Gmsh mesh ``mg_levels - 1``
+        times and solve on the finest mesh. They raise ``integration_order``
+        to 2: the hourglass modes of the one-point rule are neither
+        smoothed nor seen by the coarse levels, so multigrid would stall.
+        The iterative solvers warn if they stop unconverged;
+        ``solver_info["converged"]`` records it per unit case.
+        Only "mgcg" solves about as fast as "direct". The iteration count of
+        Jacobi-preconditioned "cg" grows like 1/h, and at about 30k DOFs it
+        takes several times as long as the sparse factorization. "cg" holds
+        less memory than the CSR matrix only with the one-point rule (see
+        ``operator_storage``). The multigrid hierarchy holds more memory
+        than CSR.
+    operator_storage : str
+        What the matrix-free operator keeps per element: "auto" (the
+        smaller of "gradients" and "matrices" for the Gauss rule),
+        "gradients", "matrices" or "recompute" (see
+        ``matrix_free.ElementOperator``).
+    cg_tol : float
+        Relative residual at which the iterative solvers stop.
+    mg_levels : int
+        Number of multigrid levels, including the Gmsh mesh.
+    use_symmetry : bool
+        Solve on the left half of the plate when the problem is mirror
+        symmetric (symmetric point sizes, no size fields, a single
+        conductivity tensor without off-diagonal terms). The potential is
+        then antisymmetric about the mean of the two boundary values,
+        which is prescribed on the symmetry line; the results are
+        mirrored back to the full plate.
+        ``half_model`` tells whether the half model was used.
+    capacity : float or ndarray, shape (n_elements,)
+        Capacity per unit volume of the transient problem (see
+        ``solve_transient``).
     """
 
     def __init__(
@@ -126,12 +441,36 @@ class PotentialFlowSolver:
         el_type=3,
         dofs_per_node=1,
         thickness=1.0,
+        integration_order=1,
+        el_size_factor=1.0,
+        mesh_cache=MESH_CACHE,
+        size_fields=(),
+        linear_solver="direct",
+        operator_storage="auto",
+        cg_tol=1e-10,
+        mg_levels=3,
+        use_symmetry=False,
+        capacity=1.0,
     ):
-        self.geometry      = geometry
-        self.conductivity  = conductivity
-        self.el_type       = el_type
-        self.dofs_per_node = dofs_per_node
-        self.ep            = [thickness, 1]  # [thickness, integration_order]
+        self.geometry         = geometry
+        self.conductivity     = conductivity
+        self.el_type          = el_type
+        self.dofs_per_node    = dofs_per_node
+        if linear_solver in ("multigrid", "mgcg"):
+            integration_order = max(integration_order, 2)
+        self.ep               = [thickness, integration_order]
+        self.el_size_factor   = el_size_factor
+        self.mesh_cache       = mesh_cache
+        self.size_fields      = tuple(size_fields)
+        self.linear_solver    = linear_solver
+        self.operator_storage = operator_storage
+        self.cg_tol           = cg_tol
+        self.mg_levels        = mg_levels
+        self.mg_hierarchy     = None
+        self.use_symmetry     = use_symmetry
+        self.half_model       = False
+        self.capacity         = capacity
+        self.solver_info      = None
 
         # Mesh data — populated by solve()
         self.coords = None
@@ -141,9 +480,23 @@ class PotentialFlowSolver:
         self.ex     = None
         self.ey     = None
 
+        # Conductivity of every element of the mesh — populated with the mesh
+        self.element_conductivity = None
+
         # Solution data — populated by solve()
-        self.nodal_potentials = None
-        self.flux_magnitudes  = None
+        self.nodal_potentials = None   # (n_dofs, 1)
+        self.reactions        = None   # (n_dofs, 1), boundary flows K a
+        self.flux_magnitudes  = None   # (n_elements,)
+
+        # Unit solutions — populated on first solve
+        self.basis_potentials = None   # (n_dofs, 2)
+        self.basis_reactions  = None   # (n_dofs, 2)
+        self.basis_fluxes     = None   # (n_elements, 2 components, 2 cases)
+
+        # Transient matrices (K, C) and the factorized step matrices per
+        # (dt, theta) — populated by solve_transient()
+        self.transient_matrices = None
+        self.step_factors       = {}
 
     def solve(self, left_value=0.0, right_value=10.0):
         """
@@ -152,6 +505,8 @@ class PotentialFlowSolver:
         Meshes the geometry, assembles the global stiffness matrix, applies
         Dirichlet boundary conditions, solves the linear system, and computes
         per-element flux magnitudes. All results are stored as attributes.
+        Mesh, stiffness and unit solutions are computed on the first call
+        only; later calls just combine the cached unit solutions.
 
         Parameters
         ----------
@@ -160,56 +515,487 @@ class PotentialFlowSolver:
         right_value : float
             Prescribed potential on the ``right_marker`` boundary.
         """
-        self._create_mesh()
-        K = self._assemble_stiffness()
-        bc_dofs, bc_values = self._build_boundary_conditions(left_value, right_value)
+        potentials, flux_magnitudes = self.solve_many([(left_value, right_value)])
+        self.nodal_potentials = potentials[0][:, None]
+        self.reactions        = self.basis_reactions @ np.array(
+            [[left_value], [right_value]], float
+        )
+        self.flux_magnitudes  = flux_magnitudes[0]
 
-        n_dofs      = np.size(self.dofs)
-        load_vector = np.zeros([n_dofs, 1])
+    def solve_many(self, value_pairs):
+        """
+        Evaluate many boundary-value pairs by superposition.
+
+        Parameters
+        ----------
+        value_pairs : array_like, shape (n_cases, 2)
+            (left_value, right_value) of every case.
 
-        self.nodal_potentials, _ = cfc.solveq(K, load_vector, bc_dofs, bc_values)
+        Returns
+        -------
+        potentials : ndarray, shape (n_cases, n_dofs)
+            Nodal potentials of every case.
+        flux_magnitudes : ndarray, shape (n_cases, n_elements)
+            Element flux magnitudes of every case.
+        """
+        self._compute_basis()
+        weights = np.asarray(value_pairs, dtype=float).reshape(-1, 2)
 
-        element_potentials   = cfc.extract_eldisp(self.edof, self.nodal_potentials)
-        self.flux_magnitudes = self._compute_flux_magnitudes(element_potentials)
+        potentials = weights @ self.basis_potentials.T
+        flux       = np.einsum("ejb,cb->cej", self.basis_fluxes, weights)
+        return potentials, np.sqrt((flux**2).sum(axis=2))
+
+    def boundary_flow(self, marker):
+        """
+        Total flow through a marked boundary for the last ``solve()``.
+
+        Parameters
+        ----------
+        marker : int
+            Boundary marker.
+
+        Returns
+        -------
+        float
+            Sum of the reactions on the marker's DOFs; positive where
+            flow enters the domain through the boundary.
+        """
+        marker_dofs = np.asarray(self.bdofs[marker], dtype=int) - 1
+        return float(self.reactions[marker_dofs, 0].sum())
+
+    def solve_transient(
+        self,
+        time_steps,
+        left_value=0.0,
+        right_value=10.0,
+        theta=1.0,
+        initial_value=0.0,
+        snapshot_file=None,
+        snapshot_stride=1,
+    ):
+        """
+        Time stepping of C da/dt + K a = 0 with the theta method.
+
+        Each step solves
+
+            (C + theta dt K) a_new = (C - (1 - theta) dt K) a_old
+
+        on the free DOFs with the potentials on the two top-edge segments
+        held at ``left_value`` and ``right_value``. K and C are assembled
+        once, and the step matrix is factorized once per (dt, theta) and
+        kept, so the steps, and later calls with the same step sizes, are
+        back-substitutions only. theta = 1 is backward Euler, 0.5
+        Crank-Nicolson; theta < 0.5 is only conditionally stable.
+
+        Every ``snapshot_stride``-th state, starting with the initial one,
+        is written to ``snapshot_file`` as it is computed; only the current
+        and the previous state are held in memory. The final state is
+        stored like the results of ``solve()``, with the reactions of the
+        last step (capacity and conduction terms).
+
+        Parameters
+        ----------
+        time_steps : sequence of (float, int)
+            (dt, n_steps) pairs, run in order.
+        left_value : float
+            Prescribed potential on the ``left_marker`` boundary.
+        right_value : float
+            Prescribed potential on the ``right_marker`` boundary.
+        theta : float
+            Implicitness, 0 <= theta <= 1.
+        initial_value : float or ndarray, shape (n_dofs,)
+            Initial potentials (overridden on the prescribed DOFs).
+        snapshot_file : str, optional
+            .npy file for the snapshots; without it they are kept in memory.
+        snapshot_stride : int
+            Steps between snapshots.
+
+        Returns
+        -------
+        times : ndarray, shape (n_snapshots,)
+        snapshots : ndarray or np.memmap, shape (n_snapshots, n_dofs)
+        """
+        time_steps = [(float(dt), int(n_steps)) for dt, n_steps in time_steps]
+        if self.edof is None:
+            self.half_model = False
+            self._create_mesh()
+        n_dofs = np.size(self.dofs)
+
+        if self.transient_matrices is None:
+            capacity_ep = [self.ep[0], max(self.ep[1], 2)]
+            self.transient_matrices = (
+                self._assemble_stiffness(),
+                self._assemble_element_matrices(
+                    bk.flw2i4m_batch(self.ex, self.ey, capacity_ep, self.capacity)
+                ),
+            )
+        K, C = self.transient_matrices
+
+        bc_dofs, bc_values = self._build_boundary_conditions(
+            (self.geometry.left_marker, self.geometry.right_marker),
+            (left_value, right_value),
+        )
+        prescribed = bc_dofs - 1
+        free = np.setdiff1d(np.arange(n_dofs), prescribed)
+
+        a = np.array(np.broadcast_to(np.asarray(initial_value, dtype=float), (n_dofs,)))
+        a[prescribed] = bc_values
+
+        n_total = sum(n_steps for _, n_steps in time_steps)
+        n_snapshots = n_total // snapshot_stride + 1
+        if snapshot_file is None:
+            snapshots = np.empty((n_snapshots, n_dofs))
+        else:
+            snapshots = np.lib.format.open_memmap(
+                snapshot_file, mode="w+", dtype=np.float64, shape=(n_snapshots, n_dofs)
+            )
+        times = np.empty(n_snapshots)
+        snapshots[0], times[0] = a, 0.0
+
+        t, step, a_old = 0.0, 0, a
+        for dt, n_steps in time_steps:
+            lu, A_fp, B = self._step_factor(K, C, dt, theta, free, prescribed)
+            # The prescribed values are constant, so is their load.
+            load = A_fp @ a[prescribed]
+            for _ in range(n_steps):
+                a_old = a.copy()
+                a[free] = lu.solve((B @ a_old)[free] - load)
+                t += dt
+                step += 1
+                if step % snapshot_stride == 0:
+                    snapshots[step // snapshot_stride] = a
+                    times[step // snapshot_stride] = t
+        if snapshot_file is not None:
+            snapshots.flush()
+
+        edof0 = np.asarray(self.edof) - 1
+        self.nodal_potentials = a[:, None]
+        if step > 0:
+            self.reactions = (
+                C @ (a - a_old) / dt + K @ (theta * a + (1.0 - theta) * a_old)
+            )[:, None]
+        else:
+            self.reactions = (K @ a)[:, None]
+        self.flux_magnitudes = np.hypot(*self._compute_flux_vectors(a[edof0]).T)
+        return times, snapshots
+
+    def reset(self):
+        """Discard the cached mesh, unit solutions and transient matrices."""
+        self.basis_potentials   = None
+        self.basis_reactions    = None
+        self.basis_fluxes       = None
+        self.transient_matrices = None
+        self.step_factors       = {}
+        self.edof               = None
 
     # ------------------------------------------------------------------
     # Private pipeline steps
     # ------------------------------------------------------------------
 
+    def _compute_basis(self):
+        """Mesh, assemble and solve the two unit cases, if not yet done."""
+        if self.basis_potentials is not None:
+            return
+
+        self.half_model = self.use_symmetry and self._is_mirror_symmetric()
+        self._create_mesh()
+        n_dofs = np.size(self.dofs)
+
+        # Both unit cases prescribe the same DOFs; only the values differ.
+        # The half model prescribes the right_marker and symmetry line values.
+        geometry = self._mesh_geometry()
+        markers  = (
+            (geometry.right_marker, geometry.symmetry_marker) if self.half_model
+            else (geometry.left_marker, geometry.right_marker)
+        )
+        bc_dofs, first_unit  = self._build_boundary_conditions(markers, (1.0, 0.0))
+        _,       second_unit = self._build_boundary_conditions(markers, (0.0, 1.0))
+        prescribed = bc_dofs - 1
+        bc_unit    = np.column_stack([first_unit, second_unit]).astype(float)
+
+        if self.linear_solver == "direct":
+            K = self._assemble_stiffness()
+            free   = np.setdiff1d(np.arange(n_dofs), prescribed)
+            K_free = K[free]
+            basis = np.zeros((n_dofs, 2))
+            basis[prescribed] = bc_unit
+            basis[free] = splu(K_free[:, free].tocsc()).solve(
+                -(K_free[:, prescribed] @ bc_unit)
+            )
+            reactions = K @ basis
+            self.solver_info = {"stiffness_bytes": mf.csr_nbytes(K)}
+        elif self.linear_solver == "cg":
+            operator = mf.ElementOperator(
+                self.edof, n_dofs, self.ex, self.ey, self.ep, self.element_conductivity,
+                storage=self.operator_storage,
+            )
+            basis, self.solver_info = mf.solve_constrained(
+                operator, prescribed, bc_unit, tol=self.cg_tol
+            )
+            reactions = operator.apply(basis)
+        elif self.linear_solver in ("multigrid", "mgcg"):
+            levels, prolongations = self.mg_hierarchy
+            multigrid = mg.GeometricMultigrid(
+                levels, prolongations, self.ex, self.ey, self.ep, self.element_conductivity,
+                prescribed, storage=self.operator_storage,
+            )
+            basis, self.solver_info = mf.solve_constrained(
+                multigrid.operator, prescribed, bc_unit, tol=self.cg_tol,
+                preconditioner=multigrid.preconditioner,
+                iterate=mf.pcg if self.linear_solver == "mgcg" else mg.richardson,
+            )
+            self.solver_info["operator_bytes"] = multigrid.nbytes
+            self.solver_info["level_dofs"] = [op.n_dofs for op in multigrid.operators]
+            reactions = multigrid.operator.apply(basis)
+        else:
+            raise ValueError(f"Unknown linear solver '{self.linear_solver}'")
+
+        if self.half_model:
+            # (right, symmetry line) unit cases -> (left, right) unit cases:
+            # the symmetry line carries the mean of the two values.
+            to_left_right = np.array([[0.0, 1.0], [0.5, 0.5]])
+            basis     = basis @ to_left_right
+            reactions = reactions @ to_left_right
+
+        edof0  = np.asarray(self.edof) - 1
+        fluxes = np.stack([
+            self._compute_flux_vectors(basis[edof0, k]) for k in range(2)
+        ], axis=2)
+
+        if self.half_model:
+            basis, reactions, fluxes = self._mirror_results(basis, reactions, fluxes)
+
+        self.basis_potentials = basis
+        self.basis_reactions  = reactions
+        self.basis_fluxes     = fluxes
+
+    def _is_mirror_symmetric(self):
+        """True if the problem is symmetric about x = plate_width / 2."""
+        if callable(self.conductivity):
+            return False
+        D = np.asarray(self.conductivity, dtype=float)
+        return (
+            D.ndim == 2
+            and D[0, 1] == 0.0 and D[1, 0] == 0.0
+            and self.geometry.is_mirror_symmetric()
+            and not self.size_fields
+            and self.dofs_per_node == 1
+        )
+
+    def _mesh_geometry(self):
+        """The geometry that is meshed: the full plate or its left half."""
+        return self.geometry.half() if self.half_model else self.geometry
+
+    def _mirror_results(self, basis, reactions, fluxes):
+        """
+        Extend half-model unit solutions to the full plate.
+
+        The mirror image of a node carries (left + right) - potential, which
+        is 1 - potential for both unit cases; its reaction changes sign and
+        the mirrored element flux has its y component negated. Nodes on the
+        symmetry line become interior, with zero reaction.
+
+        Replaces the mesh data attributes with the full mirrored mesh.
+        """
+        geometry = self._mesh_geometry()
+        coords = np.asarray(self.coords)[:, :2]
+        nodes  = bk.element_nodes(self.edof, self.dofs)
+        node_dofs = np.asarray(self.dofs)[:, 0] - 1
+        dof_to_node = np.empty(np.size(self.dofs), dtype=int)
+        dof_to_node[node_dofs] = np.arange(coords.shape[0])
+
+        full_coords, full_nodes, mirror = mirror_mesh(
+            coords, nodes, self.geometry.plate_width / 2
+        )
+        n_half   = coords.shape[0]
+        off_line = mirror >= n_half
+
+        half_basis     = basis[node_dofs]
+        half_reactions = reactions[node_dofs]
+        half_reactions[~off_line] = 0.0
+        full_basis     = np.vstack([half_basis, 1.0 - half_basis[off_line]])
+        full_reactions = np.vstack([half_reactions, -half_reactions[off_line]])
+        full_fluxes    = np.vstack([fluxes, fluxes * np.array([1.0, -1.0])[None, :, None]])
+
+        bdofs = {}
+        for marker, marker_dofs in self.bdofs.items():
+            if marker == geometry.symmetry_marker:
+                continue
+            half_nodes = dof_to_node[np.asarray(marker_dofs, dtype=int) - 1]
+            if marker == geometry.right_marker:
+                bdofs[marker] = list(half_nodes + 1)
+                bdofs[geometry.left_marker] = list(mirror[half_nodes] + 1)
+            else:
+                bdofs[marker] = list(np.union1d(half_nodes, mirror[half_nodes]) + 1)
+
+        self.coords = full_coords
+        self.edof   = full_nodes + 1
+        self.dofs   = np.arange(1, full_coords.shape[0] + 1)[:, None]
+        self.bdofs  = bdofs
+        self.ex     = full_coords[full_nodes, 0]
+        self.ey     = full_coords[full_nodes, 1]
+        return full_basis, full_reactions, full_fluxes
+
     def _create_mesh(self):
-        """Mesh the geometry and populate mesh data attributes."""
-        mesh = cfm.GmshMesh(self.geometry.geometry)
-        mesh.el_size_factor = 1.0
+        """Mesh the geometry (or fetch it from the cache) and populate mesh data attributes."""
+        if self.mesh_cache is None:
+            mesh = self._generate_mesh()
+        else:
+            key  = self._mesh_geometry().cache_key() + (
+                self.el_size_factor, self.el_type, self.dofs_per_node,
+                self.size_fields,
+            )
+            mesh = self.mesh_cache.get(key, self._generate_mesh)
+
+        self.coords = mesh["coords"]
+        self.edof   = mesh["edof"]
+        self.dofs   = mesh["dofs"]
+        self.bdofs  = mesh["bdofs"]
+        self.ex     = mesh["ex"]
+        self.ey     = mesh["ey"]
+        self.element_conductivity = self._element_conductivity()
+
+        if self.linear_solver in ("multigrid", "mgcg"):
+            self._refine_mesh()
+
+    def _element_conductivity(self):
+        """
+        Conductivity of the current mesh, (2, 2) or (n_elements, 2, 2).
+
+        A callable conductivity is evaluated at the element centroids.
+        """
+        conductivity = self.conductivity
+        if callable(conductivity):
+            conductivity = conductivity(self.ex.mean(axis=1), self.ey.mean(axis=1))
+        D = np.asarray(conductivity, dtype=float)
+        n_elements = np.shape(self.edof)[0]
+        if D.shape not in ((2, 2), (n_elements, 2, 2)):
+            raise ValueError(
+                f"conductivity must have shape (2, 2) or ({n_elements}, 2, 2), got {D.shape}"
+            )
+        return D
+
+    def _refine_mesh(self):
+        """
+        Refine the mesh uniformly for multigrid.
+
+        Replaces the mesh data attributes with the finest mesh, whose DOFs
+        are numbered as its nodes, and keeps the element DOFs of every
+        level and the prolongations in ``mg_hierarchy``.
+        """
+        if self.el_type != 3 or self.dofs_per_node != 1:
+            raise ValueError("Multigrid needs Q4 elements (el_type 3) with one DOF per node")
+
+        coords = np.asarray(self.coords)[:, :2]
+        nodes  = bk.element_nodes(self.edof, self.dofs)
+        dof_to_node = np.empty(np.size(self.dofs), dtype=int)
+        dof_to_node[np.asarray(self.dofs)[:, 0] - 1] = np.arange(coords.shape[0])
+        node_sets = {
+            marker: dof_to_node[np.asarray(marker_dofs, dtype=int) - 1]
+            for marker, marker_dofs in self.bdofs.items()
+        }
+
+        levels = [(nodes + 1, coords.shape[0])]
+        prolongations = []
+        D = self.element_conductivity
+        for _ in range(self.mg_levels - 1):
+            refinement = mg.refine_quads(coords, nodes)
+            node_sets  = {
+                marker: mg.refine_node_set(node_set, refinement, coords.shape[0])
+                for marker, node_set in node_sets.items()
+            }
+            coords, nodes = refinement.coords, refinement.nodes
+            levels.append((nodes + 1, coords.shape[0]))
+            prolongations.append(refinement.prolongation)
+            if D.ndim == 3:
+                # The four children of element e are elements 4e to 4e + 3.
+                D = np.repeat(D, 4, axis=0)
+
+        self.coords = coords
+        self.edof   = nodes + 1
+        self.dofs   = np.arange(1, coords.shape[0] + 1)[:, None]
+        self.bdofs  = {marker: list(node_set + 1) for marker, node_set in node_sets.items()}
+        self.ex     = coords[nodes, 0]
+        self.ey     = coords[nodes, 1]
+        self.mg_hierarchy = (levels, prolongations)
+        self.element_conductivity = (
+            self._element_conductivity() if callable(self.conductivity) else D
+        )
+
+    def _generate_mesh(self):
+        """Run Gmsh and return the mesh data as a dict."""
+        mesh = sf.SizeFieldMeshGenerator(self._mesh_geometry().geometry, self.size_fields)
+        mesh.el_size_factor = self.el_size_factor
         mesh.el_type        = self.el_type
         mesh.dofs_per_node  = self.dofs_per_node
-        self.coords, self.edof, self.dofs, self.bdofs, _ = mesh.create()
-        self.ex, self.ey = cfc.coordxtr(self.edof, self.coords, self.dofs)
+        coords, edof, dofs, bdofs, _ = mesh.create()
+        ex, ey = bk.element_coordinates(edof, coords, dofs)
+        return {
+            "coords": coords, "edof": edof, "dofs": dofs, "bdofs": bdofs,
+            "ex": ex, "ey": ey,
+        }
 
     def _assemble_stiffness(self):
         """
         Build and return the global stiffness matrix K.
 
+        Element matrices are computed for all elements at once and
+        collected as (row, col, value) triplets that are summed into a
+        sparse matrix, so memory grows with the number of elements rather
+        than with n_dofs².
+
         Returns
         -------
-        K : ndarray, shape (n_dofs, n_dofs)
+        K : scipy.sparse.csr_matrix, shape (n_dofs, n_dofs)
         """
+        Ke_all = bk.flw2i4e_batch(self.ex, self.ey, self.ep, self.element_conductivity)
+        return self._assemble_element_matrices(Ke_all)
+
+    def _assemble_element_matrices(self, element_matrices):
+        """Sum stacked (n_elements, n_edof, n_edof) matrices into a CSR matrix."""
         n_dofs = np.size(self.dofs)
-        K = np.zeros([n_dofs, n_dofs])
-        for eltopo, elx, ely in zip(self.edof, self.ex, self.ey):
-            Ke = cfc.flw2i4e(elx, ely, self.ep, self.conductivity)
-            cfc.assem(eltopo, K, Ke)
-        return K
+        edof0  = np.asarray(self.edof) - 1
+        n_edof = edof0.shape[1]
+
+        rows = np.repeat(edof0, n_edof, axis=1).ravel()
+        cols = np.tile(edof0, (1, n_edof)).ravel()
+        return coo_matrix(
+            (element_matrices.ravel(), (rows, cols)), shape=(n_dofs, n_dofs)
+        ).tocsr()
+
+    def _step_factor(self, K, C, dt, theta, free, prescribed):
+        """
+        Factorized theta-method step matrix for one time-step size.
+
+        Returns
+        -------
+        lu : scipy.sparse.linalg.SuperLU
+            LU factors of (C + theta dt K) on the free DOFs.
+        A_fp : scipy.sparse.csr_matrix
+            Free-prescribed block of the step matrix.
+        B : scipy.sparse.csr_matrix
+            C - (1 - theta) dt K, applied to the previous state.
+        """
+        key = (dt, theta)
+        if key not in self.step_factors:
+            A_free = (C + theta * dt * K)[free]
+            self.step_factors[key] = (
+                splu(A_free[:, free].tocsc()),
+                A_free[:, prescribed],
+                (C - (1.0 - theta) * dt * K).tocsr(),
+            )
+        return self.step_factors[key]
 
-    def _build_boundary_conditions(self, left_value, right_value):
+    def _build_boundary_conditions(self, markers, values):
         """
-        Build Dirichlet BC arrays for the two marked top-edge segments.
+        Build Dirichlet BC arrays for marked boundaries.
 
         Parameters
         ----------
-        left_value : float
-            Prescribed potential on the left_marker boundary.
-        right_value : float
-            Prescribed potential on the right_marker boundary.
+        markers : sequence of int
+            Gmsh markers of the prescribed boundaries.
+        values : sequence of float
+            Prescribed potential on each marker.
 
         Returns
         -------
@@ -218,19 +1004,18 @@ class PotentialFlowSolver:
         """
         bc_dofs   = np.array([], int)
         bc_values = np.array([], int)
-        bc_dofs, bc_values = cfu.applybc(
-            self.bdofs, bc_dofs, bc_values,
-            self.geometry.left_marker, left_value
-        )
-        bc_dofs, bc_values = cfu.applybc(
-            self.bdofs, bc_dofs, bc_values,
-            self.geometry.right_marker, right_value
-        )
+        for marker, value in zip(markers, values):
+            bc_dofs, bc_values = cfu.applybc(
+                self.bdofs, bc_dofs, bc_values, marker, value
+            )
         return bc_dofs, bc_values
 
-    def _compute_flux_magnitudes(self, element_potentials):
+    def _compute_flux_vectors(self, element_potentials):
         """
-        Compute the flux magnitude |q| = √(qx² + qy²) at the centre of each element.
+        Compute the flux vector (qx, qy) of each element.
+
+        Uses the Gauss rule from ``ep``; with several Gauss points the
+        element value is their mean.
 
         Parameters
         ----------
@@ -239,18 +1024,14 @@ class PotentialFlowSolver:
 
         Returns
         -------
-        list of float
-            Flux magnitude for each element.
-        """
-        flux_magnitudes = []
-        for i in range(element_potentials.shape[0]):
-            es, _, _ = cfc.flw2i4s(
-                self.ex[i, :], self.ey[i, :],
-                self.ep, self.conductivity,
-                element_potentials[i, :]
-            )
-            flux_magnitudes.append(np.sqrt(es[0, 0]**2 + es[0, 1]**2))
-        return flux_magnitudes
+        ndarray, shape (n_elements, 2)
+            Flux vector for each element.
+        """
+        es, _, _ = bk.flw2i4s_batch(
+            self.ex, self.ey, self.ep, self.element_conductivity, element_potentials
+        )
+        flux, _ = bk.element_flux(es)
+        return flux
 
 
 class FlowVisualizer:
@@ -304,6 +1085,57 @@ class FlowVisualizer:
         cfv.showAndWait()
 
 
+def refinement_tradeoff(geometry, conductivity, meshes, left_value=0.0, right_value=10.0):
+    """
+    Compare meshes by DOF count against accuracy.
+
+    Every mesh is solved and its peak flux and through-flux (total flow
+    through the ``right_marker`` boundary) are compared with those of the
+    last mesh, which serves as the reference. The peak flux sits at the
+    singular slot-tip corners, so it only converges relative to a mesh
+    with the same grading near the tip; the through-flux converges for
+    any mesh sequence.
+
+    Parameters
+    ----------
+    geometry : NotchedPlateGeometry
+    conductivity : ndarray or callable
+        See ``PotentialFlowSolver``.
+    meshes : list of (str, float, sequence of DistanceThreshold)
+        (label, el_size_factor, size_fields) of every mesh; the last one
+        is the reference.
+    left_value, right_value : float
+        Prescribed potentials.
+
+    Returns
+    -------
+    list of dict
+        label, n_dofs, max_flux, through_flux and the relative errors
+        max_flux_error and through_flux_error of every mesh.
+    """
+    rows = []
+    for label, el_size_factor, size_fields in meshes:
+        solver = PotentialFlowSolver(
+            geometry=geometry,
+            conductivity=conductivity,
+            el_size_factor=el_size_factor,
+            size_fields=size_fields,
+        )
+        solver.solve(left_value, right_value)
+        rows.append({
+            "label": label,
+            "n_dofs": int(np.size(solver.dofs)),
+            "max_flux": float(np.max(solver.flux_magnitudes)),
+            "through_flux": solver.boundary_flow(geometry.right_marker),
+        })
+
+    reference = rows[-1]
+    for row in rows:
+        for key in ("max_flux", "through_flux"):
+            row[key + "_error"] = abs(row[key] / reference[key] - 1.0)
+    return rows
+
+
 def main():
     """Run the notched-plate 2-D steady-state potential flow analysis."""
 
@@ -317,8 +1149,48 @@ def main():
     solver = PotentialFlowSolver(
         geometry=geometry,
         conductivity=np.identity(2, "float"),
+        el_size_factor=1.0,
+        linear_solver=LINEAR_SOLVER,
+        use_symmetry=USE_SYMMETRY,
     )
     solver.solve(left_value=0.0, right_value=10.0)
+    print("Mesh cache:", MESH_CACHE.stats())
+    print("Linear solver:", LINEAR_SOLVER, solver.solver_info)
+
+    if REFINEMENT_STUDY:
+        tip = sf.DistanceThreshold(
+            points=NotchedPlateGeometry.SLOT_TIP_POINTS,
+            size_min=0.02, size_max=1.0, dist_min=0.05, dist_max=5.0,
+        )
+        rows = refinement_tradeoff(geometry, np.identity(2, "float"), [
+            ("uniform 1.0",    1.0,   ()),
+            ("uniform 0.5",    0.5,   ()),
+            ("uniform 0.25",   0.25,  ()),
+            ("graded 1.0",     1.0,   (tip,)),
+            ("graded 0.5",     0.5,   (tip,)),
+            ("reference",      0.125, (tip,)),
+        ])
+        print(f"{'mesh':14s} {'DOFs':>8s} {'max |q|':>11s} {'err':>8s} "
+              f"{'through-flux':>13s} {'err':>8s}")
+        for row in rows:
+            print(f"{row['label']:14s} {row['n_dofs']:8d} {row['max_flux']:11.4e} "
+                  f"{row['max_flux_error']:8.2%} {row['through_flux']:13.6e} "
+                  f"{row['through_flux_error']:8.2%}")
+
+    if TRANSIENT_STEPS:
+        transient = PotentialFlowSolver(
+            geometry=geometry,
+            conductivity=np.identity(2, "float"),
+            el_size_factor=1.0,
+        )
+        times, snapshots = transient.solve_transient(
+            TRANSIENT_STEPS, left_value=0.0, right_value=10.0,
+            snapshot_file=TRANSIENT_FILE, snapshot_stride=TRANSIENT_STRIDE,
+        )
+        print(f"Transient: {len(times)} snapshots up to t = {times[-1]:g} in {TRANSIENT_FILE}")
+        print("Flow through the top-edge segments at the end:",
+              transient.boundary_flow(geometry.left_marker),
+              transient.boundary_flow(geometry.right_marker))
 
     FlowVisualizer(geometry, solver).show()
 
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel slot-geometry parameter study for the notched plate.
+
+Every combination of slot width and slot depth is meshed, solved and
+post-processed in a process pool. A summary row per case (DOFs, peak flux,
+total through-flux, timings) is appended to a CSV or JSONL file as soon as
+the case finishes, so partial results survive an interrupted study.
+Failed cases are retried and reported at the end.
+"""
+
+import csv
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from ex1_oop import NotchedPlateGeometry, PotentialFlowSolver
+
+# Study definition
+PLATE_WIDTH    = 100.0
+PLATE_HEIGHT   = 10.0
+SLOT_WIDTHS    = [0.5, 1.0, 2.0]
+SLOT_DEPTHS    = [2.0, 3.0, 4.0, 5.0, 6.0, 7.0]
+EL_SIZE_FACTOR = 1.0
+LEFT_VALUE     = 0.0
+RIGHT_VALUE    = 10.0
+
+OUTPUT_PATH = "slot_study.jsonl"   # .csv or .jsonl
+MAX_WORKERS = None                 # default: one per CPU
+MAX_RETRIES = 2
+
+METRIC_FIELDS = [
+    "n_dofs", "n_elements", "max_flux", "through_flux", "case_time",
+    "attempts", "error",
+]
+
+
+def parameter_grid(**axes):
+    """
+    Cartesian product of parameter lists.
+
+    Example: ``parameter_grid(slot_width=[0.5, 1.0], slot_depth=[2.0, 5.0])``
+    gives four dicts.
+
+    Returns
+    -------
+    list of dict
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def run_slot_case(params):
+    """
+    Mesh, solve and post-process one slot geometry.
+
+    Parameters
+    ----------
+    params : dict
+        ``slot_width`` and ``slot_depth``, optionally ``plate_width``,
+        ``plate_height``, ``el_size_factor``, ``left_value`` and
+        ``right_value``.
+
+    Returns
+    -------
+    dict
+        Summary metrics of the case.
+    """
+    t0 = time.perf_counter()
+    geometry = NotchedPlateGeometry(
+        plate_width=params.get("plate_width", PLATE_WIDTH),
+        plate_height=params.get("plate_height", PLATE_HEIGHT),
+        slot_width=params["slot_width"],
+        slot_depth=params["slot_depth"],
+    )
+    solver = PotentialFlowSolver(
+        geometry=geometry,
+        conductivity=np.identity(2, "float"),
+        el_size_factor=params.get("el_size_factor", EL_SIZE_FACTOR),
+    )
+    solver.solve(
+        left_value=params.get("left_value", LEFT_VALUE),
+        right_value=params.get("right_value", RIGHT_VALUE),
+    )
+
+    return {
+        "n_dofs": int(np.size(solver.dofs)),
+        "n_elements": int(np.shape(solver.edof)[0]),
+        "max_flux": float(np.max(solver.flux_magnitudes)),
+        "through_flux": solver.boundary_flow(geometry.right_marker),
+        "case_time": time.perf_counter() - t0,
+    }
+
+
+class _ResultWriter:
+    """Append result rows to a CSV or JSONL file, flushing after each row."""
+
+    def __init__(self, path, param_names):
+        self.path   = path
+        self._file  = open(path, "w", newline="")
+        self._csv   = None
+        if path.endswith(".csv"):
+            self._csv = csv.DictWriter(self._file, fieldnames=param_names + METRIC_FIELDS,
+                                       extrasaction="ignore", restval="")
+            self._csv.writeheader()
+
+    def write(self, row):
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def run_study(cases, output_path=OUTPUT_PATH, max_workers=MAX_WORKERS,
+              max_retries=MAX_RETRIES, case_function=run_slot_case):
+    """
+    Run cases in a process pool and stream one summary row per case.
+
+    Parameters
+    ----------
+    cases : list of dict
+        Case parameters, e.g. from ``parameter_grid``.
+    output_path : str
+        Result file; ``.csv`` writes CSV, anything else JSON lines.
+    max_workers : int, optional
+        Number of worker processes.
+    max_retries : int
+        Times a failed case is resubmitted before it is reported as failed.
+        A crashed worker breaks the whole pool, failing every case running
+        in it. Those cases are then rerun one at a time, each in its own
+        worker, without counting the break as an attempt; only a case that
+        crashes its worker on its own uses up its retries. At most
+        ``max_workers`` cases are in the pool at once, so a crash affects
+        no more than that many.
+    case_function : callable
+        Picklable function mapping case parameters to a metrics dict.
+
+    Returns
+    -------
+    results : list of dict
+        Rows of the cases that succeeded, in completion order.
+    failures : list of dict
+        Rows of the cases that failed after all retries, with ``error``.
+    """
+    param_names = []
+    for params in cases:
+        param_names += [name for name in params if name not in param_names]
+
+    writer = _ResultWriter(output_path, param_names)
+    results = []
+    failures = []
+    n_workers = max_workers or os.cpu_count() or 1
+    queue = deque((params, 1) for params in cases)
+    suspects = deque()   # (params, attempt) of cases running when a worker crashed
+    running = {}
+
+    def record(params, attempt, future, retries):
+        try:
+            row = dict(params, **future.result(), attempts=attempt)
+        except Exception as error:
+            if attempt <= max_retries:
+                retries.append((params, attempt + 1))
+                return
+            row = dict(params, attempts=attempt, error=f"{type(error).__name__}: {error}")
+            failures.append(row)
+        else:
+            results.append(row)
+        writer.write(row)
+
+    pool = ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        while queue or running or suspects:
+            if suspects and not running:
+                # Rerun the cases of a broken pool alone, so a crash is
+                # charged to the case that caused it.
+                params, attempt = suspects.popleft()
+                record(params, attempt, _run_alone(case_function, params), suspects)
+                continue
+            if not suspects:
+                while queue and len(running) < n_workers:
+                    params, attempt = queue.popleft()
+                    running[pool.submit(case_function, params)] = (params, attempt)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                params, attempt = running.pop(future)
+                if isinstance(future.exception(), BrokenProcessPool):
+                    suspects.append((params, attempt))
+                else:
+                    record(params, attempt, future, queue)
+            if suspects and not running:
+                # Every future of the broken pool has failed; replace it.
+                pool.shutdown(wait=True)
+                pool = ProcessPoolExecutor(max_workers=n_workers)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        writer.close()
+    return results, failures
+
+
+def _run_alone(case_function, params):
+    """Run one case in a worker process of its own and return its future."""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(case_function, params)
+        wait([future])
+    return future
+
+
+def main():
+    """Run the slot width/depth study and print a summary."""
+    cases = parameter_grid(slot_width=SLOT_WIDTHS, slot_depth=SLOT_DEPTHS)
+    t0 = time.perf_counter()
+    results, failures = run_study(cases)
+    elapsed = time.perf_counter() - t0
+
+    print(f"{len(results)} of {len(cases)} cases in {elapsed:.2f} s -> {OUTPUT_PATH}")
+    for row in sorted(results, key=lambda r: (r["slot_width"], r["slot_depth"])):
+        print(f"  width {row['slot_width']:5.2f}  depth {row['slot_depth']:5.2f}  "
+              f"DOFs {row['n_dofs']:7d}  max |q| {row['max_flux']:.4e}  "
+              f"through-flux {row['through_flux']:.4e}")
+    for row in failures:
+        print(f"  FAILED width {row['slot_width']}, depth {row['slot_depth']} "
+              f"after {row['attempts']} attempts: {row['error']}")
+
+
+if __name__ == "__main__":
+    main()
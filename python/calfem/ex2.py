@@ -1,13 +1,28 @@
 # exm_stress_2d_materials_profile.py
 
+import itertools
+import os
 import time
-import math
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from scipy.sparse import coo_matrix
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import splu
 
+import batched_kernels as bk
+import error_estimator as ee
+import mesh_morphing as mm
+import scaling_report as sr
+import size_fields as sf
+import structured_mesh as sm
+from boundary_index import BoundaryIndex
+from domain_decomposition import DomainDecompositionSolver
+from substructure import CondensedSubdomain
+from result_store import ResultStore
+from bench_history import BenchmarkHistory
 import calfem.core as cfc
 import calfem.geometry as cfg
-import calfem.mesh as cfm
 import calfem.utils as cfu
 # import calfem.vis_mpl as cfv   # keep plotting optional
 
@@ -22,6 +37,22 @@ PROFILE_REPEATS = 3                  # repeat compute path for clearer timings
 ENABLE_PLOTTING = False              # disable during profiling
 PRINT_SUMMARY = True
 REUSE_MESH_IN_REPEATS = True         # mesh once, repeat compute path
+PIPELINE_MESHING = False             # mesh the next size in a worker while computing
+PIPELINE_MAX_PREPARED = 2            # prepared meshes alive at once (incl. current)
+POSTPROCESS_DIR = None               # stream stresses to memory-mapped files here
+POSTPROCESS_CHUNK_SIZE = 100000      # elements per chunk when streaming
+RESULT_STORE_DIR = None              # keep mesh, solution and fields of each case here
+INCLUSION_SWEEP = []                 # inclusion corners (x0, y0, x1, y1) to morph through
+MORPH_QUALITY_RATIO = 0.5            # remesh below this share of the generated mesh's min quality
+MESHER = "gmsh"                      # "gmsh", or "structured" for the NumPy Q4 grid
+DD_SUBDOMAINS = 0                    # >1: domain-decomposition solve with this many workers
+TRACK_MEMORY = False                 # record per-phase Python-heap peaks with tracemalloc
+SCALING_TARGET_DOFS = None           # extrapolate the scaling report to this many DOFs
+SCALING_REPORT_PATH = None           # write the scaling report as JSON here
+BENCH_DB = None                      # append per-phase medians to this SQLite history
+BENCH_NAME = "ex2"                   # benchmark name of this variant in the history
+ADAPTIVE_TOLERANCE = None            # relative energy-norm error target of the adaptive loop
+ADAPTIVE_MAX_ITERATIONS = 6          # remeshes per loop (adaptive and uniform)
 
 # ---- General parameters ----
 t = 0.2
@@ -39,25 +70,30 @@ mark_E2 = 66
 mark_fixed = 70
 mark_load = 90
 
+load_total = -10e5   # total vertical force on the mark_load edge
+
 elprop = {
     mark_E1: [ep, D1],
     mark_E2: [ep, D2],
 }
 
-el_type = 3
+INCLUSION = (0.2, 0.2, 0.8, 0.8)    # E2 inclusion corners (x0, y0, x1, y1)
+
+el_type = 3          # 2 = 3-node triangle (plante/plants), 3 = Q4 (planqe/planqs)
 dofs_per_node = 2
 
-def build_geometry():
+def build_geometry(inclusion=INCLUSION):
+    x0, y0, x1, y1 = inclusion
     g = cfg.Geometry()
 
     g.point([0, 0])      # 0
     g.point([1, 0])      # 1
     g.point([1, 1])      # 2
     g.point([0, 1])      # 3
-    g.point([0.2, 0.2])  # 4
-    g.point([0.8, 0.2])  # 5
-    g.point([0.8, 0.8])  # 6
-    g.point([0.2, 0.8])  # 7
+    g.point([x0, y0])    # 4
+    g.point([x1, y0])    # 5
+    g.point([x1, y1])    # 6
+    g.point([x0, y1])    # 7
 
     g.spline([0, 1], marker=mark_fixed)
     g.spline([2, 1])
@@ -74,133 +110,867 @@ def build_geometry():
 
     return g
 
-def prepare_case(el_size_factor):
+def memory_window():
+    # Start a peak-memory window; returns the traced bytes at its start,
+    # or None when tracemalloc is not tracing. tracemalloc sees the Python
+    # heap only: not Gmsh's or SuperLU's C allocations, nor the memory of
+    # worker processes, so mesh and solve peaks are understated.
+    if not tracemalloc.is_tracing():
+        return None
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    return current
+
+def window_peak(start):
+    # Peak traced bytes above the start of a memory window.
+    if start is None or not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()[1] - start
+
+def build_structured_mesh(el_size_factor, inclusion=INCLUSION):
+    # Same layout as build_geometry, meshed directly as a Q4 grid.
+    return sm.rectangle_mesh(
+        (0.0, 0.0, 1.0, 1.0),
+        [(inclusion, mark_E2)],
+        el_size=el_size_factor,
+        base_marker=mark_E1,
+        side_markers={"bottom": mark_fixed, "top": mark_load},
+        dofs_per_node=dofs_per_node,
+    )
+
+def prepare_case(el_size_factor, element_type=el_type, inclusion=INCLUSION, mesher=None,
+                 size_fields=()):
+    # size_fields grade a Gmsh mesh (see size_fields.py); their sizes are
+    # scaled by el_size_factor like the point sizes. Gmsh meshes are read
+    # with create_mixed, which keeps the triangles Gmsh leaves unpaired in
+    # a recombined mesh (see element_blocks).
+    mesher = MESHER if mesher is None else mesher
+    mem0 = memory_window()
     t0 = time.perf_counter()
-    g = build_geometry()
-    mesh = cfm.GmshMeshGenerator(g)
-    mesh.el_size_factor = el_size_factor
-    mesh.el_type = el_type
-    mesh.dofs_per_node = dofs_per_node
-    coords, edof, dofs, bdofs, elementmarkers = mesh.create()
+    if mesher == "structured":
+        if element_type != 3:
+            raise ValueError("The structured mesher only generates Q4 elements (el_type 3)")
+        if size_fields:
+            raise ValueError("The structured mesher does not support size fields")
+        coords, edof, dofs, bdofs, elementmarkers = build_structured_mesh(el_size_factor, inclusion)
+    elif mesher == "gmsh":
+        g = build_geometry(inclusion)
+        mesh = sf.SizeFieldMeshGenerator(g, size_fields)
+        mesh.el_size_factor = el_size_factor
+        mesh.el_type = element_type
+        mesh.dofs_per_node = dofs_per_node
+        coords, edof, dofs, bdofs, elementmarkers = mesh.create_mixed()
+    else:
+        raise ValueError(f"Unknown mesher '{mesher}'")
     mesh_time = time.perf_counter() - t0
+    mesh_memory = window_peak(mem0)
 
     return {
         "coords": coords,
         "edof": edof,
         "dofs": dofs,
         "bdofs": bdofs,
+        "boundary_index": BoundaryIndex(bdofs, dofs_per_node),
         "elementmarkers": elementmarkers,
+        "el_type": element_type,
+        "el_size_factor": el_size_factor,
+        "inclusion": tuple(inclusion),
+        "mesher": mesher,
+        "size_fields": tuple(size_fields),
         "mesh_time": mesh_time,
+        "mesh_memory": mesh_memory,
     }
 
+# Cached entries of a prepared case that depend only on the mesh topology
+# and therefore survive morphing.
+TOPOLOGY_CACHE_KEYS = ("assembly_plan", "solve_plan")
+
+def morph_case(prepared, inclusion, quality_ratio=MORPH_QUALITY_RATIO):
+    # Move the nodes of an existing mesh so the inclusion matches the new
+    # corners, keeping the topology (and the cached assembly and solver
+    # plans). Falls back to a full remesh when the minimum element quality
+    # drops below quality_ratio times that of the generated mesh; recombined
+    # quads can start well below any fixed threshold.
+    t0 = time.perf_counter()
+    coords = np.asarray(prepared["coords"], dtype=float)
+    dofs = prepared["dofs"]
+    n_nodes = coords.shape[0]
+
+    in_frame = np.zeros(n_nodes, dtype=bool)
+    in_inclusion = np.zeros(n_nodes, dtype=bool)
+    block_nodes = []
+    for block_type, block_edof, block_markers in element_blocks(prepared):
+        nodes = bk.element_nodes(block_edof, dofs)
+        block_nodes.append(nodes)
+        in_frame[nodes[block_markers == mark_E1].ravel()] = True
+        in_inclusion[nodes[block_markers == mark_E2].ravel()] = True
+
+    # The interface moves with the affine map between the two inclusion
+    # rectangles; the outer boundary of the unit square stays put.
+    old = np.asarray(prepared["inclusion"], dtype=float)
+    new = np.asarray(inclusion, dtype=float)
+    scale = (new[2:] - new[:2]) / (old[2:] - old[:2])
+    interface = np.flatnonzero(in_frame & in_inclusion)
+    interface_disp = new[:2] + (coords[interface] - old[:2]) * scale - coords[interface]
+
+    tol = 1e-9
+    outer = np.flatnonzero(
+        (coords[:, 0] < tol) | (coords[:, 0] > 1.0 - tol)
+        | (coords[:, 1] < tol) | (coords[:, 1] > 1.0 - tol)
+    )
+    # Reference quality of the generated mesh, carried through morphs so
+    # that degradation does not compound over a sweep.
+    base_quality = prepared.get("base_quality")
+    if base_quality is None:
+        base_quality = min(
+            mm.element_quality(coords[nodes, 0], coords[nodes, 1]).min()
+            for nodes in block_nodes
+        )
+
+    fixed = np.concatenate([interface, outer])
+    fixed_disp = np.vstack([interface_disp, np.zeros((outer.size, 2))])
+    new_coords = mm.laplacian_morph(coords, block_nodes, fixed, fixed_disp)
+
+    quality = min(
+        mm.element_quality(new_coords[nodes, 0], new_coords[nodes, 1]).min()
+        for nodes in block_nodes
+    )
+    if quality < quality_ratio * base_quality:
+        return prepare_case(prepared["el_size_factor"], prepared.get("el_type", el_type),
+                            inclusion, prepared.get("mesher"), prepared.get("size_fields", ()))
+
+    morphed = {
+        key: prepared[key]
+        for key in ("edof", "dofs", "bdofs", "boundary_index", "elementmarkers",
+                    "el_type", "el_size_factor", "mesher", "size_fields")
+        if key in prepared
+    }
+    morphed.update({key: prepared[key] for key in TOPOLOGY_CACHE_KEYS if key in prepared})
+    morphed["coords"] = new_coords
+    morphed["inclusion"] = tuple(inclusion)
+    morphed["min_quality"] = quality
+    morphed["base_quality"] = base_quality
+    morphed["mesh_time"] = time.perf_counter() - t0
+    return morphed
+
+def element_blocks(prepared):
+    # A single-type mesh (the structured mesher) stores edof as one array.
+    # Gmsh meshes store edof and elementmarkers as dicts keyed by Gmsh
+    # element type (2 = triangle, 3 = quad), holding the types that occur;
+    # elements are numbered block by block in ascending element type order.
+    edof = prepared["edof"]
+    elementmarkers = prepared["elementmarkers"]
+    if isinstance(edof, dict):
+        return [
+            (block_type, np.asarray(edof[block_type]),
+             np.asarray(elementmarkers[block_type]))
+            for block_type in sorted(edof)
+        ]
+    return [(prepared.get("el_type", el_type), np.asarray(edof),
+             np.asarray(elementmarkers))]
+
+def element_groups(prepared):
+    # Per element block: (el_type, 0-based edof, ex, ey, marker -> element
+    # indices within the block, offset of the block in global numbering).
+    coords = prepared["coords"]
+    dofs = prepared["dofs"]
+    groups = []
+    offset = 0
+    for block_type, block_edof, block_markers in element_blocks(prepared):
+        ex, ey = bk.element_coordinates(block_edof, coords, dofs)
+        marker_groups = {
+            marker: np.flatnonzero(block_markers == marker)
+            for marker in elprop
+        }
+        groups.append((block_type, block_edof - 1, ex, ey, marker_groups, offset))
+        offset += block_edof.shape[0]
+    return groups
+
+def boundary_index(prepared):
+    # Marker -> DOF array index of bdofs, built by prepare_case; created
+    # here for prepared cases that do not carry one yet.
+    index = prepared.get("boundary_index")
+    if index is None:
+        index = BoundaryIndex(prepared["bdofs"], dofs_per_node)
+        prepared["boundary_index"] = index
+    return index
+
+def nodal_averaging_operator(prepared):
+    # Sparse (n_nodes, n_elements) operator W with area-weighted rows:
+    # nodal values = W @ element values. Built once per mesh and cached in
+    # the prepared case so repeats and load cases reuse it.
+    W = prepared.get("nodal_averaging")
+    if W is not None:
+        return W
+
+    coords = prepared["coords"]
+    dofs = prepared["dofs"]
+    rows = []
+    cols = []
+    weights = []
+    offset = 0
+    for block_type, block_edof, block_markers in element_blocks(prepared):
+        nodes = bk.element_nodes(block_edof, dofs)
+        ex, ey = bk.element_coordinates(block_edof, coords, dofs)
+        areas = np.abs(bk.element_areas(ex, ey))
+        n_block, n_el_nodes = nodes.shape
+        rows.append(nodes.ravel())
+        cols.append(np.repeat(offset + np.arange(n_block), n_el_nodes))
+        weights.append(np.repeat(areas, n_el_nodes))
+        offset += n_block
+
+    rows = np.concatenate(rows)
+    weights = np.concatenate(weights)
+    n_nodes = np.shape(coords)[0]
+    node_weight = np.bincount(rows, weights=weights, minlength=n_nodes)
+    node_weight[node_weight == 0.0] = 1.0
+    W = csr_matrix(
+        (weights / node_weight[rows], (rows, np.concatenate(cols))),
+        shape=(n_nodes, offset),
+    )
+    prepared["nodal_averaging"] = W
+    return W
+
+class CaseResults:
+    """
+    Solution of one ex2 case with lazily computed derived fields.
+
+    The primary solution (displacements ``a`` and reactions ``r``) is kept;
+    stresses, von Mises, principal stresses, nodal averages and reaction
+    sums are computed on first access and cached. Time spent recovering
+    element stresses is recorded as ``timings["postprocess"]``.
+    """
+
+    def __init__(self, prepared, groups, a, r, timings, properties=None):
+        self.prepared   = prepared
+        self.groups     = groups
+        self.properties = elprop if properties is None else properties
+        self._a         = a
+        self.r          = r
+        self.timings    = timings
+        self.memory     = {}
+        self.n_dofs     = np.size(prepared["dofs"])
+        self.n_elements = sum(g[1].shape[0] for g in groups)
+
+        self._element_stresses  = None
+        self._element_strains   = None
+        self._von_mises         = None
+        self._principal         = None
+        self._nodal_stresses    = None
+        self._reaction_sums     = None
+
+    @property
+    def a(self):
+        """Nodal displacements, shape (n_dofs, 1)."""
+        return self._a
+
+    @property
+    def element_stresses(self):
+        """Element stresses [sigx, sigy, tauxy], shape (n_elements, 3)."""
+        if self._element_stresses is None:
+            self._recover_stresses()
+        return self._element_stresses
+
+    @property
+    def element_strains(self):
+        """Element strains [epsx, epsy, gamxy], shape (n_elements, 3)."""
+        if self._element_strains is None:
+            self._recover_stresses()
+        return self._element_strains
+
+    @property
+    def von_mises(self):
+        """Element von Mises stress, shape (n_elements,)."""
+        if self._von_mises is None:
+            self.postprocess()
+        return self._von_mises
+
+    @property
+    def principal_stresses(self):
+        """In-plane principal stresses [sig1, sig2], shape (n_elements, 2)."""
+        if self._principal is None:
+            es = self.element_stresses
+            centre = 0.5 * (es[:, 0] + es[:, 1])
+            radius = np.hypot(0.5 * (es[:, 0] - es[:, 1]), es[:, 2])
+            self._principal = np.column_stack([centre + radius, centre - radius])
+        return self._principal
+
+    @property
+    def nodal_stresses(self):
+        """Area-weighted nodal averages of element stresses, shape (n_nodes, 3)."""
+        if self._nodal_stresses is None:
+            self._nodal_stresses = self.nodal_average(self.element_stresses)
+        return self._nodal_stresses
+
+    @property
+    def reaction_sums(self):
+        """Summed reactions [Rx, Ry] per boundary marker."""
+        if self._reaction_sums is None:
+            r = self.r[:, 0]
+            index = boundary_index(self.prepared)
+            self._reaction_sums = {
+                marker: np.array([
+                    r[index.dofs(marker, 1) - 1].sum(),
+                    r[index.dofs(marker, 2) - 1].sum(),
+                ])
+                for marker in index.markers
+            }
+        return self._reaction_sums
+
+    def postprocess(self):
+        """
+        Recover the element stresses, strains and von Mises stresses now.
+
+        Otherwise they are computed on first access; calling this up front
+        puts the recovery inside a timed or profiled section.
+        """
+        if self._element_stresses is None:
+            self._recover_stresses()
+        if self._von_mises is None:
+            es = self._element_stresses
+            s0, s1, s2 = es[:, 0], es[:, 1], es[:, 2]
+            self._von_mises = np.sqrt(s0 * s0 - s0 * s1 + s1 * s1 + 3.0 * s2 * s2)
+
+    def nodal_average(self, element_values):
+        """Area-weighted nodal average of any per-element field."""
+        return nodal_averaging_operator(self.prepared) @ element_values
+
+    def _recover_stresses(self):
+        mem0 = memory_window()
+        t0 = time.perf_counter()
+        es_all = np.zeros((self.n_elements, 3))
+        et_all = np.zeros((self.n_elements, 3))
+
+        for block_type, edof0, ex, ey, marker_groups, offset in self.groups:
+            element_stress = bk.PLANE_KERNELS[block_type][1]
+            ed = self.a[edof0, 0]
+            for marker, idxs in marker_groups.items():
+                if idxs.size == 0:
+                    continue
+                ep_marker, D_marker = self.properties[marker]
+                es, et = element_stress(ex[idxs], ey[idxs], ep_marker, D_marker, ed[idxs])
+                es_all[offset + idxs] = es
+                et_all[offset + idxs] = et
+
+        self._element_stresses = es_all
+        self._element_strains = et_all
+        self.timings["postprocess"] = time.perf_counter() - t0
+        if mem0 is not None:
+            self.memory["postprocess"] = window_peak(mem0)
+
+def assembly_plan(prepared, groups):
+    # Scatter map from the stacked element matrices (in group order) to the
+    # CSR data array of K. Depends only on the topology, so it is built
+    # once per mesh and reused by repeats and morphed meshes.
+    plan = prepared.get("assembly_plan")
+    if plan is not None:
+        return plan
+
+    nDofs = np.size(prepared["dofs"])
+    rows = []
+    cols = []
+    for block_type, edof0, ex, ey, marker_groups, _ in groups:
+        n_edof = edof0.shape[1]
+        for marker, idxs in marker_groups.items():
+            dof_idx = edof0[idxs]
+            rows.append(np.repeat(dof_idx, n_edof, axis=1).ravel())
+            cols.append(np.tile(dof_idx, (1, n_edof)).ravel())
+
+    keys = np.concatenate(rows) * nDofs + np.concatenate(cols)
+    unique_keys, scatter = np.unique(keys, return_inverse=True)
+    plan = {
+        "scatter": scatter,
+        "indices": unique_keys % nDofs,
+        "indptr": np.searchsorted(unique_keys // nDofs, np.arange(nDofs + 1)),
+        "shape": (nDofs, nDofs),
+    }
+    prepared["assembly_plan"] = plan
+    return plan
+
+def solve_with_plan(prepared, K, f, bc, bcVal):
+    # Equivalent of cfc.spsolveq that caches the free/prescribed DOF split
+    # and the fill-reducing ordering of the reduced system per topology.
+    # SuperLU does not expose a separate symbolic phase, so the ordering is
+    # what gets reused: later factorizations run with it as a fixed
+    # symmetric permutation.
+    nDofs = K.shape[0]
+    plan = prepared.get("solve_plan")
+    if plan is None or not np.array_equal(plan["bc"], bc):
+        plan = {
+            "bc": np.array(bc),
+            "free": np.setdiff1d(np.arange(nDofs), np.asarray(bc) - 1),
+            "perm": None,
+        }
+        prepared["solve_plan"] = plan
+
+    free = plan["free"]
+    prescribed = np.asarray(bc) - 1
+    K_free = K[free]
+    Kff = K_free[:, free]
+    rhs = f[free, 0] - K_free[:, prescribed] @ np.asarray(bcVal, dtype=float)
+
+    lu_options = {"diag_pivot_thresh": 0.0, "options": {"SymmetricMode": True}}
+    if plan["perm"] is None:
+        lu = splu(Kff.tocsc(), permc_spec="MMD_AT_PLUS_A", **lu_options)
+        plan["perm"] = np.argsort(lu.perm_c)  # new position -> original DOF
+        a_free = lu.solve(rhs)
+    else:
+        perm = plan["perm"]
+        lu = splu(Kff[perm][:, perm].tocsc(), permc_spec="NATURAL", **lu_options)
+        a_free = np.empty_like(rhs)
+        a_free[perm] = lu.solve(rhs[perm])
+
+    a = np.zeros((nDofs, 1))
+    a[prescribed, 0] = bcVal
+    a[free, 0] = a_free
+    r = K @ a - f
+    return a, r
+
+def assemble_stiffness(prepared, groups, properties=elprop):
+    # Global K through the cached assembly plan. Markers missing from
+    # properties contribute nothing, which assembles a subset of the model
+    # on the same sparsity pattern.
+    plan = assembly_plan(prepared, groups)
+
+    data = []
+    for block_type, edof0, ex, ey, marker_groups, _ in groups:
+        element_stiffness = bk.PLANE_KERNELS[block_type][0]
+        n_edof = edof0.shape[1]
+        for marker, idxs in marker_groups.items():
+            if idxs.size == 0:
+                continue
+            if marker not in properties:
+                data.append(np.zeros(idxs.size * n_edof * n_edof))
+                continue
+            ep_marker, D_marker = properties[marker]
+            Ke = element_stiffness(ex[idxs], ey[idxs], ep_marker, D_marker)
+            data.append(Ke.ravel())
+
+    return csr_matrix(
+        (np.bincount(plan["scatter"], weights=np.concatenate(data),
+                     minlength=plan["indices"].size),
+         plan["indices"], plan["indptr"]),
+        shape=plan["shape"],
+    )
+
 def compute_case(prepared):
     timings = {}
+    memory = {}
 
-    coords = prepared["coords"]
-    edof = prepared["edof"]
     dofs = prepared["dofs"]
-    bdofs = prepared["bdofs"]
-    elementmarkers = prepared["elementmarkers"]
 
+    mem0 = memory_window()
     t0 = time.perf_counter()
     nDofs = np.size(dofs)
-    ex, ey = cfc.coordxtr(edof, coords, dofs)
-    n_elements = edof.shape[0]
-    elementmarkers_arr = np.asarray(elementmarkers)
-    marker_groups = {
-        marker: np.where(elementmarkers_arr == marker)[0]
-        for marker in elprop
-    }
+    groups = element_groups(prepared)
+    K = assemble_stiffness(prepared, groups)
+    timings["assembly"] = time.perf_counter() - t0
+    memory["assembly"] = window_peak(mem0)
+
+    mem0 = memory_window()
+    t0 = time.perf_counter()
+    index = boundary_index(prepared)
+    bc, bcVal = index.prescribed([(mark_fixed, 0.0)])
+    f = index.total_forces(nDofs, [(mark_load, load_total, 2)])
+
+    solver_info = None
+    if DD_SUBDOMAINS > 1:
+        a, r, solver_info = solve_decomposed(groups, K, f, bc, bcVal, DD_SUBDOMAINS)
+    else:
+        a, r = solve_with_plan(prepared, K, f, bc, bcVal)
+    timings["solve"] = time.perf_counter() - t0
+    memory["solve"] = window_peak(mem0)
+
+    result = CaseResults(prepared, groups, a, r, timings)
+    result.solver_info = solver_info
+    if mem0 is not None:
+        result.memory.update(memory)
+    return result
+
+def solve_decomposed(groups, K, f, bc, bcVal, n_subdomains):
+    # Schur-complement solve with one worker process per subdomain; the
+    # elements are partitioned by their centroids.
+    element_dofs = [edof0 for _, edof0, _, _, _, _ in groups]
+    centroids = np.vstack([
+        np.column_stack([ex.mean(axis=1), ey.mean(axis=1)])
+        for _, _, ex, ey, _, _ in groups
+    ])
+    solver = DomainDecompositionSolver(n_subdomains)
+    a, r = solver.solve(K, f, bc, bcVal, element_dofs, centroids)
+    return a, r, solver.info
+
+# -----------------------------
+# Condensed E2 inclusion
+# -----------------------------
+def condensed_inclusion(prepared, groups, properties=elprop):
+    # Schur-complement condensation of the E2 inclusion onto the DOFs it
+    # shares with the frame. Cached per mesh and inclusion material.
+    key = (properties[mark_E2][0], np.asarray(properties[mark_E2][1]).tobytes())
+    cached = prepared.get("condensed_inclusion")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    dofs = prepared["dofs"]
+    inclusion_dofs = []
+    frame_dofs = []
+    for block_type, edof0, ex, ey, marker_groups, _ in groups:
+        inclusion_dofs.append(edof0[marker_groups[mark_E2]].ravel())
+        frame_dofs.append(edof0[marker_groups[mark_E1]].ravel())
+    index = boundary_index(prepared)
+    loaded = [index.dofs(marker) - 1
+              for marker in (mark_fixed, mark_load) if marker in index]
+    interior = np.setdiff1d(
+        np.concatenate(inclusion_dofs),
+        np.concatenate(frame_dofs + loaded),
+    )
+
+    K_inclusion = assemble_stiffness(prepared, groups, {mark_E2: properties[mark_E2]})
+    condensed = CondensedSubdomain(K_inclusion, interior)
+    prepared["condensed_inclusion"] = (key, condensed)
+    return condensed
+
+class CondensedCaseResults(CaseResults):
+    """
+    Results of a condensed solve; interior inclusion displacements are
+    recovered from the cached Schur factorization on first access.
+    """
+
+    def __init__(self, prepared, groups, a, r, timings, properties, condensed):
+        super().__init__(prepared, groups, a, r, timings, properties)
+        self.condensed = condensed
+        self._recovered = False
 
-    edof0 = np.asarray(edof, dtype=np.int64) - 1
-    n_el, n_edof = edof0.shape
-    block_size = n_edof * n_edof
-    total_nnz = n_el * block_size
-    rows = np.empty(total_nnz, dtype=np.int64)
-    cols = np.empty(total_nnz, dtype=np.int64)
-    data = np.empty(total_nnz, dtype=np.float64)
-    row_pattern = np.repeat(np.arange(n_edof), n_edof)
-    col_pattern = np.tile(np.arange(n_edof), n_edof)
-    planqe = cfc.planqe
-    elprop_local = elprop
-
-    for marker, idxs in marker_groups.items():
-        ep_marker, D_marker = elprop_local[marker]
-        for i in idxs:
-            dof_idx = edof0[i]
-            Ke = planqe(ex[i, :], ey[i, :], ep_marker, D_marker)
-
-            start = i * block_size
-            end = start + block_size
-            rows[start:end] = dof_idx[row_pattern]
-            cols[start:end] = dof_idx[col_pattern]
-            data[start:end] = np.ravel(Ke)
-
-    K = coo_matrix((data, (rows, cols)), shape=(nDofs, nDofs)).tocsr()
+    @property
+    def a(self):
+        if not self._recovered:
+            retained = self._a[self.condensed.retained]
+            self._a[self.condensed.interior, 0] = self.condensed.recover(retained)
+            self._recovered = True
+        return self._a
+
+def compute_condensed_case(prepared, frame_properties=None, load_value=load_total):
+    # Solve with the E2 inclusion condensed onto its interface. Only the
+    # frame (mark_E1) is assembled, so repeated analyses with a different
+    # frame material or load do not touch the inclusion interior.
+    timings = {}
+    properties = dict(elprop)
+    if frame_properties is not None:
+        properties[mark_E1] = frame_properties
+
+    t0 = time.perf_counter()
+    nDofs = np.size(prepared["dofs"])
+    groups = element_groups(prepared)
+    condensed = condensed_inclusion(prepared, groups, properties)
+    retained = condensed.retained
+    K_frame = assemble_stiffness(prepared, groups, {mark_E1: properties[mark_E1]})
+    K_red = (K_frame[retained][:, retained] + condensed.K_condensed).tocsr()
     timings["assembly"] = time.perf_counter() - t0
 
     t0 = time.perf_counter()
-    bc = np.array([], "i")
-    bcVal = np.array([], float)
-    bc, bcVal = cfu.applybc(bdofs, bc, bcVal, mark_fixed, 0.0)
+    index = boundary_index(prepared)
+    bc, bcVal = index.prescribed([(mark_fixed, 0.0)])
+    f = index.total_forces(nDofs, [(mark_load, load_value, 2)])
 
-    f = np.zeros((nDofs, 1))
-    cfu.applyforcetotal(bdofs, f, mark_load, value=-10e5, dimension=2)
+    reduced_index = np.searchsorted(retained, bc - 1)
+    f_red = condensed.condense_load(f)
+    a_red, r_red = solve_with_plan(condensed.cache, K_red, f_red, reduced_index + 1, bcVal)
 
-    a, r = cfc.spsolveq(K, f, bc, bcVal)
+    a = np.zeros((nDofs, 1))
+    r = np.zeros((nDofs, 1))
+    a[retained] = a_red
+    r[retained] = r_red
     timings["solve"] = time.perf_counter() - t0
 
-    t0 = time.perf_counter()
-    ed = cfc.extract_eldisp(edof, a)
-    von_mises = np.zeros(n_elements)
-    planqs = cfc.planqs
-
-    for i in range(n_elements):
-        es, et = planqs(
-            ex[i, :], ey[i, :],
-            elprop[elementmarkers[i]][0],
-            elprop[elementmarkers[i]][1],
-            ed[i, :]
+    return CondensedCaseResults(prepared, groups, a, r, timings, properties, condensed)
+
+# -----------------------------
+# Out-of-core post-processing
+# -----------------------------
+POSTPROCESS_FIELDS = {"stress": 3, "strain": 3, "von_mises": 1}
+
+def postprocess_to_disk(prepared, a, output_dir, chunk_size=POSTPROCESS_CHUNK_SIZE,
+                        properties=elprop):
+    # Walk the elements in chunks and write stresses, strains and von Mises
+    # straight into memory-mapped .npy files. Only one chunk of element
+    # coordinates, displacements and results is held in memory at a time.
+    # properties must be those the solution was computed with (a result's
+    # .properties), e.g. a condensed case with a new frame material.
+    os.makedirs(output_dir, exist_ok=True)
+    coords = np.asarray(prepared["coords"])
+    dofs = prepared["dofs"]
+    node_map = bk.dof_node_map(dofs)
+    blocks = element_blocks(prepared)
+    n_elements = sum(block_edof.shape[0] for _, block_edof, _ in blocks)
+
+    outputs = {}
+    for name, n_comp in POSTPROCESS_FIELDS.items():
+        shape = (n_elements, n_comp) if n_comp > 1 else (n_elements,)
+        outputs[name] = np.lib.format.open_memmap(
+            os.path.join(output_dir, name + ".npy"),
+            mode="w+", dtype=np.float64, shape=shape,
         )
-        s0, s1, s2 = es[0], es[1], es[2]
-        von_mises[i] = math.sqrt(s0 * s0 - s0 * s1 + s1 * s1 + 3.0 * s2 * s2)
-    timings["postprocess"] = time.perf_counter() - t0
 
+    offset = 0
+    for block_type, block_edof, block_markers in blocks:
+        element_stress = bk.PLANE_KERNELS[block_type][1]
+        for start in range(0, block_edof.shape[0], chunk_size):
+            stop = min(start + chunk_size, block_edof.shape[0])
+            edof_chunk = block_edof[start:stop]
+            ex, ey = bk.element_coordinates(edof_chunk, coords, dofs, node_map)
+            ed = a[edof_chunk - 1, 0]
+            markers_chunk = block_markers[start:stop]
+
+            for marker, (ep_marker, D_marker) in properties.items():
+                idxs = np.flatnonzero(markers_chunk == marker)
+                if idxs.size == 0:
+                    continue
+                es, et = element_stress(ex[idxs], ey[idxs], ep_marker, D_marker, ed[idxs])
+                s0, s1, s2 = es[:, 0], es[:, 1], es[:, 2]
+                rows = offset + start + idxs
+                outputs["stress"][rows] = es
+                outputs["strain"][rows] = et
+                outputs["von_mises"][rows] = np.sqrt(
+                    s0 * s0 - s0 * s1 + s1 * s1 + 3.0 * s2 * s2
+                )
+        offset += block_edof.shape[0]
+
+    for array in outputs.values():
+        array.flush()
+    return n_elements
+
+def postprocess_case(result, h):
+    # Stress recovery of one profiled repeat: in memory, or streamed in
+    # chunks to POSTPROCESS_DIR without holding the full element fields.
+    if POSTPROCESS_DIR is None:
+        result.postprocess()
+        return
+    mem0 = memory_window()
+    t0 = time.perf_counter()
+    postprocess_to_disk(result.prepared, result.a, os.path.join(POSTPROCESS_DIR, f"h_{h}"),
+                        properties=result.properties)
+    result.timings["postprocess_disk"] = time.perf_counter() - t0
+    if mem0 is not None:
+        result.memory["postprocess_disk"] = window_peak(mem0)
+
+def load_postprocess(output_dir):
+    # Read-only memory-mapped views of the fields written by postprocess_to_disk.
     return {
-        "n_dofs": nDofs,
-        "n_elements": n_elements,
-        "timings": timings,
+        name: np.load(os.path.join(output_dir, name + ".npy"), mmap_mode="r")
+        for name in POSTPROCESS_FIELDS
+    }
+
+def case_arrays(result):
+    # Flatten a CaseResults object into named arrays for the result store.
+    prepared = result.prepared
+    arrays = {
+        "coords": prepared["coords"],
+        "dofs": prepared["dofs"],
+        "a": result.a,
+        "r": result.r,
+        "stress": result.element_stresses,
+        "strain": result.element_strains,
+        "von_mises": result.von_mises,
     }
+    for block_type, block_edof, block_markers in element_blocks(prepared):
+        arrays[f"edof_{block_type}"] = block_edof
+        arrays[f"elementmarkers_{block_type}"] = block_markers
+    for marker, marker_dofs in prepared["bdofs"].items():
+        arrays[f"bdofs_{marker}"] = np.asarray(marker_dofs, dtype=int)
+    return arrays
 
 def run_case(el_size_factor):
     prepared = prepare_case(el_size_factor)
     result = compute_case(prepared)
-    result["timings"]["mesh"] = prepared["mesh_time"]
+    result.timings["mesh"] = prepared["mesh_time"]
     return result
 
+def run_inclusion_sweep(h, inclusions):
+    # Morph the mesh step by step through a sequence of inclusion
+    # geometries, reusing the assembly and solver plans until element
+    # quality forces a remesh.
+    prepared = prepare_case(h)
+    for inclusion in inclusions:
+        prepared = morph_case(prepared, inclusion)
+        morphed = "min_quality" in prepared
+        result = compute_case(prepared)
+        if PRINT_SUMMARY:
+            how = f"morphed (q={prepared['min_quality']:.2f})" if morphed else "remeshed"
+            print(f"inclusion {inclusion}: {how}, "
+                  f"mesh {prepared['mesh_time']:.4f} s, "
+                  f"assembly {result.timings['assembly']:.4f} s, "
+                  f"solve {result.timings['solve']:.4f} s, "
+                  f"max von Mises {result.von_mises.max():.4e}")
+
+def pipelined_cases(mesh_sizes, max_prepared=PIPELINE_MAX_PREPARED):
+    # Yield (h, prepared) in order while a worker process meshes the next
+    # sizes. At most max_prepared meshes exist at once, counting the one
+    # handed to the caller, so a slow consumer holds back the mesher. The
+    # count holds only if the caller drops its reference to a case before
+    # asking for the next one (the loop variable of a for loop is rebound
+    # only after the next case has been produced).
+    max_prepared = max(1, max_prepared)
+    sizes = iter(mesh_sizes)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        while True:
+            for h in itertools.islice(sizes, max_prepared - len(pending)):
+                pending.append((h, pool.submit(prepare_case, h)))
+            if not pending:
+                return
+            h, future = pending.popleft()
+            t0 = time.perf_counter()
+            prepared = future.result()
+            prepared["mesh_wait"] = time.perf_counter() - t0
+            # The finished future keeps its result; hand over the only reference.
+            del future
+            yield h, prepared
+            del prepared
+
+# -----------------------------
+# Adaptive refinement
+# -----------------------------
+def estimate_error(result):
+    # Zienkiewicz-Zhu estimate of a solved case. Returns the estimate with
+    # the per-block 0-based element nodes and the element areas it used.
+    prepared = result.prepared
+    element_nodes = []
+    markers = []
+    areas = []
+    for block_type, block_edof, block_markers in element_blocks(prepared):
+        element_nodes.append(bk.element_nodes(block_edof, prepared["dofs"]))
+        ex, ey = bk.element_coordinates(block_edof, prepared["coords"], prepared["dofs"])
+        areas.append(np.abs(bk.element_areas(ex, ey)))
+        markers.append(block_markers)
+    markers = np.concatenate(markers)
+    areas = np.concatenate(areas)
+
+    compliances = {marker: np.linalg.inv(D_marker)
+                   for marker, (ep_marker, D_marker) in result.properties.items()}
+    estimate = ee.zz_estimate(element_nodes, markers, areas, result.element_stresses,
+                              compliances, np.shape(prepared["coords"])[0], thickness=t)
+    return estimate, element_nodes, areas
+
+def refinement_record(iteration, h, result, estimate, elapsed, n_marked=None):
+    return {
+        "iteration": iteration,
+        "el_size_factor": h,
+        "n_dofs": result.n_dofs,
+        "n_elements": result.n_elements,
+        "error": estimate.relative_error,
+        "n_marked": n_marked,
+        "time": elapsed,
+    }
+
+def run_adaptive(h0, tolerance, max_iterations=ADAPTIVE_MAX_ITERATIONS):
+    # Solve, estimate, and remesh with a size map from the indicators until
+    # the estimated relative error is below tolerance. The mesh keeps
+    # el_size_factor h0, so the size map is given in units of h0 and only
+    # refines where the indicators ask for it.
+    records = []
+    size_fields = ()
+    total = 0.0
+    for iteration in range(max_iterations + 1):
+        t0 = time.perf_counter()
+        prepared = prepare_case(h0, size_fields=size_fields)
+        result = compute_case(prepared)
+        estimate, element_nodes, areas = estimate_error(result)
+        converged = estimate.relative_error <= tolerance or iteration == max_iterations
+        n_marked = None
+        if not converged:
+            sizes = ee.element_sizes(element_nodes, areas)
+            new_sizes, marked = ee.refined_sizes(estimate, sizes, tolerance)
+            n_nodes = np.shape(prepared["coords"])[0]
+            size_fields = (sf.SizeMap(
+                prepared["coords"], element_nodes,
+                ee.nodal_sizes(element_nodes, new_sizes, n_nodes) / h0,
+            ),)
+            n_marked = int(marked.sum())
+        total += time.perf_counter() - t0
+        records.append(refinement_record(iteration, h0, result, estimate, total, n_marked))
+        if converged:
+            break
+    return records
+
+def run_uniform_refinement(h0, tolerance, max_iterations=ADAPTIVE_MAX_ITERATIONS):
+    # Reference for run_adaptive: halve el_size_factor until the same
+    # error estimate is below tolerance.
+    records = []
+    total = 0.0
+    for iteration in range(max_iterations + 1):
+        h = h0 / 2 ** iteration
+        t0 = time.perf_counter()
+        result = compute_case(prepare_case(h))
+        estimate, _, _ = estimate_error(result)
+        total += time.perf_counter() - t0
+        records.append(refinement_record(iteration, h, result, estimate, total))
+        if estimate.relative_error <= tolerance:
+            break
+    return records
+
+def print_refinement(title, records):
+    print(f"\n{title}")
+    print(f"{'iter':>4s} {'h':>8s} {'DOFs':>8s} {'error':>8s} {'marked':>7s} {'time [s]':>9s}")
+    for rec in records:
+        marked = "-" if rec["n_marked"] is None else str(rec["n_marked"])
+        print(f"{rec['iteration']:4d} {rec['el_size_factor']:8.4g} {rec['n_dofs']:8d} "
+              f"{rec['error']:8.2%} {marked:>7s} {rec['time']:9.3f}")
+
+def scaling_record(results, n_dofs, mesh_once_time, avg):
+    # Per-phase time and Python-heap peak of one mesh size for the scaling report.
+    times = dict(avg)
+    prepared = results[0].prepared
+    if mesh_once_time is not None:
+        times["mesh"] = mesh_once_time
+    memory = {}
+    for result in results:
+        for phase, peak in result.memory.items():
+            memory[phase] = max(memory.get(phase, 0), peak)
+    if prepared.get("mesh_memory") is not None:
+        memory["mesh"] = prepared["mesh_memory"]
+    return {"n_dofs": n_dofs, "time": times, "memory": memory}
+
 def main():
+    store = ResultStore(RESULT_STORE_DIR) if RESULT_STORE_DIR is not None else None
+    history = BenchmarkHistory(BENCH_DB) if BENCH_DB is not None else None
+    scaling_records = []
+    if TRACK_MEMORY:
+        tracemalloc.start()
 
-    for h in MESH_SIZES:
+    if REUSE_MESH_IN_REPEATS and PIPELINE_MESHING:
+        prepared_cases = pipelined_cases(MESH_SIZES)
+    elif REUSE_MESH_IN_REPEATS:
+        prepared_cases = ((h, prepare_case(h)) for h in MESH_SIZES)
+    else:
+        prepared_cases = ((h, None) for h in MESH_SIZES)
+
+    for h, prepared in prepared_cases:
         results = []
 
-        if REUSE_MESH_IN_REPEATS:
-            prepared = prepare_case(h)
+        if prepared is not None:
             for _ in range(PROFILE_REPEATS):
                 current = compute_case(prepared)
-                current["timings"]["mesh"] = 0.0
+                postprocess_case(current, h)  # the profile covers stress recovery
+                current.timings["mesh"] = 0.0
                 results.append(current)
             mesh_once_time = prepared["mesh_time"]
         else:
             for _ in range(PROFILE_REPEATS):
-                results.append(run_case(h))
+                current = run_case(h)
+                postprocess_case(current, h)
+                results.append(current)
             mesh_once_time = None
 
-        n_dofs = results[0]["n_dofs"]
-        n_elements = results[0]["n_elements"]
+        n_dofs = results[0].n_dofs
+        n_elements = results[0].n_elements
 
         avg = {}
-        for key in results[0]["timings"]:
-            avg[key] = sum(r["timings"][key] for r in results) / len(results)
+        for key in results[0].timings:
+            avg[key] = sum(r.timings[key] for r in results) / len(results)
+
+        if store is not None:
+            params = {"el_size_factor": h, "el_type": results[-1].prepared.get("el_type")}
+            if params not in store:
+                store.append(params, case_arrays(results[-1]))
 
         if PRINT_SUMMARY:
             print(f"\nMesh size factor: {h}")
@@ -208,8 +978,51 @@ def main():
             print(f"DOFs:     {n_dofs}")
             if mesh_once_time is not None:
                 print(f"mesh_once   : {mesh_once_time:.4f} s")
+            if "mesh_wait" in results[0].prepared:
+                print(f"mesh_wait   : {results[0].prepared['mesh_wait']:.4f} s")
             for key, value in avg.items():
                 print(f"{key:12s}: {value:.4f} s")
+            solver_info = getattr(results[-1], "solver_info", None)
+            if solver_info is not None:
+                print(f"interface   : {solver_info['n_interface']} DOFs, "
+                      f"{solver_info['iterations']} CG iterations")
+                for k, sub in enumerate(solver_info["subdomains"]):
+                    print(f"  subdomain {k}: {sub['n_interior']} interior DOFs, "
+                          f"factorize {sub['factorize']:.4f} s, "
+                          f"apply {sub['apply']:.4f} s ({sub['n_apply']} calls)")
+
+        record = scaling_record(results, n_dofs, mesh_once_time, avg)
+        scaling_records.append(record)
+
+        if history is not None:
+            times = {key: [r.timings[key] for r in results] for key in results[0].timings}
+            if mesh_once_time is not None:
+                times["mesh"] = mesh_once_time
+            history.record(BENCH_NAME, h, times, record["memory"], n_dofs)
+
+        if INCLUSION_SWEEP:
+            run_inclusion_sweep(h, INCLUSION_SWEEP)
+
+        # Release this case's mesh before the next one is produced.
+        del prepared, current, results
+
+    if len(scaling_records) > 1:
+        report = sr.scaling_report(scaling_records, target_dofs=SCALING_TARGET_DOFS)
+        if PRINT_SUMMARY:
+            print("\n" + sr.format_report(report))
+        if SCALING_REPORT_PATH is not None:
+            sr.write_report(report, SCALING_REPORT_PATH)
+
+    if ADAPTIVE_TOLERANCE is not None:
+        h0 = MESH_SIZES[0]
+        adaptive = run_adaptive(h0, ADAPTIVE_TOLERANCE)
+        uniform = run_uniform_refinement(h0, ADAPTIVE_TOLERANCE)
+        if PRINT_SUMMARY:
+            print_refinement(f"Adaptive refinement to {ADAPTIVE_TOLERANCE:.1%}", adaptive)
+            print_refinement(f"Uniform refinement to {ADAPTIVE_TOLERANCE:.1%}", uniform)
+
+    if history is not None:
+        history.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
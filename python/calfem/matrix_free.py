@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Matrix-free operators and conjugate gradients for 4-node field elements.
+
+``ElementOperator`` applies the global conductivity matrix K to a vector
+without assembling it: the element values are gathered, multiplied by the
+element matrices and scatter-added back. The element contribution can be
+stored as full element matrices, as scaled Gauss-point gradients
+(K_e = sum_g G_g^T G_g), or not stored at all and the gradients recomputed
+chunk by chunk on every product. Of the stored forms, only the gradients of
+the one-point rule take less memory than the assembled CSR matrix (see
+``ElementOperator``). Dirichlet conditions are eliminated in
+``solve_constrained``, which runs a preconditioned CG on the free DOFs.
+"""
+
+import warnings
+
+import numpy as np
+
+import batched_kernels as bk
+
+STORAGE_MODES = ("auto", "matrices", "gradients", "recompute")
+
+
+def warn_unconverged(method, iterations, residual, tol):
+    """Warn that an iterative method stopped at maxiter above its tolerance."""
+    warnings.warn(
+        f"{method} did not converge in {iterations} iterations "
+        f"(relative residual {residual:.3e} > tol {tol:.1e})",
+        RuntimeWarning, stacklevel=3,
+    )
+
+
+def pcg(apply, rhs, precondition, tol=1e-10, maxiter=None, x0=None):
+    """
+    Preconditioned conjugate gradients for a symmetric positive definite operator.
+
+    Parameters
+    ----------
+    apply : callable
+        x -> A x.
+    rhs : ndarray, shape (n,)
+    precondition : callable
+        r -> M^-1 r.
+    tol : float
+        Relative residual ||r|| / ||rhs|| to stop at.
+    maxiter : int, optional
+        Defaults to n.
+    x0 : ndarray, optional
+        Start vector (zero by default).
+
+    Returns
+    -------
+    x : ndarray, shape (n,)
+    iterations : int
+    residual : float
+        Final relative residual.
+
+    Warns
+    -----
+    RuntimeWarning
+        If the tolerance is not reached within ``maxiter`` iterations.
+    """
+    maxiter = rhs.size if maxiter is None else maxiter
+    x = np.zeros_like(rhs) if x0 is None else np.array(x0, dtype=float)
+    r = rhs - apply(x) if x0 is not None else rhs.copy()
+    rhs_norm = np.linalg.norm(rhs)
+    if rhs_norm == 0.0:
+        return np.zeros_like(rhs), 0, 0.0
+
+    residual = np.linalg.norm(r) / rhs_norm
+    if residual < tol:
+        return x, 0, residual
+    z = precondition(r)
+    p = z.copy()
+    rz = r @ z
+    for iteration in range(1, maxiter + 1):
+        q = apply(p)
+        alpha = rz / (p @ q)
+        x += alpha * p
+        r -= alpha * q
+        residual = np.linalg.norm(r) / rhs_norm
+        if residual < tol:
+            return x, iteration, residual
+        z = precondition(r)
+        rz_new = r @ z
+        p = z + (rz_new / rz) * p
+        rz = rz_new
+    warn_unconverged("pcg", maxiter, residual, tol)
+    return x, maxiter, residual
+
+
+def smallest_storage(ir):
+    """
+    The stored representation with fewer bytes per element for Gauss rule ir.
+
+    Gradients take ir^2 Gauss points x 2 x 4 values, element matrices
+    4 x 4 values, so gradients are smaller only for the one-point rule.
+    """
+    return "gradients" if 8 * ir * ir < 16 else "matrices"
+
+
+class ElementOperator:
+    """
+    Global conductivity operator of 4-node isoparametric field elements.
+
+    Parameters
+    ----------
+    edof : ndarray, shape (n_elements, 4)
+        1-based element DOFs.
+    n_dofs : int
+    ex, ey : ndarray, shape (n_elements, 4)
+        Element node coordinates.
+    ep : list
+        [t, ir] as for ``flw2i4e``.
+    D : ndarray, shape (2, 2) or (n_elements, 2, 2)
+        Conductivity matrix (symmetric positive definite), shared or per
+        element.
+    storage : str
+        "matrices" keeps the (n_elements, 4, 4) element matrices,
+        "gradients" keeps the scaled Gauss-point gradients
+        (n_elements, ngp, 2, 4), "recompute" keeps nothing and recomputes
+        the gradients of ``chunk_size`` elements at a time, and "auto"
+        picks the smaller of "gradients" and "matrices" for the Gauss
+        rule (``smallest_storage``).
+
+    Notes
+    -----
+    Per element, "matrices" stores 128 bytes and "gradients" 64 ir^2
+    bytes, plus 16 bytes of element DOFs in every mode. The CSR matrix of
+    the assembled K of a Q4 mesh takes about 110 bytes per DOF, and a Q4
+    mesh has about as many elements as DOFs. "matrices" therefore holds
+    more memory than CSR, and of the stored modes only "gradients" with
+    the one-point rule holds less. "recompute" holds the least but is
+    several times slower per product.
+    chunk_size : int
+        Elements per chunk in "recompute" mode.
+    element_matrices : ndarray, shape (n_elements, 4, 4), optional
+        Precomputed element matrices, used instead of ``ex, ey, ep, D``
+        (storage "matrices").
+    """
+
+    def __init__(self, edof, n_dofs, ex=None, ey=None, ep=None, D=None, storage="gradients",
+                 chunk_size=20000, element_matrices=None):
+        if element_matrices is not None:
+            storage = "matrices"
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"storage must be one of {STORAGE_MODES}")
+        if storage == "auto":
+            storage = smallest_storage(ep[1])
+        index_type = np.int32 if n_dofs < 2**31 else np.int64
+        self.edof0      = (np.asarray(edof) - 1).astype(index_type)
+        self.n_dofs     = n_dofs
+        self.ex         = ex
+        self.ey         = ey
+        self.ep         = ep
+        self.D          = None if D is None else np.asarray(D, dtype=float)
+        self.storage    = storage
+        self.chunk_size = chunk_size
+        self._data      = element_matrices
+
+        if element_matrices is None and storage == "matrices":
+            self._data = bk.flw2i4e_batch(ex, ey, ep, self.D)
+        elif storage == "gradients":
+            self._data = self._scaled_gradients(ex, ey, self.D)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the operator (element DOFs and stored element data)."""
+        stored = 0 if self._data is None else self._data.nbytes
+        return self.edof0.nbytes + stored
+
+    def _scaled_gradients(self, ex, ey, D):
+        # G = sqrt(t w detJ) L^T B with D = L L^T, so that sum_g G^T G = K_e.
+        t, ir = self.ep[0], self.ep[1]
+        B, detJ, _, weights = bk._quad_gradients(ex, ey, ir)
+        LT = np.swapaxes(np.linalg.cholesky(D), -1, -2)
+        if LT.ndim == 3:
+            LT = LT[:, None]
+        scale = np.sqrt(t * weights * detJ)
+        return (LT @ B) * scale[:, :, None, None]
+
+    def _element_blocks(self):
+        """Yield (element slice, element data) covering all elements."""
+        if self._data is not None:
+            yield slice(None), self._data
+            return
+        n_elements = self.edof0.shape[0]
+        for start in range(0, n_elements, self.chunk_size):
+            chunk = slice(start, min(start + self.chunk_size, n_elements))
+            D = self.D[chunk] if self.D.ndim == 3 else self.D
+            yield chunk, self._scaled_gradients(self.ex[chunk], self.ey[chunk], D)
+
+    def _element_products(self, data, xe):
+        if self.storage != "matrices":
+            return np.einsum("ngci,ngc->ni", data, np.einsum("ngcj,nj->ngc", data, xe))
+        return np.einsum("nij,nj->ni", data, xe)
+
+    def apply(self, x):
+        """
+        K x for x of shape (n_dofs,) or (n_dofs, n_vectors).
+        """
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 2:
+            return np.column_stack([self.apply(x[:, k]) for k in range(x.shape[1])])
+
+        y = np.zeros(self.n_dofs)
+        for chunk, data in self._element_blocks():
+            edof0 = self.edof0[chunk]
+            ye = self._element_products(data, x[edof0])
+            y += np.bincount(edof0.ravel(), weights=ye.ravel(), minlength=self.n_dofs)
+        return y
+
+    def diagonal(self):
+        """Diagonal of K."""
+        d = np.zeros(self.n_dofs)
+        for chunk, data in self._element_blocks():
+            if self.storage != "matrices":
+                de = np.einsum("ngci,ngci->ni", data, data)
+            else:
+                de = np.diagonal(data, axis1=1, axis2=2)
+            d += np.bincount(self.edof0[chunk].ravel(), weights=de.ravel(),
+                             minlength=self.n_dofs)
+        return d
+
+
+def csr_nbytes(K):
+    """Bytes held by a scipy CSR/CSC matrix (data, indices and indptr)."""
+    return K.data.nbytes + K.indices.nbytes + K.indptr.nbytes
+
+
+def solve_constrained(operator, prescribed, values, tol=1e-10, maxiter=None, preconditioner=None,
+                      iterate=pcg):
+    """
+    Solve K a = 0 with prescribed values by elimination and CG.
+
+    The prescribed DOFs are removed from the system; their values enter
+    the right-hand side of the free DOFs as -K_fp a_p.
+
+    Parameters
+    ----------
+    operator : ElementOperator
+        Or any object with ``apply``, ``diagonal`` and ``n_dofs``.
+    prescribed : ndarray of int
+        0-based prescribed DOFs.
+    values : ndarray, shape (n_prescribed,) or (n_prescribed, n_cases)
+        Prescribed values, one column per case.
+    tol, maxiter
+        Passed to ``iterate``.
+    preconditioner : callable, optional
+        (free, diagonal) -> r -> M^-1 r on the free DOFs. Jacobi (the
+        inverse diagonal) by default.
+    iterate : callable
+        Iterative method with the signature of ``pcg``.
+
+    Returns
+    -------
+    a : ndarray, shape (n_dofs,) or (n_dofs, n_cases)
+    info : dict
+        iterations, residual and converged (residual below tol) of every
+        case, and the operator bytes.
+    """
+    values = np.asarray(values, dtype=float)
+    columns = values.reshape(values.shape[0], -1)
+    n_dofs = operator.n_dofs
+    free = np.setdiff1d(np.arange(n_dofs), prescribed)
+
+    diagonal = operator.diagonal()[free]
+    if preconditioner is None:
+        inv_diag = 1.0 / diagonal
+
+        def precondition(r):
+            return inv_diag * r
+    else:
+        precondition = preconditioner(free, diagonal)
+
+    def apply_free(p):
+        x = np.zeros(n_dofs)
+        x[free] = p
+        return operator.apply(x)[free]
+
+    a = np.zeros((n_dofs, columns.shape[1]))
+    info = {
+        "iterations": [], "residual": [], "converged": [],
+        "operator_bytes": getattr(operator, "nbytes", None),
+    }
+    for k in range(columns.shape[1]):
+        a[prescribed, k] = columns[:, k]
+        rhs = -operator.apply(a[:, k])[free]
+        a[free, k], iterations, residual = iterate(apply_free, rhs, precondition, tol, maxiter)
+        info["iterations"].append(iterations)
+        info["residual"].append(float(residual))
+        info["converged"].append(bool(residual < tol))
+
+    return (a[:, 0] if values.ndim == 1 else a), info
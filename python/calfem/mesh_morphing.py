@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Mesh morphing: move the nodes of an existing mesh to a slightly changed
+geometry while keeping its topology.
+
+Nodes with prescribed displacements (typically the nodes on the moved
+boundaries, plus the fixed outer boundary) are moved directly; all other
+nodes follow by Laplacian smoothing of the displacement field over the
+element connectivity graph. Because ``edof``, ``dofs`` and ``bdofs`` are
+unchanged, anything derived from the topology alone (sparsity patterns,
+fill-reducing orderings) can be reused for the morphed mesh.
+"""
+
+import numpy as np
+from scipy.sparse import coo_matrix, diags
+from scipy.sparse.linalg import splu
+
+
+def graph_laplacian(node_blocks, n_nodes):
+    """
+    Graph Laplacian of the node connectivity implied by the elements.
+
+    Parameters
+    ----------
+    node_blocks : list of ndarray of int
+        0-based node indices of every element, one (n_elements,
+        n_nodes_per_element) array per element type.
+    n_nodes : int
+        Total number of nodes.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix, shape (n_nodes, n_nodes)
+    """
+    # Connect consecutive corners of each element (its edges).
+    first = np.concatenate([np.ravel(nodes) for nodes in node_blocks])
+    second = np.concatenate([np.roll(nodes, -1, axis=1).ravel() for nodes in node_blocks])
+    rows = np.concatenate([first, second])
+    cols = np.concatenate([second, first])
+    A = coo_matrix((np.ones(rows.size), (rows, cols)), shape=(n_nodes, n_nodes)).tocsr()
+    A.data[:] = 1.0     # edges shared by two elements count once
+
+    degree = np.bincount(A.indices, minlength=n_nodes).astype(float)
+    return (diags(degree) - A).tocsr()
+
+
+def laplacian_morph(coords, node_blocks, fixed_nodes, fixed_displacements):
+    """
+    Morph node coordinates by harmonic extension of boundary displacements.
+
+    Parameters
+    ----------
+    coords : ndarray, shape (n_nodes, 2)
+        Node coordinates of the mesh to morph.
+    node_blocks : list of ndarray of int
+        0-based node indices of every element, one array per element type.
+    fixed_nodes : ndarray of int
+        Nodes whose displacement is prescribed.
+    fixed_displacements : ndarray, shape (len(fixed_nodes), 2)
+        Prescribed displacement of each fixed node.
+
+    Returns
+    -------
+    ndarray, shape (n_nodes, 2)
+        Morphed node coordinates.
+    """
+    coords = np.asarray(coords, dtype=float)
+    n_nodes = coords.shape[0]
+    fixed_nodes = np.asarray(fixed_nodes, dtype=int)
+
+    free = np.ones(n_nodes, dtype=bool)
+    free[fixed_nodes] = False
+    free_nodes = np.flatnonzero(free)
+
+    displacement = np.zeros((n_nodes, 2))
+    displacement[fixed_nodes] = fixed_displacements
+
+    if free_nodes.size > 0:
+        L = graph_laplacian(node_blocks, n_nodes)
+        L_ff = L[free_nodes][:, free_nodes].tocsc()
+        rhs = -(L[free_nodes][:, fixed_nodes] @ displacement[fixed_nodes])
+        displacement[free_nodes] = splu(L_ff).solve(rhs)
+
+    return coords + displacement
+
+
+def element_quality(ex, ey):
+    """
+    Shape quality of stacked triangles or quadrilaterals.
+
+    Quadrilaterals use the minimum scaled Jacobian over the four corners
+    (1 for a rectangle, <= 0 for an inverted or degenerate corner).
+    Triangles use 4*sqrt(3)*A / sum(l^2) (1 for an equilateral triangle).
+
+    Parameters
+    ----------
+    ex, ey : ndarray, shape (n_elements, 3) or (n_elements, 4)
+        Element node coordinates, ordered counter-clockwise.
+
+    Returns
+    -------
+    ndarray, shape (n_elements,)
+    """
+    ex = np.asarray(ex, dtype=float)
+    ey = np.asarray(ey, dtype=float)
+    dx_next = np.roll(ex, -1, axis=1) - ex
+    dy_next = np.roll(ey, -1, axis=1) - ey
+
+    if ex.shape[1] == 3:
+        area = 0.5 * (dx_next[:, 0] * dy_next[:, 1] - dy_next[:, 0] * dx_next[:, 1])
+        edge_sq = (dx_next**2 + dy_next**2).sum(axis=1)
+        return 4.0 * np.sqrt(3.0) * area / edge_sq
+
+    dx_prev = np.roll(ex, 1, axis=1) - ex
+    dy_prev = np.roll(ey, 1, axis=1) - ey
+    cross = dx_next * dy_prev - dy_next * dx_prev
+    lengths = np.hypot(dx_next, dy_next) * np.hypot(dx_prev, dy_prev)
+    return (cross / lengths).min(axis=1)
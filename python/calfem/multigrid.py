@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Geometric multigrid for scalar problems on nested 4-node quadrilateral meshes.
+
+A coarse mesh is refined uniformly: every quadrilateral is split into four
+through its edge midpoints and its centre. The nodes of a coarse level keep
+their numbers on the next finer level, followed by the edge midpoints and
+the element centres, so a DOF prescribed on the fine level is also
+prescribed on every coarser level that has it. Bilinear interpolation
+between the levels is the prolongation and its transpose the restriction.
+
+``GeometricMultigrid`` runs V-cycles with a damped Jacobi smoother and a
+sparse LU solve on the coarsest level. All level operators are applied
+element by element (``matrix_free.ElementOperator``); only the coarsest
+level is assembled. A V-cycle can be used on its own (``richardson``) or as the
+preconditioner of ``matrix_free.pcg``.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.linalg import splu
+
+import batched_kernels as bk
+import matrix_free as mf
+
+QuadRefinement = namedtuple("QuadRefinement", "coords nodes prolongation edges")
+QuadRefinement.__doc__ = """
+Result of ``refine_quads``.
+
+coords : ndarray, shape (n_fine_nodes, 2)
+nodes : ndarray, shape (4 * n_elements, 4)
+    0-based node indices of the fine elements.
+prolongation : scipy.sparse.csr_matrix, shape (n_fine_nodes, n_coarse_nodes)
+    Bilinear interpolation of coarse nodal values to the fine nodes.
+edges : ndarray, shape (n_edges, 2)
+    Coarse end nodes of every edge; edge k has midpoint node
+    n_coarse_nodes + k.
+"""
+
+
+def refine_quads(coords, nodes):
+    """
+    Split every quadrilateral into four.
+
+    Parameters
+    ----------
+    coords : ndarray, shape (n_nodes, 2)
+    nodes : ndarray, shape (n_elements, 4)
+        0-based element nodes, counter-clockwise.
+
+    Returns
+    -------
+    QuadRefinement
+    """
+    coords = np.asarray(coords, dtype=float)[:, :2]
+    nodes = np.asarray(nodes)
+    n_nodes = coords.shape[0]
+    n_elements = nodes.shape[0]
+
+    # Element edges k = (node k, node k+1); shared edges get one midpoint.
+    element_edges = np.stack([nodes, np.roll(nodes, -1, axis=1)], axis=2)
+    edges, edge_index = np.unique(
+        np.sort(element_edges.reshape(-1, 2), axis=1), axis=0, return_inverse=True
+    )
+    edge_index = edge_index.reshape(n_elements, 4)
+    n_edges = edges.shape[0]
+
+    mid = n_nodes + edge_index
+    centre = n_nodes + n_edges + np.arange(n_elements)
+    fine_coords = np.vstack([
+        coords,
+        coords[edges].mean(axis=1),
+        coords[nodes].mean(axis=1),
+    ])
+
+    # Child k keeps corner k: corner, next midpoint, centre, previous midpoint.
+    fine_nodes = np.stack([
+        np.column_stack([nodes[:, k], mid[:, k], centre, mid[:, k - 1]])
+        for k in range(4)
+    ], axis=1).reshape(-1, 4)
+
+    rows = np.concatenate([
+        np.arange(n_nodes),
+        np.repeat(n_nodes + np.arange(n_edges), 2),
+        np.repeat(centre, 4),
+    ])
+    cols = np.concatenate([np.arange(n_nodes), edges.ravel(), nodes.ravel()])
+    weights = np.concatenate([
+        np.ones(n_nodes), np.full(2 * n_edges, 0.5), np.full(4 * n_elements, 0.25),
+    ])
+    P = csr_matrix((weights, (rows, cols)), shape=(fine_coords.shape[0], n_nodes))
+    return QuadRefinement(fine_coords, fine_nodes, P, edges)
+
+
+def refine_node_set(node_set, refinement, n_coarse_nodes):
+    """
+    Nodes of a refined mesh on a coarse boundary node set.
+
+    The coarse nodes are kept, and the midpoint of every edge with both
+    end nodes in the set is added.
+
+    Parameters
+    ----------
+    node_set : array_like of int
+        0-based coarse nodes, e.g. of a boundary marker.
+    refinement : QuadRefinement
+    n_coarse_nodes : int
+
+    Returns
+    -------
+    ndarray of int
+    """
+    node_set = np.asarray(node_set, dtype=int)
+    inside = np.zeros(n_coarse_nodes, dtype=bool)
+    inside[node_set] = True
+    edges = np.flatnonzero(inside[refinement.edges].all(axis=1))
+    return np.concatenate([node_set, n_coarse_nodes + edges])
+
+
+def richardson(apply, rhs, precondition, tol=1e-10, maxiter=None, x0=None):
+    """
+    Preconditioned Richardson iteration x += M^-1 (b - A x).
+
+    Same interface as ``matrix_free.pcg``; with a V-cycle as M^-1 this is
+    plain multigrid. Warns (RuntimeWarning) if the tolerance is not reached
+    within ``maxiter`` (default 100) iterations.
+    """
+    maxiter = 100 if maxiter is None else maxiter
+    x = np.zeros_like(rhs) if x0 is None else np.array(x0, dtype=float)
+    rhs_norm = np.linalg.norm(rhs)
+    if rhs_norm == 0.0:
+        return np.zeros_like(rhs), 0, 0.0
+
+    r = rhs - apply(x)
+    residual = np.linalg.norm(r) / rhs_norm
+    for iteration in range(1, maxiter + 1):
+        if residual < tol:
+            return x, iteration - 1, residual
+        x += precondition(r)
+        r = rhs - apply(x)
+        residual = np.linalg.norm(r) / rhs_norm
+    if residual < tol:
+        return x, maxiter, residual
+    mf.warn_unconverged("richardson", maxiter, residual, tol)
+    return x, maxiter, residual
+
+
+# Local bilinear interpolation of the four children of a quadrilateral:
+# _CHILD_INTERPOLATION[k] maps the parent's corner values to the corner
+# values of child k (corner k, midpoint k, centre, midpoint k - 1).
+_CHILD_INTERPOLATION = np.array([
+    [np.eye(4)[k],
+     0.5 * (np.eye(4)[k] + np.eye(4)[(k + 1) % 4]),
+     np.full(4, 0.25),
+     0.5 * (np.eye(4)[k - 1] + np.eye(4)[k])]
+    for k in range(4)
+])
+
+
+def coarsen_element_matrices(Ke):
+    """
+    Galerkin element matrices of the parent elements of ``refine_quads``.
+
+    The children of every parent only interpolate from the parent's four
+    nodes, so P^T K P can be formed element by element: the parent matrix
+    is sum_k Q_k^T K_k Q_k over its children k.
+
+    Parameters
+    ----------
+    Ke : ndarray, shape (4 * n_parents, 4, 4)
+        Element matrices of the refined mesh, children in
+        ``refine_quads`` order.
+
+    Returns
+    -------
+    ndarray, shape (n_parents, 4, 4)
+    """
+    children = np.asarray(Ke).reshape(-1, 4, 4, 4)
+    Q = _CHILD_INTERPOLATION
+    return np.einsum("kai,pkab,kbj->pij", Q, children, Q)
+
+
+class GeometricMultigrid:
+    """
+    V-cycle multigrid on a hierarchy of nested Q4 meshes.
+
+    The finest level is the matrix-free operator of the discretization.
+    The coarser levels use Galerkin operators P^T K P, formed element by
+    element with ``coarsen_element_matrices``; unlike rediscretized coarse
+    operators they stay consistent with the fine operator for the
+    reduced (one-point) integration used by the examples.
+
+    Parameters
+    ----------
+    levels : list of (edof, n_dofs)
+        1-based element DOFs and DOF count of every level, coarsest first;
+        the elements of level l + 1 are the children of those of level l.
+    prolongations : list of scipy.sparse matrix
+        ``prolongations[l]`` interpolates level l to level l + 1.
+    ex, ey : ndarray, shape (n_elements, 4)
+        Element node coordinates of the finest level.
+    ep : list
+        [t, ir] as for ``flw2i4e``.
+    D : ndarray, shape (2, 2) or (n_elements, 2, 2)
+        Conductivity matrix, shared or per finest-level element.
+    prescribed : ndarray of int
+        0-based prescribed DOFs of the finest level.
+    smoothing_steps : int
+        Jacobi sweeps before and after the coarse-grid correction.
+    omega : float
+        Jacobi damping relative to the largest eigenvalue of D^-1 K of
+        each level, estimated by power iteration; the smoother weight is
+        omega / lambda_max. One-point integration roughly doubles
+        lambda_max compared with full integration, so a fixed weight is
+        not safe for both.
+    storage : str
+        Element data kept by the finest-level operator (see
+        ``matrix_free.ElementOperator``).
+    """
+
+    def __init__(self, levels, prolongations, ex, ey, ep, D, prescribed, smoothing_steps=2,
+                 omega=4.0 / 3.0, storage="auto"):
+        self.smoothing_steps = smoothing_steps
+        self.omega           = omega
+        prescribed = np.asarray(prescribed)
+
+        # Operators from the finest level down.
+        edof, n_dofs = levels[-1]
+        operators = [mf.ElementOperator(edof, n_dofs, ex, ey, ep, D, storage=storage)]
+        Ke = bk.flw2i4e_batch(ex, ey, ep, D)
+        for edof, n_dofs in reversed(levels[:-1]):
+            Ke = coarsen_element_matrices(Ke)
+            operators.append(mf.ElementOperator(edof, n_dofs, element_matrices=Ke))
+        self.operators = operators[::-1]
+
+        self.free     = []
+        self.inv_diag = []
+        for operator in self.operators:
+            n_dofs = operator.n_dofs
+            free = np.setdiff1d(np.arange(n_dofs), prescribed[prescribed < n_dofs])
+            self.free.append(free)
+            self.inv_diag.append(1.0 / operator.diagonal()[free])
+
+        # Damped Jacobi weights omega / lambda_max(D^-1 K) per level.
+        self.weights = [
+            omega / self._max_eigenvalue(level) for level in range(self.n_levels)
+        ]
+
+        # Prolongations between the free DOFs of consecutive levels.
+        self.prolongations = [
+            P.tocsr()[self.free[l + 1]][:, self.free[l]]
+            for l, P in enumerate(prolongations)
+        ]
+        self.restrictions = [P.T.tocsr() for P in self.prolongations]
+
+        # The coarsest level is assembled and factorized.
+        coarse = self.operators[0]
+        edof0 = coarse.edof0
+        n_edof = edof0.shape[1]
+        K0 = coo_matrix(
+            (Ke.ravel(), (np.repeat(edof0, n_edof, axis=1).ravel(),
+                          np.tile(edof0, (1, n_edof)).ravel())),
+            shape=(coarse.n_dofs, coarse.n_dofs),
+        ).tocsr()
+        free = self.free[0]
+        self._coarse_lu = splu(K0[free][:, free].tocsc())
+
+    @property
+    def n_levels(self):
+        return len(self.operators)
+
+    @property
+    def operator(self):
+        """Matrix-free operator of the finest level."""
+        return self.operators[-1]
+
+    def _apply(self, level, x_free):
+        operator = self.operators[level]
+        x = np.zeros(operator.n_dofs)
+        x[self.free[level]] = x_free
+        return operator.apply(x)[self.free[level]]
+
+    def _max_eigenvalue(self, level, iterations=20):
+        """Power-iteration estimate of the largest eigenvalue of D^-1 K."""
+        inv_diag = self.inv_diag[level]
+        x = np.random.default_rng(0).random(inv_diag.size)
+        eigenvalue = 1.0
+        for _ in range(iterations):
+            y = inv_diag * self._apply(level, x)
+            eigenvalue = np.linalg.norm(y) / np.linalg.norm(x)
+            x = y
+        # Power iteration approaches lambda_max from below.
+        return 1.05 * eigenvalue
+
+    def vcycle(self, rhs, level=None):
+        """
+        One V-cycle for K x = rhs on the free DOFs of a level (finest by default).
+        """
+        level = self.n_levels - 1 if level is None else level
+        if level == 0:
+            return self._coarse_lu.solve(rhs)
+
+        inv_diag = self.weights[level] * self.inv_diag[level]
+        x = inv_diag * rhs
+        for _ in range(self.smoothing_steps - 1):
+            x += inv_diag * (rhs - self._apply(level, x))
+
+        r = rhs - self._apply(level, x)
+        x += self.prolongations[level - 1] @ self.vcycle(
+            self.restrictions[level - 1] @ r, level - 1
+        )
+
+        for _ in range(self.smoothing_steps):
+            x += inv_diag * (rhs - self._apply(level, x))
+        return x
+
+    def preconditioner(self, free, diagonal):
+        """``matrix_free.solve_constrained`` preconditioner factory: one V-cycle."""
+        if not np.array_equal(free, self.free[-1]):
+            raise ValueError("Prescribed DOFs differ from those of the hierarchy")
+        return self.vcycle
+
+    @property
+    def nbytes(self):
+        """Bytes held by the level operators, transfer operators and coarse factors."""
+        total = sum(operator.nbytes for operator in self.operators)
+        total += sum(mf.csr_nbytes(P) + mf.csr_nbytes(R)
+                     for P, R in zip(self.prolongations, self.restrictions))
+        lu = self._coarse_lu
+        return total + mf.csr_nbytes(lu.L) + mf.csr_nbytes(lu.U)
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only on-disk store for the results of parameter sweeps.
+
+Each case is written to its own compressed ``.npz`` archive inside the
+store directory and registered in a small JSON index keyed by the case
+parameters. Large arrays are split into row chunks stored as separate
+archive members, so reading one field, or a few rows of it, only
+decompresses the chunks that are needed. Adding a case never rewrites
+the archives of existing cases.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+def _json_default(value):
+    """JSON form of NumPy scalars and arrays in case parameters."""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist() if isinstance(value, np.ndarray) else value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class ResultStore:
+    """
+    Directory of compressed per-case result archives.
+
+    Parameters
+    ----------
+    path : str
+        Store directory. Created if it does not exist.
+    chunk_rows : int
+        Maximum number of rows per stored chunk of an array.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, path, chunk_rows=65536):
+        self.path       = path
+        self.chunk_rows = chunk_rows
+        os.makedirs(path, exist_ok=True)
+        self._index     = self._read_index()
+
+    # ------------------------------------------------------------------
+    # Public interface
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def case_key(params):
+        """
+        Canonical string key for a dict of case parameters.
+
+        NumPy scalars are keyed like the Python numbers they hold, so
+        ``{"n": np.int64(3)}`` and ``{"n": 3}`` name the same case.
+        """
+        return json.dumps(params, sort_keys=True, default=_json_default)
+
+    def cases(self):
+        """
+        Parameters of all stored cases, in insertion order.
+
+        Returns
+        -------
+        list of dict
+        """
+        return [entry["params"] for entry in self._index.values()]
+
+    def __contains__(self, params):
+        return self.case_key(params) in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def append(self, params, arrays):
+        """
+        Store the arrays of a new case.
+
+        Parameters
+        ----------
+        params : dict
+            JSON-serialisable case parameters; used as the case key.
+        arrays : dict
+            Mapping from field name to array.
+
+        Raises
+        ------
+        ValueError
+            If a case with the same parameters is already stored.
+        """
+        key = self.case_key(params)
+        if key in self._index:
+            raise ValueError(f"Case {key} is already stored in {self.path}")
+
+        file_name = f"case_{len(self._index):06d}.npz"
+        members = {}
+        fields = {}
+        for name, value in arrays.items():
+            value = np.asarray(value)
+            n_chunks = max(1, -(-value.shape[0] // self.chunk_rows)) if value.ndim else 1
+            fields[name] = {
+                "shape": list(value.shape),
+                "dtype": value.dtype.str,
+                "n_chunks": n_chunks,
+                "chunk_rows": self.chunk_rows,
+            }
+            if value.ndim == 0:
+                members[f"{name}/0"] = value
+                continue
+            for chunk in range(n_chunks):
+                rows = slice(chunk * self.chunk_rows, (chunk + 1) * self.chunk_rows)
+                members[f"{name}/{chunk}"] = value[rows]
+
+        tmp_path = os.path.join(self.path, file_name + ".tmp")
+        with open(tmp_path, "wb") as archive:
+            np.savez_compressed(archive, **members)
+        os.replace(tmp_path, os.path.join(self.path, file_name))
+
+        self._index[key] = {"params": params, "file": file_name, "fields": fields}
+        self._write_index()
+
+    def fields(self, params):
+        """
+        Names of the fields stored for a case.
+
+        Returns
+        -------
+        list of str
+        """
+        return list(self._entry(params)["fields"])
+
+    def load(self, params, name, rows=None):
+        """
+        Read one field of one case.
+
+        Only the archive members holding the requested rows are read and
+        decompressed.
+
+        Parameters
+        ----------
+        params : dict
+            Case parameters used when the case was appended.
+        name : str
+            Field name.
+        rows : slice, optional
+            Rows to read along the first axis, with any step (including
+            negative ones). All rows if omitted.
+
+        Returns
+        -------
+        ndarray
+        """
+        entry = self._entry(params)
+        if name not in entry["fields"]:
+            raise KeyError(f"Field '{name}' not stored for case {self.case_key(params)}")
+        field = entry["fields"][name]
+        shape = tuple(field["shape"])
+
+        with np.load(os.path.join(self.path, entry["file"])) as archive:
+            if not shape:
+                return archive[f"{name}/0"]
+
+            chunk_rows = field["chunk_rows"]
+            idx = np.arange(*(rows or slice(None)).indices(shape[0]))
+            if idx.size == 0:
+                return np.empty((0,) + shape[1:], dtype=np.dtype(field["dtype"]))
+            first = idx.min() // chunk_rows
+            last = idx.max() // chunk_rows
+            data = np.concatenate([archive[f"{name}/{chunk}"]
+                                   for chunk in range(first, last + 1)])
+
+        return data[idx - first * chunk_rows]
+
+    # ------------------------------------------------------------------
+    # Index handling
+    # ------------------------------------------------------------------
+
+    def _entry(self, params):
+        key = self.case_key(params)
+        if key not in self._index:
+            raise KeyError(f"No case {key} in {self.path}")
+        return self._index[key]
+
+    def _read_index(self):
+        index_path = os.path.join(self.path, self.INDEX_NAME)
+        if not os.path.exists(index_path):
+            return {}
+        with open(index_path, "r") as index_file:
+            entries = json.load(index_file)
+        return {self.case_key(entry["params"]): entry for entry in entries}
+
+    def _write_index(self):
+        index_path = os.path.join(self.path, self.INDEX_NAME)
+        with open(index_path + ".tmp", "w") as index_file:
+            json.dump(list(self._index.values()), index_file, indent=1,
+                      default=_json_default)
+        os.replace(index_path + ".tmp", index_path)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Empirical scaling analysis of per-phase timings and memory across meshes.
+
+Each phase's time (and peak memory, when measured) is fitted with a power
+law ``c * n_dofs**p`` by least squares in log-log space. Phases whose
+exponent exceeds the expected one by more than a tolerance are flagged,
+and every fit is extrapolated to a target problem size. The report is a
+plain dict that can be printed as text or written as JSON.
+
+The memory of the ex2 driver is the Python-heap peak traced by
+tracemalloc. It does not include allocations made in C libraries (the
+SuperLU factors, Gmsh) or in worker processes (domain decomposition,
+pipelined meshing), so it understates the mesh and solve phases. The
+report names the metric it was given.
+"""
+
+import json
+
+import numpy as np
+
+# Expected exponents for 2-D meshes. Assembly, meshing and element-wise
+# post-processing are linear; a sparse direct solve with a fill-reducing
+# ordering costs about n^1.5 flops and n log n memory.
+EXPECTED_TIME_EXPONENTS = {
+    "mesh": 1.0,
+    "assembly": 1.0,
+    "solve": 1.5,
+    "postprocess": 1.0,
+    "postprocess_disk": 1.0,
+}
+# Only for phases whose memory the Python heap reflects: most of the mesh
+# and solve memory is allocated by Gmsh, SuperLU or worker processes.
+EXPECTED_MEMORY_EXPONENTS = {
+    "assembly": 1.0,
+    "postprocess": 1.0,
+}
+
+PYTHON_HEAP_PEAK = "Python-heap peak (tracemalloc; excludes C libraries and worker processes)"
+
+
+def fit_power_law(n, values):
+    """
+    Least-squares fit of ``values = c * n**p`` in log-log space.
+
+    Parameters
+    ----------
+    n : array_like
+        Problem sizes.
+    values : array_like
+        Measured values. Non-positive or missing (None) values are ignored.
+
+    Returns
+    -------
+    (p, c) or None
+        Exponent and coefficient, or None if fewer than two distinct
+        sizes have usable values.
+    """
+    pairs = [(float(x), float(y)) for x, y in zip(n, values)
+             if y is not None and y > 0.0 and x > 0]
+    if len({x for x, _ in pairs}) < 2:
+        return None
+    log_n, log_y = np.log(np.array(pairs)).T
+    p, log_c = np.polyfit(log_n, log_y, 1)
+    return float(p), float(np.exp(log_c))
+
+
+def _fit_phases(n_dofs, series, expected, tolerance, target_dofs):
+    phases = {}
+    for phase, values in series.items():
+        fit = fit_power_law(n_dofs, values)
+        if fit is None:
+            continue
+        p, c = fit
+        expected_p = expected.get(phase)
+        phases[phase] = {
+            "exponent": p,
+            "coefficient": c,
+            "expected": expected_p,
+            "flagged": expected_p is not None and p > expected_p + tolerance,
+            "extrapolated": c * target_dofs**p if target_dofs else None,
+        }
+    return phases
+
+
+def scaling_report(records, target_dofs=None, tolerance=0.2,
+                   expected_time=None, expected_memory=None, memory_metric=PYTHON_HEAP_PEAK):
+    """
+    Fit per-phase scaling exponents over a set of runs.
+
+    Parameters
+    ----------
+    records : list of dict
+        One entry per mesh size with keys ``"n_dofs"``, ``"time"`` (phase ->
+        seconds) and optionally ``"memory"`` (phase -> peak bytes).
+    target_dofs : int, optional
+        Problem size to extrapolate every phase to.
+    tolerance : float
+        Allowed excess of a fitted exponent over the expected exponent
+        before the phase is flagged.
+    expected_time, expected_memory : dict, optional
+        Expected exponents per phase. Default to EXPECTED_TIME_EXPONENTS
+        and EXPECTED_MEMORY_EXPONENTS.
+    memory_metric : str
+        What the memory values measure, shown with the memory fits.
+
+    Returns
+    -------
+    dict
+        ``{"n_dofs": [...], "target_dofs": ..., "tolerance": ...,
+        "memory_metric": ..., "time": {phase: fit}, "memory": {phase: fit}}``
+        where each fit has exponent, coefficient, expected, flagged and
+        extrapolated.
+    """
+    expected_time = EXPECTED_TIME_EXPONENTS if expected_time is None else expected_time
+    expected_memory = EXPECTED_MEMORY_EXPONENTS if expected_memory is None else expected_memory
+    n_dofs = [record["n_dofs"] for record in records]
+
+    report = {"n_dofs": n_dofs, "target_dofs": target_dofs, "tolerance": tolerance,
+              "memory_metric": memory_metric}
+    for kind, expected in (("time", expected_time), ("memory", expected_memory)):
+        phases = []
+        for record in records:
+            phases += [phase for phase in record.get(kind) or {} if phase not in phases]
+        series = {
+            phase: [(record.get(kind) or {}).get(phase) for record in records]
+            for phase in phases
+        }
+        report[kind] = _fit_phases(n_dofs, series, expected, tolerance, target_dofs)
+    return report
+
+
+def format_report(report):
+    """Plain-text table of a report from ``scaling_report``."""
+    target = report["target_dofs"]
+    lines = [f"Scaling over n_dofs = {', '.join(str(n) for n in report['n_dofs'])}"]
+    units = {"time": ("s", 1.0), "memory": ("MB", 1.0 / 2**20)}
+    for kind in ("time", "memory"):
+        if not report[kind]:
+            continue
+        unit, scale = units[kind]
+        if kind == "memory" and report.get("memory_metric"):
+            lines.append(f"memory, {report['memory_metric']}:")
+        else:
+            lines.append(f"{kind}:")
+        for phase, fit in report[kind].items():
+            expected = "  -  " if fit["expected"] is None else f"{fit['expected']:.2f}"
+            line = f"  {phase:16s} p = {fit['exponent']:5.2f} (expected {expected})"
+            if target:
+                line += f"  -> {fit['extrapolated'] * scale:.4g} {unit} at {target} DOFs"
+            if fit["flagged"]:
+                line += "  WORSE THAN EXPECTED"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def write_report(report, path):
+    """Write a report from ``scaling_report`` as JSON."""
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=1)
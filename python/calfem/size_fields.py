@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Gmsh mesh size fields for CALFEM geometries.
+
+``calfem.mesh.GmshMeshGenerator`` writes the geometry to a .geo file and
+lets Gmsh mesh it with the characteristic lengths of the geometry points,
+scaled by ``el_size_factor``. The generator below appends Gmsh ``Field``
+definitions to that file, so the element size can also be graded with the
+distance to chosen geometry points, or interpolated from sizes given at
+the nodes of an existing mesh. Gmsh uses the smallest of the point sizes
+and the field sizes, and ``el_size_factor`` scales the result.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import calfem.mesh as cfm
+
+
+class DistanceThreshold(namedtuple(
+        "DistanceThreshold", "points size_min size_max dist_min dist_max")):
+    """
+    Element size growing with the distance to a set of geometry points.
+
+    The size is ``size_min`` up to ``dist_min`` from the nearest point,
+    grows linearly to ``size_max`` at ``dist_max``, and stays at
+    ``size_max`` beyond.
+
+    Parameters
+    ----------
+    points : tuple of int
+        0-based geometry point IDs (as returned by ``cfg.Geometry.point``).
+    size_min, size_max : float
+        Element size near and far from the points.
+    dist_min, dist_max : float
+        Distances where the grading starts and ends.
+    """
+
+    __slots__ = ()
+
+
+class SizeMap(namedtuple("SizeMap", "coords elements sizes")):
+    """
+    Element size interpolated over the elements of a background mesh.
+
+    Written to the .geo file as a Gmsh post-processing view and used
+    through a ``PostView`` field; outside the background mesh the field
+    does not constrain the size.
+
+    Parameters
+    ----------
+    coords : ndarray, shape (n_nodes, 2)
+        Node coordinates of the background mesh.
+    elements : sequence of ndarray
+        0-based node indices of the background elements, one
+        (n_elements, 3) or (n_elements, 4) array per element type.
+    sizes : ndarray, shape (n_nodes,)
+        Element size at every node.
+    """
+
+    __slots__ = ()
+
+
+def _size_map_view(size_map, name):
+    """Gmsh view statement holding the sizes of a SizeMap."""
+    coords = np.asarray(size_map.coords, dtype=float)[:, :2]
+    sizes = np.asarray(size_map.sizes, dtype=float)
+    lines = [f'View "{name}" {{']
+    for nodes in size_map.elements:
+        nodes = np.asarray(nodes)
+        kind = {3: "ST", 4: "SQ"}[nodes.shape[1]]
+        for element in nodes:
+            points = ",".join(f"{x:.10g},{y:.10g},0" for x, y in coords[element])
+            values = ",".join(f"{value:.10g}" for value in sizes[element])
+            lines.append(f"{kind}({points}){{{values}}};")
+    lines.append("};")
+    return lines
+
+
+def size_field_lines(size_fields):
+    """
+    Gmsh .geo statements defining a background size field.
+
+    Parameters
+    ----------
+    size_fields : sequence of DistanceThreshold or SizeMap
+
+    Returns
+    -------
+    list of str
+        Field definitions combined with ``Min`` and set as the background
+        field; empty if there are no fields.
+    """
+    lines = []
+    thresholds = []
+    field_id = 0
+    n_views = 0
+    for field in size_fields:
+        if isinstance(field, SizeMap):
+            field_id += 1
+            lines += _size_map_view(field, f"size map {n_views}")
+            lines += [
+                f"Field[{field_id}] = PostView;",
+                f"Field[{field_id}].ViewIndex = {n_views};",
+            ]
+            thresholds.append(field_id)
+            n_views += 1
+            continue
+
+        points = ", ".join(str(point + 1) for point in field.points)
+        distance_id, threshold_id = field_id + 1, field_id + 2
+        lines += [
+            f"Field[{distance_id}] = Distance;",
+            f"Field[{distance_id}].PointsList = {{{points}}};",
+            f"Field[{threshold_id}] = Threshold;",
+            f"Field[{threshold_id}].InField = {distance_id};",
+            f"Field[{threshold_id}].SizeMin = {field.size_min!r};",
+            f"Field[{threshold_id}].SizeMax = {field.size_max!r};",
+            f"Field[{threshold_id}].DistMin = {field.dist_min!r};",
+            f"Field[{threshold_id}].DistMax = {field.dist_max!r};",
+        ]
+        thresholds.append(threshold_id)
+        field_id = threshold_id
+
+    if thresholds:
+        min_id = field_id + 1
+        lines += [
+            f"Field[{min_id}] = Min;",
+            f"Field[{min_id}].FieldsList = {{{', '.join(map(str, thresholds))}}};",
+            f"Background Field = {min_id};",
+        ]
+    return lines
+
+
+# Linear surface element type -> the other one a mixed mesh can contain.
+MIXED_TYPES = {2: 3, 3: 2}
+
+
+class SizeFieldMeshGenerator(cfm.GmshMeshGenerator):
+    """
+    ``GmshMeshGenerator`` that grades the mesh with size fields.
+
+    Parameters
+    ----------
+    geometry : cfg.Geometry
+        Geometry to mesh.
+    size_fields : sequence of DistanceThreshold or SizeMap
+        Size fields to apply in addition to the point sizes.
+    **kwargs
+        Passed on to ``GmshMeshGenerator``.
+    """
+
+    def __init__(self, geometry, size_fields=(), **kwargs):
+        super().__init__(geometry, **kwargs)
+        self.size_fields = list(size_fields)
+
+    def _writeGeoFile(self):
+        super()._writeGeoFile()
+        for line in size_field_lines(self.size_fields):
+            self.geofile.write(line + "\n")
+
+    def create_mixed(self):
+        """
+        Mesh and return the linear triangles and quadrilaterals together.
+
+        ``create()`` keeps only the elements of ``el_type``; other surface
+        elements end up among its boundary elements. A recombined
+        (el_type 3) mesh can contain triangles where Gmsh could not pair
+        them, and ``create()`` drops these. This reads both types back.
+
+        Returns
+        -------
+        coords, dofs, bdofs
+            As from ``create()``.
+        edof : dict
+            Gmsh element type (2 = triangle, 3 = quad) -> element topology,
+            for the types that occur.
+        elementmarkers : dict
+            Gmsh element type -> list of element markers.
+        """
+        if self.el_type not in MIXED_TYPES:
+            raise ValueError("Mixed meshes need el_type 2 (triangles) or 3 (quads)")
+        return_boundary_elements = self.return_boundary_elements
+        self.return_boundary_elements = True
+        try:
+            coords, edof, dofs, bdofs, elementmarkers, boundary_elements = self.create()
+        finally:
+            self.return_boundary_elements = return_boundary_elements
+
+        dofs = np.asarray(dofs)
+        blocks = {self.el_type: (list(np.asarray(edof)), list(elementmarkers))}
+        other = MIXED_TYPES[self.el_type]
+        for marker, elements in boundary_elements.items():
+            for element in elements:
+                if element["elm-type"] != other:
+                    continue
+                block_edof, block_markers = blocks.setdefault(other, ([], []))
+                nodes = np.asarray(element["node-number-list"]) - 1
+                block_edof.append(dofs[nodes].ravel())
+                block_markers.append(marker)
+
+        edof = {}
+        markers = {}
+        for block_type, (block_edof, block_markers) in blocks.items():
+            if block_markers:
+                edof[block_type] = np.array(block_edof, dtype=dofs.dtype)
+                markers[block_type] = block_markers
+        return coords, edof, dofs, bdofs, markers
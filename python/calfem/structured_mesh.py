@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Structured quadrilateral meshes of axis-aligned rectangular layouts.
+
+A fast path for geometries made of an outer rectangle with rectangular
+inclusions and holes, which would otherwise go through Gmsh. The mesh is a
+tensor-product grid whose lines pass through every rectangle edge, so all
+material interfaces are resolved exactly. The output has the same layout as
+``calfem.mesh.GmshMeshGenerator.create()``: coords, edof, dofs, bdofs and
+elementmarkers.
+"""
+
+import numpy as np
+
+SIDES = ("bottom", "right", "top", "left")
+
+
+def _axis_lines(breakpoints, el_size):
+    """Grid line positions through all breakpoints, spaced at most el_size."""
+    breakpoints = np.unique(np.asarray(breakpoints, dtype=float))
+    lines = [breakpoints[:1]]
+    for start, stop in zip(breakpoints[:-1], breakpoints[1:]):
+        n = max(1, int(np.ceil((stop - start) / el_size - 1e-9)))
+        lines.append(np.linspace(start, stop, n + 1)[1:])
+    return np.concatenate(lines)
+
+
+def rectangle_mesh(domain, regions=(), el_size=0.1, base_marker=0,
+                   side_markers=None, dofs_per_node=2):
+    """
+    Q4 mesh of a rectangle with rectangular inclusions and holes.
+
+    Parameters
+    ----------
+    domain : tuple of float
+        Outer rectangle (x0, y0, x1, y1).
+    regions : sequence of (tuple, int or None)
+        Rectangles (x0, y0, x1, y1) inside the domain, each with the element
+        marker of its elements, or None for a hole. Later regions take
+        precedence where they overlap.
+    el_size : float
+        Maximum element edge length.
+    base_marker : int
+        Element marker of the elements outside all regions.
+    side_markers : dict, optional
+        Boundary marker of each outer side ("bottom", "right", "top",
+        "left"). Sides not listed get marker 0.
+    dofs_per_node : int
+        Degrees of freedom per node.
+
+    Returns
+    -------
+    coords : ndarray, shape (n_nodes, 2)
+    edof : ndarray, shape (n_elements, 4 * dofs_per_node)
+        Element topology (1-based DOFs), nodes counter-clockwise.
+    dofs : ndarray, shape (n_nodes, dofs_per_node)
+        1-based DOFs of every node.
+    bdofs : dict
+        Boundary marker -> list of DOFs on that boundary. Region edges are
+        collected under marker 0, like unmarked curves in Gmsh.
+    elementmarkers : list of int
+    """
+    x0, y0, x1, y1 = domain
+    side_markers = side_markers or {}
+    regions = [(tuple(rect), marker) for rect, marker in regions]
+
+    xs = _axis_lines([x0, x1] + [r[0][i] for r in regions for i in (0, 2)], el_size)
+    ys = _axis_lines([y0, y1] + [r[0][i] for r in regions for i in (1, 3)], el_size)
+    nx, ny = xs.size - 1, ys.size - 1
+
+    # Cell markers from the centroids; -1 marks removed (hole) cells.
+    xc = 0.5 * (xs[:-1] + xs[1:])
+    yc = 0.5 * (ys[:-1] + ys[1:])
+    markers = np.full((ny, nx), base_marker, dtype=int)
+    for (rx0, ry0, rx1, ry1), marker in regions:
+        inside = ((yc > ry0) & (yc < ry1))[:, None] & ((xc > rx0) & (xc < rx1))[None, :]
+        markers[inside] = -1 if marker is None else marker
+
+    # Corner nodes of every kept cell in the full (ny+1, nx+1) node grid.
+    j, i = np.nonzero(markers >= 0)
+    lower_left = j * (nx + 1) + i
+    cell_nodes = np.column_stack([
+        lower_left, lower_left + 1, lower_left + nx + 2, lower_left + nx + 1,
+    ])
+
+    used = np.zeros((ny + 1) * (nx + 1), dtype=bool)
+    used[cell_nodes.ravel()] = True
+    node_number = np.full(used.size, -1)
+    node_number[used] = np.arange(used.sum())
+
+    X, Y = np.meshgrid(xs, ys)
+    coords = np.column_stack([X.ravel()[used], Y.ravel()[used]])
+    dofs = np.arange(1, coords.shape[0] * dofs_per_node + 1).reshape(-1, dofs_per_node)
+    edof = dofs[node_number[cell_nodes]].reshape(cell_nodes.shape[0], -1)
+    elementmarkers = markers[j, i].tolist()
+
+    # Boundary DOFs: outer sides by marker, region edges under marker 0.
+    tol = 1e-12 * max(x1 - x0, y1 - y0)
+    px, py = coords[:, 0], coords[:, 1]
+    on_side = {
+        "bottom": np.abs(py - y0) < tol,
+        "right": np.abs(px - x1) < tol,
+        "top": np.abs(py - y1) < tol,
+        "left": np.abs(px - x0) < tol,
+    }
+    on_regions = np.zeros(coords.shape[0], dtype=bool)
+    for (rx0, ry0, rx1, ry1), _ in regions:
+        in_x = (px > rx0 - tol) & (px < rx1 + tol)
+        in_y = (py > ry0 - tol) & (py < ry1 + tol)
+        on_regions |= (in_x & in_y) & (
+            (np.abs(px - rx0) < tol) | (np.abs(px - rx1) < tol)
+            | (np.abs(py - ry0) < tol) | (np.abs(py - ry1) < tol)
+        )
+
+    boundary_nodes = {}
+    for side in SIDES:
+        marker = side_markers.get(side, 0)
+        boundary_nodes.setdefault(marker, np.zeros(coords.shape[0], dtype=bool))
+        boundary_nodes[marker] |= on_side[side]
+    boundary_nodes.setdefault(0, np.zeros(coords.shape[0], dtype=bool))
+    boundary_nodes[0] |= on_regions
+
+    bdofs = {
+        marker: dofs[np.flatnonzero(mask)].ravel().tolist()
+        for marker, mask in boundary_nodes.items()
+    }
+    return coords, edof, dofs, bdofs, elementmarkers
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Shared setup of the tests of the calfem examples.
+
+The examples are flat scripts imported by name (``import batched_kernels``),
+so their directory is put on the path. Test modules of scripts that import
+``calfem.mesh`` skip themselves when it cannot be loaded: it loads the Gmsh
+library, which raises OSError rather than ImportError when Gmsh's shared
+libraries are missing.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
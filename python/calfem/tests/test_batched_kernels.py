@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""The batched element kernels against the scalar calfem.core routines."""
+
+import numpy as np
+import pytest
+
+import calfem.core as cfc
+
+import batched_kernels as bk
+
+
+def distorted_elements(n_elements, n_nodes, seed=0):
+    """Stacked convex elements: a regular polygon with jittered corners."""
+    rng = np.random.default_rng(seed)
+    angles = 2 * np.pi * np.arange(n_nodes) / n_nodes + np.pi / n_nodes
+    ex = np.cos(angles) + 0.15 * rng.standard_normal((n_elements, n_nodes))
+    ey = np.sin(angles) + 0.15 * rng.standard_normal((n_elements, n_nodes))
+    scale = rng.uniform(0.5, 2.0, (n_elements, 1))
+    return scale * ex + rng.uniform(-5, 5, (n_elements, 1)), scale * ey
+
+
+def plane_materials():
+    """(ep, D) pairs: plane stress, and plane strain with 4x4 and 3x3 D."""
+    D_stress = np.asarray(cfc.hooke(1, 2.1e9, 0.3))
+    D_strain = np.asarray(cfc.hooke(2, 2.1e9, 0.3))
+    return [
+        ([1, 0.2], D_stress),
+        ([2, 0.2], D_strain),
+        ([2, 0.2], D_strain[np.ix_((0, 1, 3), (0, 1, 3))]),
+    ]
+
+
+@pytest.mark.parametrize("ep, D", plane_materials())
+def test_triangle_kernels_match_calfem(ep, D):
+    ex, ey = distorted_elements(20, 3)
+    ed = np.random.default_rng(1).standard_normal((20, 6)) * 1e-3
+
+    Ke = bk.plante_batch(ex, ey, ep, D)
+    es, et = bk.plants_batch(ex, ey, ep, D, ed)
+    for i in range(ex.shape[0]):
+        np.testing.assert_allclose(Ke[i], cfc.plante(ex[i], ey[i], ep, D), rtol=1e-10)
+        es_ref, et_ref = cfc.plants(ex[i], ey[i], ep, D, ed[i])
+        np.testing.assert_allclose(es[i], np.ravel(es_ref), rtol=1e-10, atol=1e-6)
+        np.testing.assert_allclose(et[i], np.ravel(et_ref), rtol=1e-10, atol=1e-16)
+
+
+@pytest.mark.parametrize("ep, D", plane_materials())
+def test_quad_kernels_match_calfem(ep, D):
+    ex, ey = distorted_elements(20, 4)
+    ed = np.random.default_rng(2).standard_normal((20, 8)) * 1e-3
+
+    Ke = bk.planqe_batch(ex, ey, ep, D)
+    es, et = bk.planqs_batch(ex, ey, ep, D, ed)
+    for i in range(ex.shape[0]):
+        np.testing.assert_allclose(Ke[i], cfc.planqe(ex[i], ey[i], ep, D), rtol=1e-8, atol=1e-3)
+        es_ref, et_ref = cfc.planqs(ex[i], ey[i], ep, D, ed[i])
+        np.testing.assert_allclose(es[i], np.ravel(es_ref), rtol=1e-8, atol=1e-3)
+        np.testing.assert_allclose(et[i], np.ravel(et_ref), rtol=1e-8, atol=1e-14)
+
+
+def test_element_coordinates_match_coordxtr():
+    coords = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [2.0, 0.0], [2.0, 1.0]])
+    dofs = np.arange(1, 13).reshape(6, 2)
+    edof = np.vstack([dofs[[0, 1, 2, 3]].ravel(), dofs[[1, 4, 5, 2]].ravel()])
+
+    ex, ey = bk.element_coordinates(edof, coords, dofs)
+    ex_ref, ey_ref = cfc.coordxtr(edof, coords, dofs)
+    np.testing.assert_array_equal(ex, ex_ref)
+    np.testing.assert_array_equal(ey, ey_ref)
+
+
+@pytest.mark.parametrize("ir", [1, 2, 3])
+def test_flow_kernels_match_calfem(ir):
+    ex, ey = distorted_elements(15, 4, seed=3)
+    ed = np.random.default_rng(4).standard_normal((15, 4))
+    ep = [0.5, ir]
+    D = np.array([[1.7, 0.3], [0.3, 0.9]])
+
+    Ke = bk.flw2i4e_batch(ex, ey, ep, D)
+    es, et, eci = bk.flw2i4s_batch(ex, ey, ep, D, ed)
+    for i in range(ex.shape[0]):
+        np.testing.assert_allclose(Ke[i], cfc.flw2i4e(ex[i], ey[i], ep, D), rtol=1e-10, atol=1e-14)
+        es_ref, et_ref, eci_ref = cfc.flw2i4s(ex[i], ey[i], ep, D, ed[i])
+        np.testing.assert_allclose(es[i], np.reshape(es_ref, (-1, 2)), rtol=1e-10, atol=1e-14)
+        np.testing.assert_allclose(et[i], np.reshape(et_ref, (-1, 2)), rtol=1e-10, atol=1e-14)
+        np.testing.assert_allclose(eci[i], np.reshape(eci_ref, (-1, 2)), rtol=1e-10, atol=1e-14)
+
+
+def test_capacity_matrices_integrate_the_capacity():
+    ex, ey = distorted_elements(10, 4, seed=5)
+    c = np.linspace(1.0, 2.0, 10)
+    Ce = bk.flw2i4m_batch(ex, ey, [0.5, 2], c)
+
+    np.testing.assert_allclose(Ce, np.transpose(Ce, (0, 2, 1)))
+    assert np.all(np.linalg.eigvalsh(Ce) > 0.0)
+    # Summing the consistent matrix integrates c t over the element.
+    np.testing.assert_allclose(Ce.sum(axis=(1, 2)), 0.5 * c * bk.element_areas(ex, ey))
+
+
+def test_element_nodes_with_a_shared_node_map():
+    coords = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [2.0, 0.0], [2.0, 1.0]])
+    dofs = np.arange(1, 13).reshape(6, 2)
+    edof = np.vstack([dofs[[0, 1, 2, 3]].ravel(), dofs[[1, 4, 5, 2]].ravel()])
+    node_map = bk.dof_node_map(dofs)
+
+    np.testing.assert_array_equal(node_map, np.repeat(np.arange(6), 2))
+    for rows in (slice(0, 1), slice(1, 2)):
+        np.testing.assert_array_equal(
+            bk.element_nodes(edof[rows], dofs, node_map), bk.element_nodes(edof, dofs)[rows]
+        )
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+The ex2 solves against the dense calfem.core baseline of ex2_original.
+
+The cases use the structured mesher, so they run without Gmsh; ex2 still
+imports calfem.mesh for its Gmsh path.
+"""
+
+import math
+
+import numpy as np
+import pytest
+from scipy.sparse import lil_matrix
+
+import calfem.core as cfc
+import calfem.utils as cfu
+
+try:
+    import ex2
+except (ImportError, OSError) as error:
+    pytest.skip(f"calfem.mesh (Gmsh) cannot be loaded: {error}", allow_module_level=True)
+
+
+@pytest.fixture
+def prepared():
+    return ex2.prepare_case(0.1, mesher="structured")
+
+
+# Gmsh element type -> calfem.core (stiffness, stress) routines.
+KERNELS = {2: (cfc.plante, cfc.plants), 3: (cfc.planqe, cfc.planqs)}
+
+
+def baseline_solve(prepared, properties=ex2.elprop, load_value=ex2.load_total):
+    """ex2_original's assembly, solve and von Mises stresses, per element type."""
+    coords, dofs, bdofs = prepared["coords"], prepared["dofs"], prepared["bdofs"]
+    edof, elementmarkers = prepared["edof"], prepared["elementmarkers"]
+    if not isinstance(edof, dict):
+        edof, elementmarkers = {3: edof}, {3: elementmarkers}
+    n_dofs = np.size(dofs)
+    K = lil_matrix((n_dofs, n_dofs))
+    for el_type in sorted(edof):
+        stiffness = KERNELS[el_type][0]
+        ex, ey = cfc.coordxtr(edof[el_type], coords, dofs)
+        for eltopo, elx, ely, marker in zip(edof[el_type], ex, ey, elementmarkers[el_type]):
+            cfc.assem(eltopo, K, stiffness(elx, ely, properties[marker][0], properties[marker][1]))
+
+    bc, bc_values = cfu.applybc(bdofs, np.array([], "i"), np.array([], "i"), ex2.mark_fixed, 0.0)
+    f = np.zeros((n_dofs, 1))
+    cfu.applyforcetotal(bdofs, f, ex2.mark_load, value=load_value, dimension=2)
+    a, r = cfc.spsolveq(K, f, bc, bc_values)
+    a, r = np.asarray(a).reshape(-1, 1), np.asarray(r).reshape(-1, 1)
+
+    von_mises = []
+    for el_type in sorted(edof):
+        stress = KERNELS[el_type][1]
+        ex, ey = cfc.coordxtr(edof[el_type], coords, dofs)
+        ed = cfc.extract_eldisp(edof[el_type], a)
+        for i, marker in enumerate(elementmarkers[el_type]):
+            es, _ = stress(ex[i], ey[i], properties[marker][0], properties[marker][1], ed[i])
+            es = np.ravel(es)
+            von_mises.append(math.sqrt(es[0]**2 - es[0]*es[1] + es[1]**2 + 3*es[2]**2))
+    return a, r, np.array(von_mises)
+
+
+def split_into_mixed(prepared):
+    """The case with every other quad split into two triangles, as a mixed mesh."""
+    edof = np.asarray(prepared["edof"])
+    markers = np.asarray(prepared["elementmarkers"])
+    split = np.arange(edof.shape[0]) % 2 == 0
+    quads = edof[split].reshape(-1, 4, 2)
+    triangles = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]]).reshape(-1, 6)
+    mixed = dict(prepared)
+    mixed["edof"] = {2: triangles, 3: edof[~split]}
+    mixed["elementmarkers"] = {
+        2: list(np.concatenate([markers[split], markers[split]])),
+        3: list(markers[~split]),
+    }
+    return mixed
+
+
+def assert_close(actual, desired, rtol=1e-8):
+    np.testing.assert_allclose(actual, desired, rtol=rtol, atol=rtol * np.abs(desired).max())
+
+
+def test_compute_case_matches_baseline(prepared):
+    result = ex2.compute_case(prepared)
+    a, r, von_mises = baseline_solve(prepared)
+    assert_close(result.a, a)
+    assert_close(result.r, r)
+    assert_close(result.von_mises, von_mises)
+
+
+def test_mixed_mesh_matches_baseline(prepared):
+    mixed = split_into_mixed(prepared)
+    result = ex2.compute_case(mixed)
+    a, r, von_mises = baseline_solve(mixed)
+    assert result.n_elements == len(von_mises)
+    assert_close(result.a, a)
+    assert_close(result.r, r)
+    assert_close(result.von_mises, von_mises)
+
+
+def test_condensed_case_matches_baseline(prepared):
+    result = ex2.compute_condensed_case(prepared)
+    a, _, von_mises = baseline_solve(prepared)
+    assert_close(result.a, a)
+    assert_close(result.von_mises, von_mises)
+
+
+def test_condensed_case_reuses_the_inclusion_for_new_frames(prepared):
+    ex2.compute_condensed_case(prepared)
+    condensed = prepared["condensed_inclusion"][1]
+
+    frame = [ex2.ep, cfc.hooke(ex2.ptype, 3 * ex2.E1, 0.25)]
+    result = ex2.compute_condensed_case(prepared, frame_properties=frame, load_value=0.5 * ex2.load_total)
+    assert prepared["condensed_inclusion"][1] is condensed
+
+    properties = dict(ex2.elprop)
+    properties[ex2.mark_E1] = frame
+    a, _, _ = baseline_solve(prepared, properties, 0.5 * ex2.load_total)
+    assert_close(result.a, a)
+
+
+def test_domain_decomposition_matches_baseline(prepared, monkeypatch):
+    monkeypatch.setattr(ex2, "DD_SUBDOMAINS", 3)
+    result = ex2.compute_case(prepared)
+    a, r, _ = baseline_solve(prepared)
+    assert_close(result.a, a, rtol=1e-7)
+    assert_close(result.r, r, rtol=1e-7)
+    assert result.solver_info["converged"]
+    assert len(result.solver_info["subdomains"]) == 3
+
+
+@pytest.mark.parametrize("mixed", [False, True])
+def test_chunked_postprocess_matches_results(prepared, tmp_path, mixed):
+    if mixed:
+        prepared = split_into_mixed(prepared)
+    result = ex2.compute_case(prepared)
+    n_elements = ex2.postprocess_to_disk(prepared, result.a, str(tmp_path), chunk_size=7)
+
+    assert n_elements == result.n_elements > 7
+    fields = ex2.load_postprocess(str(tmp_path))
+    np.testing.assert_allclose(fields["stress"], result.element_stresses, rtol=1e-12)
+    np.testing.assert_allclose(fields["strain"], result.element_strains, rtol=1e-12)
+    np.testing.assert_allclose(fields["von_mises"], result.von_mises, rtol=1e-12)
+
+
+def test_driver_streams_postprocessing_instead_of_recovering_in_memory(prepared, tmp_path, monkeypatch):
+    monkeypatch.setattr(ex2, "POSTPROCESS_DIR", str(tmp_path))
+    result = ex2.compute_case(prepared)
+    ex2.postprocess_case(result, 0.1)
+
+    assert result._element_stresses is None
+    assert "postprocess_disk" in result.timings
+    fields = ex2.load_postprocess(str(tmp_path / "h_0.1"))
+    np.testing.assert_allclose(fields["von_mises"], result.von_mises, rtol=1e-12)
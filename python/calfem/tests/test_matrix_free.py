@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Storage modes of the matrix-free element operator."""
+
+import numpy as np
+import pytest
+
+import batched_kernels as bk
+import matrix_free as mf
+import structured_mesh as sm
+
+
+@pytest.fixture
+def mesh():
+    coords, edof, dofs, _, _ = sm.rectangle_mesh((0.0, 0.0, 3.0, 2.0), el_size=0.25, dofs_per_node=1)
+    ex, ey = bk.element_coordinates(edof, coords, dofs)
+    return edof, np.size(dofs), ex, ey
+
+
+@pytest.mark.parametrize("ir", [1, 2, 3])
+def test_storage_modes_apply_the_same_operator(mesh, ir):
+    edof, n_dofs, ex, ey = mesh
+    ep = [0.5, ir]
+    D = np.array([[1.7, 0.3], [0.3, 0.9]])
+    x = np.random.default_rng(0).standard_normal(n_dofs)
+
+    operators = {storage: mf.ElementOperator(edof, n_dofs, ex, ey, ep, D, storage=storage, chunk_size=7)
+                 for storage in mf.STORAGE_MODES}
+    reference = operators["matrices"]
+    for operator in operators.values():
+        np.testing.assert_allclose(operator.apply(x), reference.apply(x), rtol=1e-12, atol=1e-12)
+        np.testing.assert_allclose(operator.diagonal(), reference.diagonal(), rtol=1e-12)
+
+
+@pytest.mark.parametrize("ir, expected", [(1, "gradients"), (2, "matrices"), (3, "matrices")])
+def test_auto_storage_holds_the_fewest_bytes(mesh, ir, expected):
+    edof, n_dofs, ex, ey = mesh
+    ep = [1.0, ir]
+    operator = mf.ElementOperator(edof, n_dofs, ex, ey, ep, np.identity(2), storage="auto")
+    assert operator.storage == expected
+    stored = [mf.ElementOperator(edof, n_dofs, ex, ey, ep, np.identity(2), storage=storage).nbytes
+              for storage in ("gradients", "matrices")]
+    assert operator.nbytes == min(stored)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Refinement and unconverged-iteration warnings of the multigrid module."""
+
+import numpy as np
+import pytest
+
+import matrix_free as mf
+import multigrid as mg
+import structured_mesh as sm
+
+
+def laplacian(n):
+    return 2.0 * np.eye(n) - np.eye(n, k=1) - np.eye(n, k=-1)
+
+
+@pytest.mark.parametrize("iterate", [mg.richardson, mf.pcg])
+def test_iterations_warn_when_unconverged(iterate):
+    A = laplacian(50)
+    with pytest.warns(RuntimeWarning, match="did not converge"):
+        _, iterations, residual = iterate(
+            lambda x: A @ x, np.ones(50), lambda r: 0.25 * r, tol=1e-12, maxiter=3,
+        )
+    assert iterations == 3
+    assert residual > 1e-12
+
+
+def test_refined_children_follow_their_parent():
+    coords, edof, dofs, _, _ = sm.rectangle_mesh((0.0, 0.0, 3.0, 2.0), el_size=1.0, dofs_per_node=1)
+    nodes = edof - 1
+    refinement = mg.refine_quads(coords, nodes)
+
+    assert refinement.nodes.shape[0] == 4 * nodes.shape[0]
+    parent_centroids = coords[nodes].mean(axis=1)
+    child_centroids = refinement.coords[refinement.nodes].mean(axis=1)
+    # The four children of element e are elements 4e to 4e + 3.
+    np.testing.assert_allclose(
+        child_centroids.reshape(-1, 4, 2).mean(axis=1), parent_centroids, atol=1e-12
+    )
+
+    # The prolongation reproduces linear fields exactly.
+    field = 2.0 * coords[:, 0] - coords[:, 1]
+    fine_field = 2.0 * refinement.coords[:, 0] - refinement.coords[:, 1]
+    np.testing.assert_allclose(refinement.prolongation @ field, fine_field, atol=1e-12)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Retries and crash isolation of the slot parameter study."""
+
+import json
+import os
+
+import pytest
+
+try:
+    import ex1_param_study as ps
+except (ImportError, OSError) as error:
+    pytest.skip(f"calfem.mesh (Gmsh) cannot be loaded: {error}", allow_module_level=True)
+
+
+def crashing_case(params):
+    """Kills its worker for case 0, raises for case 1, succeeds otherwise."""
+    if params["k"] == 0:
+        os._exit(1)
+    if params["k"] == 1:
+        raise ValueError("bad case")
+    return {"n_dofs": 10 * params["k"]}
+
+
+def test_a_crashing_case_only_uses_up_its_own_retries(tmp_path):
+    output = tmp_path / "study.jsonl"
+    cases = ps.parameter_grid(k=list(range(6)))
+    results, failures = ps.run_study(
+        cases, str(output), max_workers=4, max_retries=1, case_function=crashing_case,
+    )
+
+    assert sorted(row["k"] for row in results) == [2, 3, 4, 5]
+    assert all(row["attempts"] == 1 for row in results)
+    assert all(row["n_dofs"] == 10 * row["k"] for row in results)
+
+    errors = {row["k"]: row for row in failures}
+    assert sorted(errors) == [0, 1]
+    assert errors[0]["attempts"] == 2
+    assert errors[0]["error"].startswith("BrokenProcessPool")
+    assert errors[1]["attempts"] == 2
+    assert errors[1]["error"] == "ValueError: bad case"
+
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row["k"] for row in rows) == list(range(6))
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+The PotentialFlowSolver solves against a dense calfem.core baseline.
+
+Gmsh is replaced by a structured mesh of the same plate, so the tests check
+the solvers rather than the mesher. The baseline assembles the solver's
+final mesh element by element with ``cfc.flw2i4e`` and ``cfc.assem`` and
+solves with ``cfc.solveq``, as ex1_original does.
+"""
+
+import numpy as np
+import pytest
+
+import calfem.core as cfc
+import calfem.utils as cfu
+
+import structured_mesh as sm
+
+try:
+    import ex1_oop as ex1
+except (ImportError, OSError) as error:
+    pytest.skip(f"calfem.mesh (Gmsh) cannot be loaded: {error}", allow_module_level=True)
+
+PLATE = dict(plate_width=20.0, plate_height=4.0, slot_width=1.0, slot_depth=2.0)
+
+
+def structured_plate_mesh(geometry, el_size):
+    """Mesh data of a notched plate (or its left half) as ``_generate_mesh`` returns it."""
+    width, height = geometry.plate_width, geometry.plate_height
+    slot_left  = width / 2 - geometry.slot_width / 2
+    slot_right = width / 2 + geometry.slot_width / 2
+    slot_bottom = height - geometry.slot_depth
+    half = isinstance(geometry, ex1.HalfNotchedPlateGeometry)
+    if half:
+        width = slot_right = width / 2
+
+    coords, edof, dofs, bdofs, _ = sm.rectangle_mesh(
+        (0.0, 0.0, width, height), [((slot_left, slot_bottom, slot_right, height), None)],
+        el_size, dofs_per_node=1,
+    )
+    x, y = coords[:, 0], coords[:, 1]
+    tol = 1e-9
+    top = np.abs(y - height) < tol
+    bdofs[geometry.right_marker] = list(dofs[top & (x < slot_left + tol), 0])
+    if half:
+        on_line = (np.abs(x - width) < tol) & (y < slot_bottom + tol)
+        bdofs[geometry.symmetry_marker] = list(dofs[on_line, 0])
+    else:
+        bdofs[geometry.left_marker] = list(dofs[top & (x > slot_right - tol), 0])
+
+    ex, ey = cfc.coordxtr(edof, coords, dofs)
+    return {
+        "coords": coords, "edof": edof, "dofs": dofs, "bdofs": bdofs,
+        "ex": np.asarray(ex), "ey": np.asarray(ey),
+    }
+
+
+@pytest.fixture
+def structured_mesh(monkeypatch):
+    """Mesh with ``structured_plate_mesh`` instead of Gmsh; el_size 0.5 * el_size_factor."""
+    def generate_mesh(solver):
+        return structured_plate_mesh(solver._mesh_geometry(), 0.5 * solver.el_size_factor)
+
+    monkeypatch.setattr(ex1.PotentialFlowSolver, "_generate_mesh", generate_mesh)
+
+
+def make_solver(conductivity=None, **options):
+    geometry = ex1.NotchedPlateGeometry(**PLATE)
+    if conductivity is None:
+        conductivity = np.identity(2)
+    return ex1.PotentialFlowSolver(geometry, conductivity, mesh_cache=None, **options)
+
+
+def baseline_solve(solver, left_value, right_value):
+    """Dense calfem.core solve on the solver's final mesh."""
+    n_dofs = np.size(solver.dofs)
+    K = np.zeros((n_dofs, n_dofs))
+    D = solver.element_conductivity
+    for i, (elx, ely, eltopo) in enumerate(zip(solver.ex, solver.ey, solver.edof)):
+        Ke = cfc.flw2i4e(elx, ely, solver.ep, D if D.ndim == 2 else D[i])
+        cfc.assem(np.asarray(eltopo), K, Ke)
+
+    bc, bc_values = np.array([], int), np.array([], float)
+    bc, bc_values = cfu.applybc(solver.bdofs, bc, bc_values, solver.geometry.left_marker, left_value)
+    bc, bc_values = cfu.applybc(solver.bdofs, bc, bc_values, solver.geometry.right_marker, right_value)
+
+    a, r = cfc.solveq(K, np.zeros((n_dofs, 1)), bc, bc_values)
+    return np.asarray(a), np.asarray(r)
+
+
+def baseline_flux_magnitudes(solver, a):
+    magnitudes = []
+    D = solver.element_conductivity
+    for i, (elx, ely, eltopo) in enumerate(zip(solver.ex, solver.ey, solver.edof)):
+        ed = a[np.asarray(eltopo) - 1, 0]
+        es, _, _ = cfc.flw2i4s(elx, ely, solver.ep, D if D.ndim == 2 else D[i], ed)
+        magnitudes.append(np.hypot(*np.reshape(es, (-1, 2)).mean(axis=0)))
+    return np.array(magnitudes)
+
+
+def assert_matches_baseline(solver, left_value=0.0, right_value=10.0, rtol=1e-8):
+    solver.solve(left_value, right_value)
+    a, r = baseline_solve(solver, left_value, right_value)
+    scale = max(abs(left_value), abs(right_value))
+    np.testing.assert_allclose(solver.nodal_potentials, a, rtol=rtol, atol=rtol * scale)
+    np.testing.assert_allclose(
+        solver.reactions, r, rtol=rtol, atol=rtol * np.abs(r).max()
+    )
+    np.testing.assert_allclose(
+        solver.flux_magnitudes, baseline_flux_magnitudes(solver, a),
+        rtol=rtol, atol=rtol * scale,
+    )
+
+
+@pytest.mark.parametrize("integration_order", [1, 2])
+def test_direct_solve_matches_baseline(structured_mesh, integration_order):
+    solver = make_solver(integration_order=integration_order)
+    assert_matches_baseline(solver)
+
+
+@pytest.mark.parametrize("storage", ["gradients", "matrices", "recompute"])
+def test_cg_solve_matches_baseline(structured_mesh, storage):
+    solver = make_solver(
+        np.array([[1.0, 0.4], [0.4, 2.0]]), linear_solver="cg", operator_storage=storage,
+    )
+    assert_matches_baseline(solver, rtol=1e-7)
+    assert all(solver.solver_info["converged"])
+
+
+def test_solve_many_superposes_unit_solutions(structured_mesh):
+    solver = make_solver()
+    potentials, flux_magnitudes = solver.solve_many([(0.0, 10.0), (-3.0, 5.0)])
+    solver.solve(-3.0, 5.0)
+    np.testing.assert_allclose(potentials[1], solver.nodal_potentials[:, 0], rtol=1e-12)
+    np.testing.assert_allclose(flux_magnitudes[1], solver.flux_magnitudes, rtol=1e-12)
+    a, _ = baseline_solve(solver, 0.0, 10.0)
+    np.testing.assert_allclose(potentials[0], a[:, 0], rtol=1e-8, atol=1e-8)
+
+
+@pytest.mark.parametrize("linear_solver", ["mgcg", "multigrid"])
+def test_multigrid_solve_matches_baseline(structured_mesh, linear_solver):
+    solver = make_solver(linear_solver=linear_solver, el_size_factor=2.0, mg_levels=3)
+    assert_matches_baseline(solver, rtol=1e-7)
+    assert solver.ep[1] == 2
+    assert all(solver.solver_info["converged"])
+    assert solver.solver_info["level_dofs"][-1] == np.size(solver.dofs)
+
+
+def nodal_values_by_position(solver):
+    """Nodal potentials ordered by node position, to compare different numberings."""
+    coords = np.asarray(solver.coords)[:, :2]
+    order = np.lexsort((np.round(coords[:, 1], 9), np.round(coords[:, 0], 9)))
+    node_dofs = np.asarray(solver.dofs)[:, 0] - 1
+    return coords[order], solver.nodal_potentials[node_dofs[order], 0]
+
+
+@pytest.mark.parametrize("linear_solver", ["direct", "cg"])
+def test_half_model_matches_full_model(structured_mesh, linear_solver):
+    half = make_solver(use_symmetry=True, linear_solver=linear_solver)
+    assert_matches_baseline(half, left_value=2.0, right_value=7.0, rtol=1e-7)
+    assert half.half_model
+
+    full = make_solver(linear_solver=linear_solver)
+    full.solve(2.0, 7.0)
+    assert not full.half_model
+    half_coords, half_values = nodal_values_by_position(half)
+    full_coords, full_values = nodal_values_by_position(full)
+    np.testing.assert_allclose(half_coords, full_coords, atol=1e-12)
+    np.testing.assert_allclose(half_values, full_values, rtol=1e-7, atol=1e-7)
+    for marker in (half.geometry.left_marker, half.geometry.right_marker):
+        assert half.boundary_flow(marker) == pytest.approx(full.boundary_flow(marker), rel=1e-7)
+
+
+def test_half_model_falls_back_for_anisotropic_conductivity(structured_mesh):
+    solver = make_solver(np.array([[1.0, 0.4], [0.4, 2.0]]), use_symmetry=True)
+    assert_matches_baseline(solver)
+    assert not solver.half_model
+
+
+def test_transient_solve_reaches_the_steady_state(structured_mesh, tmp_path):
+    solver = make_solver()
+    time_steps = [(1.0, 10), (100.0, 50)]
+    times, snapshots = solver.solve_transient(time_steps, 0.0, 10.0, snapshot_stride=5)
+
+    assert times[-1] == pytest.approx(5010.0)
+    assert snapshots.shape == (13, np.size(solver.dofs))
+    np.testing.assert_allclose(snapshots[-1], solver.nodal_potentials[:, 0])
+    a, _ = baseline_solve(solver, 0.0, 10.0)
+    np.testing.assert_allclose(solver.nodal_potentials, a, rtol=1e-8, atol=1e-8)
+
+    path = tmp_path / "snapshots.npy"
+    solver.solve_transient(
+        time_steps, 0.0, 10.0, snapshot_file=str(path), snapshot_stride=5
+    )
+    np.testing.assert_array_equal(np.load(path), snapshots)
+
+
+def cell_conductivity(x_lines, y_lines):
+    """Anisotropic conductivity that is constant on every cell of a grid."""
+    def conductivity(x, y):
+        cell = np.searchsorted(x_lines, x) + 3.0 * np.searchsorted(y_lines, y)
+        D = np.zeros((np.size(x), 2, 2))
+        D[:, 0, 0] = 1.0 + 0.5 * np.sin(cell)
+        D[:, 1, 1] = 2.0 + 0.5 * np.cos(cell)
+        D[:, 0, 1] = D[:, 1, 0] = 0.3
+        return D
+    return conductivity
+
+
+@pytest.mark.parametrize("linear_solver", ["direct", "cg", "mgcg"])
+def test_conductivity_field_matches_baseline(structured_mesh, linear_solver):
+    conductivity = cell_conductivity(np.arange(21.0), np.arange(5.0))
+    solver = make_solver(conductivity, linear_solver=linear_solver, el_size_factor=2.0)
+    assert_matches_baseline(solver, rtol=1e-7)
+    assert solver.element_conductivity.shape == (np.shape(solver.edof)[0], 2, 2)
+
+
+def test_element_conductivity_follows_refinement(structured_mesh):
+    # A field constant on the cells of the coarse mesh is the same as a
+    # callable and as an array of the coarse elements.
+    coarse = make_solver(el_size_factor=2.0)
+    coarse.solve()
+    conductivity = cell_conductivity(
+        np.unique(coarse.coords[:, 0]), np.unique(coarse.coords[:, 1])
+    )
+    D = conductivity(coarse.ex.mean(axis=1), coarse.ey.mean(axis=1))
+
+    from_array = make_solver(D, linear_solver="mgcg", el_size_factor=2.0)
+    from_callable = make_solver(conductivity, linear_solver="mgcg", el_size_factor=2.0)
+    from_array.solve()
+    from_callable.solve()
+    np.testing.assert_array_equal(from_array.element_conductivity, from_callable.element_conductivity)
+    np.testing.assert_allclose(from_array.nodal_potentials, from_callable.nodal_potentials)
+
+
+def test_conductivity_of_the_wrong_size_is_rejected(structured_mesh):
+    solver = make_solver(np.tile(np.identity(2), (3, 1, 1)))
+    with pytest.raises(ValueError, match="conductivity must have shape"):
+        solver.solve()
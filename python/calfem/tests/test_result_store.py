@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Round trips and partial reads of the result store."""
+
+import numpy as np
+import pytest
+
+from result_store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "store"), chunk_rows=3)
+
+
+def test_round_trip(store, tmp_path):
+    arrays = {
+        "a": np.arange(20.0).reshape(10, 2),
+        "markers": np.arange(7, dtype=np.int32),
+        "total": np.float64(4.5),
+    }
+    store.append({"h": 0.1, "n": np.int64(3)}, arrays)
+
+    reopened = ResultStore(str(tmp_path / "store"))
+    assert {"h": 0.1, "n": 3} in reopened
+    assert reopened.cases() == [{"h": 0.1, "n": 3}]
+    for name, value in arrays.items():
+        loaded = reopened.load({"h": 0.1, "n": 3}, name)
+        assert loaded.dtype == np.asarray(value).dtype
+        np.testing.assert_array_equal(loaded, value)
+
+    with pytest.raises(ValueError):
+        reopened.append({"h": 0.1, "n": 3}, arrays)
+
+
+@pytest.mark.parametrize("rows", [
+    slice(2, 8), slice(4, 5), slice(None, None, 2), slice(None, None, -1),
+    slice(8, 2, -2), slice(-3, None), slice(5, 5), slice(9, 0, -4),
+])
+def test_partial_reads_match_slicing(store, rows):
+    x = np.arange(30.0).reshape(10, 3)
+    store.append({"case": 1}, {"x": x})
+    np.testing.assert_array_equal(store.load({"case": 1}, "x", rows), x[rows])
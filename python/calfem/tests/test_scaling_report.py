@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Power-law fits and labelling of the scaling report."""
+
+import json
+
+import pytest
+
+import scaling_report as sr
+
+
+def records():
+    return [
+        {"n_dofs": n,
+         "time": {"assembly": 1e-6 * n, "solve": 1e-9 * n**2},
+         "memory": {"assembly": 100.0 * n, "solve": 10.0 * n**1.8}}
+        for n in (1000, 4000, 16000)
+    ]
+
+
+def test_fits_and_flags():
+    report = sr.scaling_report(records(), target_dofs=64000)
+    assert report["time"]["assembly"]["exponent"] == pytest.approx(1.0)
+    assert report["time"]["solve"]["exponent"] == pytest.approx(2.0)
+    assert report["time"]["solve"]["flagged"]
+    assert not report["time"]["assembly"]["flagged"]
+    assert report["time"]["assembly"]["extrapolated"] == pytest.approx(0.064)
+
+
+def test_memory_is_labelled_as_python_heap_peak(tmp_path):
+    report = sr.scaling_report(records())
+    # The heap does not see the solver's C allocations, so the solve
+    # phase's memory is reported without an expectation to flag against.
+    assert report["memory"]["solve"]["expected"] is None
+    assert not report["memory"]["solve"]["flagged"]
+    assert "memory, Python-heap peak" in sr.format_report(report)
+
+    path = tmp_path / "report.json"
+    sr.write_report(report, str(path))
+    assert json.loads(path.read_text())["memory_metric"] == sr.PYTHON_HEAP_PEAK
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Reading mixed triangle and quad meshes from Gmsh."""
+
+import numpy as np
+import pytest
+
+import calfem.geometry as cfg
+
+try:
+    import size_fields as sf
+except (ImportError, OSError) as error:
+    pytest.skip(f"calfem.mesh (Gmsh) cannot be loaded: {error}", allow_module_level=True)
+
+
+def recombined_mesh_output():
+    """What ``create()`` returns for a quad and two unpaired triangles (el_type 3)."""
+    coords = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [2.0, 0.0], [2.0, 1.0]])
+    dofs = np.arange(1, 13).reshape(6, 2)
+    edof = np.array([[1, 2, 3, 4, 5, 6, 7, 8]])
+    bdofs = {70: [1, 2, 3, 4, 9, 10], 66: [3, 4, 5, 6, 9, 10, 11, 12]}
+    boundary_elements = {
+        70: [{"elm-type": 1, "node-number-list": [1, 2]},
+             {"elm-type": 1, "node-number-list": [2, 5]}],
+        66: [{"elm-type": 2, "node-number-list": [2, 5, 6]},
+             {"elm-type": 2, "node-number-list": [2, 6, 3]}],
+    }
+    return coords, edof, dofs, bdofs, [55], boundary_elements
+
+
+def test_create_mixed_keeps_unpaired_triangles():
+    generator = sf.SizeFieldMeshGenerator(cfg.Geometry())
+    generator.el_type = 3
+    generator.dofs_per_node = 2
+    generator.create = recombined_mesh_output
+
+    coords, edof, dofs, bdofs, elementmarkers = generator.create_mixed()
+
+    np.testing.assert_array_equal(edof[3], [[1, 2, 3, 4, 5, 6, 7, 8]])
+    np.testing.assert_array_equal(edof[2], [[3, 4, 9, 10, 11, 12], [3, 4, 11, 12, 5, 6]])
+    assert elementmarkers == {3: [55], 2: [66, 66]}
+    assert generator.return_boundary_elements is False
+    assert bdofs[70] == [1, 2, 3, 4, 9, 10]
+
+
+def test_create_mixed_without_triangles_has_one_block():
+    generator = sf.SizeFieldMeshGenerator(cfg.Geometry())
+    generator.el_type = 3
+    generator.dofs_per_node = 2
+    coords, edof, dofs, bdofs, markers, boundary_elements = recombined_mesh_output()
+    del boundary_elements[66]
+    generator.create = lambda: (coords, edof, dofs, bdofs, markers, boundary_elements)
+
+    _, mixed_edof, _, _, mixed_markers = generator.create_mixed()
+    assert list(mixed_edof) == [3]
+    assert mixed_markers == {3: [55]}